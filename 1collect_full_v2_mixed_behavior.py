@@ -9,70 +9,188 @@ import sys
 
 sys.path.append('D:/Carla Simulation')
 
-import carla
+import argparse
+import json
+import os
+
+if os.environ.get('CARLA_REPLAY_DIR'):
+    import carla_replay as carla  # 离线回放替身
+else:
+    import carla
 import pandas as pd
 import numpy as np
 import math
 import time
 from pathlib import Path
 from roundabout_config_v2 import *
+from frame_recorder import ColumnarFrameRecorder, ScenarioSummary, peak_rss_mb
+from chunk_writer import ChunkedScenarioWriter, read_progress
+from data_schema import data_path
+from campaign_manifest import CampaignManifest
+from spawn_index import get_spawn_index
+from active_set import ActiveVehicleSet
+from tick_metrics import TickLoopMetrics, metrics_path
+from frame_pipeline import FrameConsumer
+from kinematics import KinematicsStage
+from spawn_controller import AdaptiveSpawnController
+from record_clock import RecordClock, InterpolatedState, interpolate_rows
+from recorder_log import recorder_meta_path, save_metadata
+from scenario_scheduler import ParallelScenarioScheduler, parse_endpoints
 
 
 class MixedBehaviorCollector:
-    def __init__(self):
-        print("连接CARLA...")
-        self.client = carla.Client('localhost', 2000)
+    def __init__(self, host='localhost', port=2000, tm_port=8000, sim_rate=None, record_rate=None,
+                 record_mode=None):
+        """sim_rate/record_rate/record_mode: 默认SIM_RATE/RECORD_RATE/RECORD_MODE"""
+        # ⭐ 仿真步频与记录频率解耦（先校验，避免连接后才发现组合无效）
+        self.sim_rate = sim_rate or SIM_RATE
+        self.record_rate = record_rate or RECORD_RATE
+        self.record_clock = RecordClock(self.sim_rate, self.record_rate, record_mode or RECORD_MODE)
+        self.sim_ticks = 0  # 最近一次采集循环的tick数
+
+        print(f"连接CARLA ({host}:{port})...")
+        self.client = carla.Client(host, port)
         self.client.set_timeout(10.0)
+        self.tm_port = tm_port
         self.world = None
         self.traffic_manager = None
-        self.spawned_vehicles = []
+        self.active_vehicles = self.new_active_set()
         self.vehicle_behaviors = {}  # 记录每辆车的行为类型
+        self.track_id_offset = 0  # 续采时避免新actor id与已写盘轨迹重复
+        self.map_name = None
+        self.last_spawn_attempts = 0  # 最近一批的spawn尝试次数
+        self.last_collected_frame = None  # 采集循环最后处理完成的帧
+        self.last_loop_metrics = (None, None)
+        self.kinematics = None  # 每场景新建（附加特征跨块保存轨迹状态）
+        self.adaptive_controller = None  # ADAPTIVE_MODE下当前场景的spawn控制器
+        self.stop_reason = None
+        self.performance_profile = None
+        self.hybrid_anchor = None  # 混合物理半径中心（环岛中心的hero锚点车辆）
 
         Path(RAW_DATA_DIR).mkdir(parents=True, exist_ok=True)
 
-    def setup_world(self):
-        """配置仿真环境"""
+    def setup_world(self, profile_name=None):
+        """配置仿真环境（profile_name: PERFORMANCE_PROFILES中的性能配置，默认PERFORMANCE_PROFILE）"""
+        profile_name = profile_name or PERFORMANCE_PROFILE
+        if profile_name not in PERFORMANCE_PROFILES:
+            raise ValueError(f'未知的性能配置: {profile_name}（可选: {list(PERFORMANCE_PROFILES.keys())}）')
+        profile = PERFORMANCE_PROFILES[profile_name]
+
         print("加载Town03...")
-        self.world = self.client.load_world('Town03')
+        self.map_name = 'Town03'
+        self.world = self.client.load_world(self.map_name)
         time.sleep(2)
 
         settings = self.world.get_settings()
         settings.synchronous_mode = True
-        settings.fixed_delta_seconds = 1.0 / FRAME_RATE
+        settings.fixed_delta_seconds = 1.0 / self.sim_rate
+        settings.no_rendering_mode = profile.get('no_rendering_mode', False)
+        if 'substepping' in profile:
+            settings.substepping = profile['substepping']
+            settings.max_substep_delta_time = profile.get('max_substep_delta_time', 0.01)
+            settings.max_substeps = profile.get('max_substeps', 10)
+            if settings.substepping and \
+                    settings.max_substep_delta_time * settings.max_substeps < settings.fixed_delta_seconds - 1e-9:
+                raise ValueError(f'性能配置 {profile_name}: max_substep_delta_time × max_substeps '
+                                 f'必须 ≥ fixed_delta_seconds ({settings.fixed_delta_seconds})')
         self.world.apply_settings(settings)
 
-        self.traffic_manager = self.client.get_trafficmanager(8000)
+        self.traffic_manager = self.client.get_trafficmanager(self.tm_port)
         self.traffic_manager.set_synchronous_mode(True)
         self.traffic_manager.set_global_distance_to_leading_vehicle(2.0)
 
-        print("✅ 环境配置完成")
+        self.traffic_manager.set_hybrid_physics_mode(profile.get('hybrid_physics', False))
+        if profile.get('hybrid_physics', False):
+            self.traffic_manager.set_hybrid_physics_radius(profile.get('hybrid_radius', 70.0))
+            self.spawn_hybrid_anchor()
+        self.traffic_manager.set_respawn_dormant_vehicles(profile.get('respawn_dormant', False))
+        if profile.get('respawn_dormant', False):
+            lower, upper = profile.get('respawn_bounds', (25.0, 100.0))
+            self.traffic_manager.set_boundaries_respawn_dormant_vehicles(lower, upper)
+        self.performance_profile = profile_name
+
+        print(f"✅ 环境配置完成 (性能配置: {profile_name})")
+
+    def spawn_hybrid_anchor(self):
+        """
+        ⭐ 混合物理的半径以role_name='hero'的车辆为中心:
+        在环岛中心岛上方放一辆关闭物理的hero车辆，使hybrid_radius以ROUNDABOUT_CENTER为中心
+        （不加入活跃集合，不会被采集）
+        """
+        blueprint = self.world.get_blueprint_library().find('vehicle.audi.a2')
+        blueprint.set_attribute('role_name', 'hero')
+        location = carla.Location(x=ROUNDABOUT_CENTER.x, y=ROUNDABOUT_CENTER.y, z=ROUNDABOUT_CENTER.z + 3.0)
+        self.hybrid_anchor = self.world.try_spawn_actor(blueprint, carla.Transform(location, carla.Rotation()))
+        if self.hybrid_anchor is None:
+            print("  ⚠️ 混合物理锚点spawn失败，半径将以其他hero车辆为中心（没有则全部车辆休眠）")
+            return
+        self.hybrid_anchor.set_simulate_physics(False)
 
     def get_outer_ring_spawn_points(self):
-        """获取45-65米环形区域的spawn点"""
-        all_spawns = self.world.get_map().get_spawn_points()
+        """获取外环spawn点索引（按地图与环形几何缓存，只在首次调用时扫描）"""
+        spawn_index = get_spawn_index(
+            self.world, self.map_name, ROUNDABOUT_CENTER,
+            SPAWN_RADIUS_MIN, SPAWN_RADIUS_MAX, SPAWN_ANGLE_TOLERANCE
+        )
 
-        outer_spawns = []
-        for sp in all_spawns:
-            dist = sp.location.distance(ROUNDABOUT_CENTER)
+        print(f"  可用外环spawn点: {len(spawn_index)}个 "
+              f"({SPAWN_RADIUS_MIN:.0f}-{SPAWN_RADIUS_MAX:.0f}米, 朝向偏差≤{SPAWN_ANGLE_TOLERANCE:.0f}度)")
 
-            if SPAWN_RADIUS_MIN <= dist <= SPAWN_RADIUS_MAX:
-                to_center = ROUNDABOUT_CENTER - sp.location
-                angle_to_center = math.atan2(to_center.y, to_center.x)
-                spawn_yaw = math.radians(sp.rotation.yaw)
+        return spawn_index
 
-                angle_diff = abs(angle_to_center - spawn_yaw)
-                if angle_diff > math.pi:
-                    angle_diff = 2 * math.pi - angle_diff
+    def vehicle_positions(self):
+        """已spawn车辆的当前xy坐标（一次快照）"""
+        snapshot = self.world.get_snapshot()
+        xy = []
+        for vehicle in self.active_vehicles:
+            actor_snapshot = snapshot.find(vehicle.id)
+            if actor_snapshot is not None:
+                location = actor_snapshot.get_transform().location
+                xy.append((location.x, location.y))
+        return np.array(xy, dtype=np.float64).reshape(-1, 2)
 
-                priority = 100 - angle_diff * 180 / math.pi
-                outer_spawns.append((sp, dist, priority))
+    def free_spawn_points(self, spawn_index):
+        """⭐ 当前没有车辆占用（距离>SPAWN_CLEARANCE）的spawn点下标"""
+        return spawn_index.free_indices(self.vehicle_positions(), SPAWN_CLEARANCE)
 
-        outer_spawns.sort(key=lambda x: x[2], reverse=True)
-        spawn_points = [sp for sp, _, _ in outer_spawns]
+    def new_active_set(self):
+        despawn_frames = int(DESPAWN_OUTSIDE_TIME * self.record_rate) if DESPAWN_OUTSIDE_TIME else 0
+        return ActiveVehicleSet(COLLECTION_RADIUS, SPAWN_RADIUS_MAX, despawn_frames, core_radius=CORE_RADIUS)
 
-        print(f"  可用外环spawn点: {len(spawn_points)}个 (45-65米)")
+    def destroy_vehicles(self, vehicle_ids):
+        """一次批量命令销毁多辆车"""
+        if vehicle_ids:
+            self.client.apply_batch([carla.command.DestroyActor(vehicle_id) for vehicle_id in vehicle_ids])
+
+    def update_active_vehicles(self, frame_data, frames=1):
+        """
+        ⭐ 用本帧采集结果维护活跃集合
 
-        return spawn_points
+        本帧没有读到状态的车辆视为已销毁并移除；
+        驶出采集半径超过DESPAWN_OUTSIDE_TIME秒的车辆批量销毁。
+        返回本次销毁的车辆id列表
+        """
+        offset = self.track_id_offset
+        cx = ROUNDABOUT_CENTER.x
+        cy = ROUNDABOUT_CENTER.y
+        vehicle_ids = [row[1] - offset for row in frame_data]
+        radii = [math.hypot(row[2] - cx, row[3] - cy) for row in frame_data]
+        to_destroy = self.active_vehicles.update(vehicle_ids, radii, frames)
+        self.destroy_vehicles(to_destroy)
+        return to_destroy
+
+    def refresh_active_vehicles(self, frames):
+        """不采集数据时（spawn间隔期）用一次快照维护活跃集合"""
+        snapshot = self.world.get_snapshot()
+        vehicle_ids = []
+        radii = []
+        for vehicle in self.active_vehicles:
+            actor_snapshot = snapshot.find(vehicle.id)
+            if actor_snapshot is not None:
+                location = actor_snapshot.get_transform().location
+                vehicle_ids.append(vehicle.id)
+                radii.append(math.hypot(location.x - ROUNDABOUT_CENTER.x, location.y - ROUNDABOUT_CENTER.y))
+        self.destroy_vehicles(self.active_vehicles.update(vehicle_ids, radii, frames))
 
     def set_weather(self, weather_name):
         """设置天气"""
@@ -89,6 +207,23 @@ class MixedBehaviorCollector:
         else:
             self.world.set_weather(carla.WeatherParameters.ClearNoon)
 
+    def switch_weather(self, weather_name):
+        """⭐ 连续模式: 切换天气，并按新天气重新设置所有在场车辆的速度偏移/跟车距离"""
+        self.set_weather(weather_name)
+        for vehicle in self.active_vehicles:
+            behavior = self.vehicle_behaviors.get(vehicle.id, 'normal')
+            try:
+                self.set_behavior(vehicle, behavior, weather_name)
+            except:
+                continue
+
+    def settle(self, seconds):
+        """tick若干秒（不采集），期间照常维护活跃集合"""
+        for tick in range(self.record_clock.sim_ticks(seconds)):
+            self.world.tick()
+            if (tick + 1) % self.sim_rate == 0:
+                self.refresh_active_vehicles(self.record_rate)
+
     def set_behavior(self, vehicle, behavior_type, weather_type):
         """设置驾驶行为"""
         behavior_speed = BEHAVIOR_SPEED_ADJUSTMENT.get(behavior_type, 0.0)
@@ -100,29 +235,15 @@ class MixedBehaviorCollector:
         )
 
         following_dist = BEHAVIOR_FOLLOWING_DISTANCE.get(behavior_type, 2.5)
+        if 'Rain' in weather_type:
+            following_dist += 0.5
         self.traffic_manager.distance_to_leading_vehicle(vehicle, following_dist)
 
         ignore_lights = BEHAVIOR_IGNORE_LIGHTS.get(behavior_type, 10)
         self.traffic_manager.ignore_lights_percentage(vehicle, ignore_lights)
 
-        if 'Rain' in weather_type:
-            self.traffic_manager.distance_to_leading_vehicle(
-                vehicle, following_dist + 0.5
-            )
-
-    def spawn_batch_mixed(self, num_vehicles, spawn_points, weather_type):
-        """
-        ⭐ 核心改进: 混合行为spawn
-
-        行为比例（基于Treiber & Kesting 2013）:
-        - Aggressive: 25%
-        - Normal:     50%
-        - Cautious:   25%
-        """
-        blueprint_library = self.world.get_blueprint_library()
-        vehicle_bps = blueprint_library.filter('vehicle.*')
-
-        # ⭐ 预先分配行为类型（按比例）
+    def assign_behaviors(self, num_vehicles):
+        """按比例分配行为类型（25% / 50% / 25%）并打乱"""
         behaviors = []
         num_aggressive = int(num_vehicles * 0.25)
         num_normal = int(num_vehicles * 0.50)
@@ -137,18 +258,52 @@ class MixedBehaviorCollector:
 
         print(f"    行为分配: Aggressive {num_aggressive}, Normal {num_normal}, Cautious {num_cautious}")
 
+        return behaviors
+
+    def spawn_batch_mixed(self, num_vehicles, spawn_index, weather_type):
+        """
+        ⭐ 核心改进: 混合行为spawn
+
+        行为比例（基于Treiber & Kesting 2013）:
+        - Aggressive: 25%
+        - Normal:     50%
+        - Cautious:   25%
+        """
+        if SPAWN_MODE == 'batch':
+            return self.spawn_batch_mixed_sync(num_vehicles, spawn_index, weather_type)
+
+        blueprint_library = self.world.get_blueprint_library()
+        vehicle_bps = blueprint_library.filter('vehicle.*')
+
+        # ⭐ 预先分配行为类型（按比例）
+        behaviors = self.assign_behaviors(num_vehicles)
+
         vehicles = []
         attempts = 0
         max_attempts = num_vehicles * SPAWN_RETRIES
         behavior_idx = 0
+        self.last_spawn_attempts = 0
+        free_points = None  # 车辆移动（tick）后重新计算
 
         while len(vehicles) < num_vehicles and attempts < max_attempts:
+            if free_points is None:
+                free_points = list(self.free_spawn_points(spawn_index))
+            if not free_points:
+                # ⭐ 所有spawn点都被占用: 等车辆驶离
+                attempts += 1
+                for _ in range(3):
+                    self.world.tick()
+                free_points = None
+                continue
+
             bp = np.random.choice(vehicle_bps)
-            spawn_point = np.random.choice(spawn_points)
+            point_id = free_points.pop(np.random.randint(len(free_points)))
+            spawn_point = spawn_index.spawn_points[point_id]
 
             # 获取当前车辆的行为类型
             current_behavior = behaviors[behavior_idx % len(behaviors)]
 
+            self.last_spawn_attempts += 1
             try:
                 vehicle = self.world.spawn_actor(bp, spawn_point)
                 vehicle.set_autopilot(True, self.traffic_manager.get_port())
@@ -157,7 +312,7 @@ class MixedBehaviorCollector:
                 self.set_behavior(vehicle, current_behavior, weather_type)
 
                 vehicles.append(vehicle)
-                self.spawned_vehicles.append(vehicle)
+                self.active_vehicles.add(vehicle)
 
                 # ⭐ 记录这辆车的行为类型
                 self.vehicle_behaviors[vehicle.id] = current_behavior
@@ -167,13 +322,96 @@ class MixedBehaviorCollector:
                 if len(vehicles) % 3 == 0:
                     for _ in range(2):
                         self.world.tick()
+                    free_points = None
 
             except Exception as e:
                 attempts += 1
                 if attempts % 5 == 0:
                     for _ in range(3):
                         self.world.tick()
+                    free_points = None
+                continue
+
+        return vehicles
+
+    def spawn_batch_mixed_sync(self, num_vehicles, spawn_index, weather_type, tick=True):
+        """
+        ⭐ 批量spawn: 整批 SpawnActor + SetAutopilot 一次 apply_batch_sync
+
+        - 每轮为待spawn车辆选取互不相同的空闲spawn点（没有车辆占用）
+        - spawn失败（出生点碰撞）的车辆保留行为类型，下一轮换其他spawn点重试
+        - 成功车辆一次 get_actors 取回，再统一设置行为/天气参数
+        （carla.command没有交通管理器参数的批量命令，这一步仍是本地TM调用）
+
+        tick=False: 采集循环中使用，只spawn一轮且不tick（由采集循环的下一次tick生效），
+        失败的车辆不重试，避免打乱帧序列。
+        """
+        SpawnActor = carla.command.SpawnActor
+        SetAutopilot = carla.command.SetAutopilot
+        FutureActor = carla.command.FutureActor
+
+        blueprint_library = self.world.get_blueprint_library()
+        vehicle_bps = blueprint_library.filter('vehicle.*')
+        tm_port = self.traffic_manager.get_port()
+
+        # ⭐ 预先分配行为类型（按比例）
+        pending = self.assign_behaviors(num_vehicles)
+
+        vehicles = []
+        failed_points = set()
+        self.last_spawn_attempts = 0
+
+        for round_id in range(SPAWN_RETRIES if tick else 1):
+            if not pending:
+                break
+
+            free_points = self.free_spawn_points(spawn_index)
+            candidates = [i for i in free_points if i not in failed_points]
+            if len(candidates) < len(pending):
+                failed_points.clear()
+                candidates = list(free_points)
+            num_round = min(len(pending), len(candidates))
+            if num_round == 0:
+                # ⭐ 所有spawn点都被占用: 等车辆驶离
+                if tick:
+                    for _ in range(3):
+                        self.world.tick()
                 continue
+            point_ids = np.random.choice(candidates, size=num_round, replace=False)
+
+            batch = []
+            for point_id in point_ids:
+                bp = np.random.choice(vehicle_bps)
+                batch.append(
+                    SpawnActor(bp, spawn_index.spawn_points[point_id])
+                    .then(SetAutopilot(FutureActor, True, tm_port))
+                )
+            self.last_spawn_attempts += len(batch)
+
+            responses = self.client.apply_batch_sync(batch, tick)
+
+            spawned = {}
+            retry = pending[num_round:]
+            for point_id, behavior, response in zip(point_ids, pending, responses):
+                if response.error:
+                    failed_points.add(point_id)
+                    retry.append(behavior)
+                else:
+                    spawned[response.actor_id] = behavior
+            pending = retry
+
+            if spawned:
+                for vehicle in self.world.get_actors(list(spawned.keys())):
+                    behavior = spawned[vehicle.id]
+                    self.set_behavior(vehicle, behavior, weather_type)
+                    vehicles.append(vehicle)
+                    self.active_vehicles.add(vehicle)
+                    self.vehicle_behaviors[vehicle.id] = behavior
+
+            # 有失败时让已有车辆先驶离出生点
+            if pending and tick:
+                for _ in range(3):
+                    self.world.tick()
 
         return vehicles
 
@@ -193,9 +431,9 @@ class MixedBehaviorCollector:
         print(f"  间隔: {batch_interval}秒")
         print(f"  目标通过核心区: {target_passages}辆")
 
-        spawn_points = self.get_outer_ring_spawn_points()
+        spawn_index = self.get_outer_ring_spawn_points()
 
-        if not spawn_points:
+        if len(spawn_index) == 0:
             print("❌ 没有可用的外环spawn点")
             return
 
@@ -203,6 +441,8 @@ class MixedBehaviorCollector:
         print(f"  总批次: {num_batches}批\n")
 
         total_spawned = 0
+        total_attempts = 0
+        spawn_time = 0.0
         for batch_id in range(num_batches):
             remaining = spawn_total - total_spawned
             batch_size = min(spawn_per_batch, remaining)
@@ -210,70 +450,478 @@ class MixedBehaviorCollector:
             print(f"批次 {batch_id + 1}/{num_batches}: spawn {batch_size}辆...", end=" ")
 
             # ⭐ 使用混合行为spawn
+            t0 = time.perf_counter()
             batch_vehicles = self.spawn_batch_mixed(
-                batch_size, spawn_points, weather_type
+                batch_size, spawn_index, weather_type
             )
+            spawn_time += time.perf_counter() - t0
 
             total_spawned += len(batch_vehicles)
-            print(f"成功{len(batch_vehicles)}辆 (累计{total_spawned}/{spawn_total})")
+            attempts = self.last_spawn_attempts
+            total_attempts += attempts
+            success_rate = len(batch_vehicles) / attempts * 100 if attempts else 0.0
+            per_vehicle = attempts / len(batch_vehicles) if batch_vehicles else float('inf')
+            print(f"成功{len(batch_vehicles)}辆 (累计{total_spawned}/{spawn_total}), "
+                  f"尝试{attempts}次, 成功率{success_rate:.0f}%, {per_vehicle:.2f}次/辆")
 
             if batch_id < num_batches - 1:
-                for _ in range(batch_interval * FRAME_RATE):
+                for tick in range(batch_interval * self.sim_rate):
                     self.world.tick()
+                    if (tick + 1) % self.sim_rate == 0:
+                        self.refresh_active_vehicles(self.record_rate)
 
         print(f"\n✅ 动态spawn完成: {total_spawned}/{spawn_total}辆")
+        print(f"   spawn耗时({SPAWN_MODE}): {spawn_time:.2f}秒 (不含批次间隔)")
+        if total_attempts:
+            print(f"   spawn成功率: {total_spawned / total_attempts * 100:.1f}% "
+                  f"({total_attempts}次尝试, {total_attempts / max(total_spawned, 1):.2f}次/辆)")
+
+    def _make_row(self, frame_id, vehicle_id, transform, velocity, acceleration, weather, density):
+        """
+        由位姿/速度/加速度构造一行原始数据（tuple）
+
+        speed/accel/heading/radius/angle 不在这里计算，
+        写盘前由 kinematics.KinematicsStage 按块向量化计算。
+        """
+        # ⭐ 获取这辆车的行为类型
+        behavior = self.vehicle_behaviors.get(vehicle_id, 'unknown')
+
+        # ⭐ tuple顺序同frame_recorder.RAW_COLUMNS
+        location = transform.location
+        return (
+            frame_id,
+            vehicle_id + self.track_id_offset,
+            location.x,
+            location.y,
+            location.z,
+            velocity.x,
+            velocity.y,
+            acceleration.x,
+            acceleration.y,
+            transform.rotation.yaw,
+            weather,
+            density,
+            behavior,  # ⭐ 每辆车有自己的行为
+        )
 
     def collect_frame_data(self, frame_id, weather, density):
         """
         ⭐ 改进: 采集时记录每辆车的实际行为类型
+        （逐车RPC方式：每辆车3次阻塞调用）
         """
         data = []
 
-        for vehicle in self.spawned_vehicles:
+        for vehicle in self.active_vehicles:
             try:
                 transform = vehicle.get_transform()
                 velocity = vehicle.get_velocity()
                 acceleration = vehicle.get_acceleration()
 
-                dx = transform.location.x - ROUNDABOUT_CENTER.x
-                dy = transform.location.y - ROUNDABOUT_CENTER.y
-                radius = math.sqrt(dx ** 2 + dy ** 2)
-                angle = math.atan2(dy, dx)
-
-                speed = math.sqrt(velocity.x ** 2 + velocity.y ** 2)
-                accel = math.sqrt(acceleration.x ** 2 + acceleration.y ** 2)
-
-                # ⭐ 获取这辆车的行为类型
-                behavior = self.vehicle_behaviors.get(vehicle.id, 'unknown')
-
-                data.append({
-                    'frame': frame_id,
-                    'trackId': vehicle.id,
-                    'x': transform.location.x,
-                    'y': transform.location.y,
-                    'z': transform.location.z,
-                    'vx': velocity.x,
-                    'vy': velocity.y,
-                    'speed': speed,
-                    'ax': acceleration.x,
-                    'ay': acceleration.y,
-                    'accel': accel,
-                    'heading': math.radians(transform.rotation.yaw),
-                    'radius': radius,
-                    'angle': angle,
-                    'weather': weather,
-                    'traffic_density': density,
-                    'behavior_type': behavior  # ⭐ 每辆车有自己的行为
-                })
+                data.append(self._make_row(
+                    frame_id, vehicle.id, transform, velocity, acceleration, weather, density
+                ))
             except:
                 continue
 
         return data
 
-    def run_scenario(self, scenario_id, weather, density_name, density_config):
+    def collect_frame_data_snapshot(self, snapshot, frame_id, weather, density):
+        """
+        ⭐ 快照方式: 从tick后的单个WorldSnapshot读取所有车辆状态
+
+        ActorSnapshot已包含transform/velocity/acceleration，
+        行为类型来自本地记录，因此不需要任何逐车RPC。
+        快照中找不到的车辆（已销毁）直接跳过。
+        """
+        data = []
+
+        for vehicle in self.active_vehicles:
+            actor_snapshot = snapshot.find(vehicle.id)
+            if actor_snapshot is None:
+                continue
+
+            data.append(self._make_row(
+                frame_id,
+                vehicle.id,
+                actor_snapshot.get_transform(),
+                actor_snapshot.get_velocity(),
+                actor_snapshot.get_acceleration(),
+                weather,
+                density,
+            ))
+
+        return data
+
+    def grab_frame_state(self):
+        """
+        读取当前帧的原始状态（不做任何计算），返回 (state, RPC次数)
+
+        snapshot模式: state为WorldSnapshot
+        rpc模式:      state为 [(vehicle_id, transform, velocity, acceleration), ...]
+        """
+        if CAPTURE_MODE == 'snapshot':
+            return self.world.get_snapshot(), 1
+
+        state = []
+        num_vehicles = 0
+        for vehicle in self.active_vehicles:
+            num_vehicles += 1
+            try:
+                state.append((vehicle.id, vehicle.get_transform(), vehicle.get_velocity(),
+                              vehicle.get_acceleration()))
+            except:
+                continue
+        return state, 3 * num_vehicles
+
+    def rows_from_state(self, state, frame_id, weather, density):
+        """由grab_frame_state的原始状态计算本帧数据行（InterpolatedState时对前后两个tick插值）"""
+        if isinstance(state, InterpolatedState):
+            return interpolate_rows(
+                self.rows_from_state(state.before, frame_id, weather, density),
+                self.rows_from_state(state.after, frame_id, weather, density),
+                state.alpha,
+            )
+        if CAPTURE_MODE == 'snapshot':
+            return self.collect_frame_data_snapshot(state, frame_id, weather, density)
+        return [
+            self._make_row(frame_id, vehicle_id, transform, velocity, acceleration, weather, density)
+            for vehicle_id, transform, velocity, acceleration in state
+        ]
+
+    def collect_frames(self, frames, weather, density, recorder, on_chunk=None, on_progress=None,
+                       on_tick=None, pipeline_mode=None):
+        """
+        ⭐ 采集循环: 对frames中的每一帧 tick → 读取状态 → 计算 → 缓冲 → 活跃集合维护
+
+        pipeline_mode（默认PIPELINE_MODE）:
+        'sync':  单线程依次执行
+        'async': 主线程只tick和读取原始状态，经有界队列（PIPELINE_QUEUE_FRAMES帧）
+                 交给后台线程按帧顺序计算与缓冲；队列满时主线程等待（背压）
+        on_chunk(next_frame):    每CHUNK_SECONDS秒在处理线程中调用一次（写盘）
+        on_progress(next_frame): 每30秒仿真时间调用一次（打印进度）
+        on_tick(frame):          每帧tick之前在主线程调用，返回True时提前结束循环
+
+        frames按记录帧计数（RECORD_RATE）；每个记录帧前tick到对应的仿真时刻（RecordClock），
+        记录时刻落在两个tick之间时读取前后两个状态插值。
+
+        返回 (主循环计时, 处理线程计时或None)；处理线程出错时抛出异常。
+        最后处理完成的帧记录在 self.last_collected_frame，tick数记录在 self.sim_ticks。
+        """
+        pipeline_mode = pipeline_mode or PIPELINE_MODE
+        chunk_frames = CHUNK_SECONDS * self.record_rate
+        metrics = TickLoopMetrics(len(frames))
+        consumer_metrics = TickLoopMetrics(len(frames)) if pipeline_mode == 'async' else None
+        self.last_loop_metrics = (metrics, consumer_metrics)  # 出错时调用方仍可取到已计时的部分
+        self.last_collected_frame = None
+
+        def process(frame, state, frame_metrics):
+            frame_data = self.rows_from_state(state, frame, weather, density)
+            frame_metrics.mark('features')
+            recorder.append_rows(frame_data)
+            frame_metrics.mark('buffer')
+            despawned = self.update_active_vehicles(frame_data)
+            frame_metrics.mark('despawn', rpcs=1 if despawned else 0)
+            if on_chunk is not None and (frame + 1) % chunk_frames == 0:
+                on_chunk(frame + 1)
+                frame_metrics.mark('io')
+            self.last_collected_frame = frame
+            if on_progress is not None and (frame + 1) % (self.record_rate * 30) == 0:
+                on_progress(frame + 1)
+
+        self.sim_ticks = 0
+        if CAPTURE_MODE == 'recorder':
+            return self._tick_frames(frames, metrics, on_progress, on_tick), None
+
+        states = {}  # 最近读取的状态 {tick: state}（插值时前一个tick的状态可能已读取过）
+
+        def state_at(tick):
+            if tick not in states:
+                state, rpcs = self.grab_frame_state()
+                metrics.mark('fetch', rpcs=rpcs)
+                states[tick] = state
+                for old in [t for t in states if t < tick - 1]:
+                    del states[old]
+            return states[tick]
+
+        def advance(index):
+            """tick到第index个记录帧的时刻，返回该时刻的原始状态"""
+            tick, alpha = self.record_clock.position(index)
+            ticks = 0
+            while self.sim_ticks < tick:
+                if alpha < 1.0 and self.sim_ticks == tick - 1:
+                    metrics.mark('tick', rpcs=ticks)
+                    ticks = 0
+                    state_at(self.sim_ticks)
+                self.world.tick()
+                self.sim_ticks += 1
+                ticks += 1
+            metrics.mark('tick', rpcs=ticks)
+            if alpha < 1.0:
+                return InterpolatedState(state_at(tick - 1), state_at(tick), alpha)
+            return state_at(tick)
+
+        if pipeline_mode != 'async':
+            for index, frame in enumerate(frames, 1):
+                if on_tick is not None and on_tick(frame):
+                    break
+                metrics.start_frame()
+                state = advance(index)
+                process(frame, state, metrics)
+                metrics.end_frame()
+            return metrics, None
+
+        def consume(frame, state):
+            consumer_metrics.start_frame()
+            process(frame, state, consumer_metrics)
+            consumer_metrics.end_frame()
+
+        consumer = FrameConsumer(consume, max_pending=PIPELINE_QUEUE_FRAMES)
+        try:
+            for index, frame in enumerate(frames, 1):
+                if on_tick is not None and on_tick(frame):
+                    break
+                metrics.start_frame()
+                state = advance(index)
+                consumer.put(frame, state)
+                metrics.mark('queue')
+                metrics.end_frame()
+        finally:
+            # 出错时也先处理完已入队的帧，保证已采集数据不丢失
+            consumer.stop()
+        consumer.close()
+        return metrics, consumer_metrics
+
+    def _tick_frames(self, frames, metrics, on_progress=None, on_tick=None):
+        """
+        ⭐ recorder模式的采集循环: 状态由仿真器内置记录器写入日志，循环只tick
+
+        每秒用一次快照维护活跃集合（驶出销毁、核心区通过数），不读取逐帧数据
+        """
+        for index, frame in enumerate(frames, 1):
+            if on_tick is not None and on_tick(frame):
+                break
+            metrics.start_frame()
+            tick, _ = self.record_clock.position(index)
+            ticks = tick - self.sim_ticks
+            for _ in range(ticks):
+                self.world.tick()
+            self.sim_ticks = tick
+            metrics.mark('tick', rpcs=ticks)
+            if (frame + 1) % self.record_rate == 0:
+                self.refresh_active_vehicles(self.record_rate)
+                metrics.mark('despawn', rpcs=1)
+            self.last_collected_frame = frame
+            if on_progress is not None and (frame + 1) % (self.record_rate * 30) == 0:
+                on_progress(frame + 1)
+            metrics.end_frame()
+        return metrics
+
+    def start_recorder(self, scenario_id):
+        """
+        开始内置记录器（additional_data=True: 同时记录速度），返回日志路径
+
+        开始后先tick一次，使日志第1帧即采集循环开始时的状态（插值第一个记录帧时需要）
+        """
+        log_file = Path(RECORDER_DIR) / f'scenario_{scenario_id:03d}.log'
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        self.client.start_recorder(str(log_file.resolve()), True)
+        self.world.tick()
+        return log_file
+
+    def save_recorder_metadata(self, scenario_id, weather, density_name, log_file, start_frame, end_frame):
+        """
+        保存离线提取所需的元数据（scenario_XXX.recorder.json）:
+        actor id → 行为类型、天气、密度、帧率与帧数
+        """
+        metadata = {
+            'scenario_id': scenario_id,
+            'weather': weather,
+            'traffic_density': density_name,
+            'map': self.map_name,
+            'recorder_log': str(log_file.resolve()),
+            'sim_rate': self.sim_rate,
+            'record_rate': self.record_rate,
+            'record_mode': self.record_clock.mode,
+            'start_frame': start_frame,
+            'frames': end_frame - start_frame,
+            'sim_ticks': self.sim_ticks,
+            'lead_ticks': 1,  # 采集循环开始前的tick数（见start_recorder）
+            'track_id_offset': self.track_id_offset,
+            'behaviors': {str(vehicle_id): behavior for vehicle_id, behavior in self.vehicle_behaviors.items()},
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        save_metadata(recorder_meta_path(scenario_output_file(scenario_id)), metadata)
+        return metadata
+
+    def compare_capture_latency(self, num_frames, weather, density):
+        """
+        ⭐ 对比两种采集方式的每帧延迟
+
+        每帧tick一次，然后对同一帧分别用逐车RPC与快照方式采集，
+        统计延迟并检查两种方式的结果是否一致。
+        """
+        rpc_times = []
+        snapshot_times = []
+        mismatches = 0
+
+        for frame in range(num_frames):
+            self.world.tick()
+
+            t0 = time.perf_counter()
+            rpc_data = self.collect_frame_data(frame, weather, density)
+            t1 = time.perf_counter()
+            snapshot = self.world.get_snapshot()
+            snapshot_data = self.collect_frame_data_snapshot(snapshot, frame, weather, density)
+            t2 = time.perf_counter()
+
+            rpc_times.append(t1 - t0)
+            snapshot_times.append(t2 - t1)
+
+            rpc_rows = {row[1]: row for row in rpc_data}
+            for row in snapshot_data:
+                ref = rpc_rows.get(row[1])
+                if ref is None or abs(ref[2] - row[2]) > 1e-6 or abs(ref[3] - row[3]) > 1e-6:
+                    mismatches += 1
+
+        rpc_times = np.array(rpc_times) * 1000
+        snapshot_times = np.array(snapshot_times) * 1000
+        active = len(self.active_vehicles)
+
+        print(f"\n采集延迟对比 ({num_frames}帧, {active}辆车):")
+        print(f"  {'方式':<10} {'平均(ms)':>10} {'p50(ms)':>10} {'p95(ms)':>10} {'最大(ms)':>10}")
+        for name, times in [('rpc', rpc_times), ('snapshot', snapshot_times)]:
+            print(f"  {name:<10} {times.mean():>10.2f} {np.percentile(times, 50):>10.2f} "
+                  f"{np.percentile(times, 95):>10.2f} {times.max():>10.2f}")
+        if snapshot_times.mean() > 0:
+            print(f"  加速比: {rpc_times.mean() / snapshot_times.mean():.1f}x")
+        print(f"  不一致行数: {mismatches}")
+
+        return {
+            'rpc_ms': rpc_times,
+            'snapshot_ms': snapshot_times,
+            'mismatches': mismatches,
+        }
+
+    def compare_pipeline_throughput(self, num_frames, weather, density, density_config):
+        """
+        ⭐ 对比sync/async两种流水线的持续tick速率（数据只缓冲，不写盘）
+
+        两种方式各运行num_frames帧（同一批车辆继续行驶）。
+        """
+        results = {}
+        frame = 0
+        for mode in ['sync', 'async']:
+            recorder = ColumnarFrameRecorder.for_scenario(density_config, CHUNK_SECONDS, self.record_rate)
+            kinematics = self.new_kinematics_stage()
+
+            def on_chunk(next_frame):
+                kinematics.apply(recorder.take_dataframe())
+
+            t0 = time.perf_counter()
+            metrics, consumer_metrics = self.collect_frames(
+                range(frame, frame + num_frames), weather, density, recorder, on_chunk, pipeline_mode=mode
+            )
+            elapsed = time.perf_counter() - t0
+            frame += num_frames
+            results[mode] = {
+                'ticks_per_second': num_frames / elapsed if elapsed > 0 else 0.0,
+                'frame_latency_ms': metrics.frame_latency_ms(),
+                'consumer': consumer_metrics,
+            }
+
+        print(f"\n流水线吞吐对比 ({num_frames}帧/种, 活跃车辆 {len(self.active_vehicles)}辆):")
+        print(f"  {'方式':<8} {'帧/秒':>10} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10}")
+        for mode, result in results.items():
+            latency = result['frame_latency_ms']
+            print(f"  {mode:<8} {result['ticks_per_second']:>10.1f} {latency['p50']:>10.2f} "
+                  f"{latency['p95']:>10.2f} {latency['p99']:>10.2f}")
+        if results['sync']['ticks_per_second'] > 0:
+            print(f"  加速比: {results['async']['ticks_per_second'] / results['sync']['ticks_per_second']:.2f}x")
+
+        return results
+
+    def benchmark_profile(self, num_frames, weather, density, density_config):
+        """
+        ⭐ 在当前性能配置下spawn一个场景的车辆并运行num_frames帧（数据只缓冲，不写盘）
+
+        返回 tick速率、帧延迟、最长tick（卡顿）、车辆消失数等稳定性指标
+        """
+        t0 = time.perf_counter()
+        self.dynamic_spawn_traffic_mixed(density_config, weather)
+        spawn_seconds = time.perf_counter() - t0
+        spawned = len(self.active_vehicles) + self.active_vehicles.num_despawned + self.active_vehicles.num_dead
+
+        recorder = ColumnarFrameRecorder.for_scenario(density_config, CHUNK_SECONDS, self.record_rate)
+        kinematics = self.new_kinematics_stage()
+
+        def on_chunk(next_frame):
+            kinematics.apply(recorder.take_dataframe())
+
+        t0 = time.perf_counter()
+        metrics, _ = self.collect_frames(range(num_frames), weather, density, recorder, on_chunk,
+                                         pipeline_mode='sync')
+        elapsed = time.perf_counter() - t0
+        loop = metrics.to_dict()
+        return {
+            'frames': metrics.num_frames,
+            'ticks_per_second': metrics.num_frames / elapsed if elapsed > 0 else 0.0,
+            'frame_latency_ms': loop['frame_latency_ms'],
+            'tick_max_ms': loop['phases']['tick']['max'],
+            'spawn_seconds': spawn_seconds,
+            'vehicles_spawned': spawned,
+            'vehicles_active': len(self.active_vehicles),
+            'vehicles_vanished': self.active_vehicles.num_dead,
+        }
+
+    def measure_record_rate(self, seconds, weather, density, density_config):
+        """
+        ⭐ 在当前SIM_RATE/RECORD_RATE组合下spawn一个场景的车辆并采集seconds秒（数据只缓冲，不写盘）
+
+        返回 tick数、行数、每仿真秒行数与采集耗时
+        """
+        t0 = time.perf_counter()
+        self.dynamic_spawn_traffic_mixed(density_config, weather)
+        spawn_seconds = time.perf_counter() - t0
+
+        num_frames = seconds * self.record_rate
+        recorder = ColumnarFrameRecorder.for_scenario(density_config, CHUNK_SECONDS, self.record_rate)
+        kinematics = self.new_kinematics_stage()
+        rows = 0
+
+        def on_chunk(next_frame):
+            nonlocal rows
+            rows += len(kinematics.apply(recorder.take_dataframe()))
+
+        t0 = time.perf_counter()
+        metrics, _ = self.collect_frames(range(num_frames), weather, density, recorder, on_chunk,
+                                         pipeline_mode='sync')
+        on_chunk(num_frames)
+        collect_seconds = time.perf_counter() - t0
+        return {
+            'sim_rate': self.sim_rate,
+            'record_rate': self.record_rate,
+            'record_mode': self.record_clock.mode,
+            'frames': metrics.num_frames,
+            'sim_ticks': self.sim_ticks,
+            'rows': rows,
+            'rows_per_sim_second': rows / seconds if seconds > 0 else 0.0,
+            'collect_seconds': collect_seconds,
+            'spawn_seconds': spawn_seconds,
+            'total_seconds': collect_seconds + spawn_seconds,
+        }
+
+    def run_scenario(self, scenario_id, weather, density_name, density_config, seed=None, resume=False,
+                     continuing=False, keep_traffic=False):
         """
         运行单个场景（混合行为版本）
         注意：不再需要behavior参数，因为每个场景内部就是混合的
+
+        数据按CHUNK_SECONDS分块流式写入，返回ScenarioSummary（无数据时返回None）
+        seed: 场景随机种子（spawn点/车型/行为分配、交通管理器）
+        resume: 若存在未完成的.part文件，从最后写盘的块之后继续采集
+        continuing: 连续模式，沿用上一场景（同一密度）的车辆，只切换天气并稳定CONTINUOUS_SETTLE_TIME秒，
+                    不再预热和spawn
+        keep_traffic: 连续模式，结束后保留车辆给下一场景；采集期间持续补充车辆
         """
         print(f"\n{'=' * 70}")
         print(f"场景 {scenario_id + 1}/{TOTAL_SCENARIOS_MIXED}")
@@ -283,87 +931,307 @@ class MixedBehaviorCollector:
         print(f"  进度: {(scenario_id + 1) / TOTAL_SCENARIOS_MIXED * 100:.1f}%")
         print(f"{'=' * 70}")
 
-        self.set_weather(weather)
-        self.spawned_vehicles = []
-        self.vehicle_behaviors = {}
-
-        print(f"\n预热 {WARMUP_TIME}秒...")
-        for _ in range(WARMUP_TIME * FRAME_RATE):
-            self.world.tick()
-
-        # 动态spawn混合行为车辆
-        self.dynamic_spawn_traffic_mixed(density_config, weather)
+        if not continuing:
+            self.set_weather(weather)
+            self.active_vehicles = self.new_active_set()
+            self.vehicle_behaviors = {}
+        self.track_id_offset = 0
+        despawned_before = self.active_vehicles.num_despawned
+        dead_before = self.active_vehicles.num_dead
+
+        if seed is not None:
+            np.random.seed(seed)
+            self.traffic_manager.set_random_device_seed(seed)
+
+        output_file = scenario_output_file(scenario_id)
+        # ⭐ recorder模式: 数据在仿真器日志中，中断后只能整场重录
+        recording = CAPTURE_MODE == 'recorder'
+        writer = ChunkedScenarioWriter(output_file, resume=resume and not recording)
+        summary = ScenarioSummary(CORE_RADIUS)
+        start_frame = writer.next_frame
+        if writer.rows_written > 0:
+            # ⭐ 续采: 统计已写盘部分，新轨迹id排在已有轨迹之后
+            for chunk in pd.read_csv(writer.part_file, chunksize=100000, nrows=writer.rows_written):
+                summary.update(chunk)
+            self.track_id_offset = max(summary.tracks) + 1
+            print(f"\n⭐ 续采: 已有 {writer.rows_written:,}行，从第{start_frame}帧继续")
+
+        # ⭐ 列式记录器只保存一个块（CHUNK_SECONDS秒），写满后交给后台线程写盘
+        recorder = ColumnarFrameRecorder.for_scenario(density_config, CHUNK_SECONDS, self.record_rate)
+        # ⭐ 逐帧分阶段计时，结果写入 scenario_XXX.metrics.json
+        setup_metrics = TickLoopMetrics(0)
+        metrics = consumer_metrics = None
+        convert_time = 0.0
+        self.last_loop_metrics = (None, None)
+        self.last_collected_frame = None
+        self.kinematics = self.new_kinematics_stage()
+        self.adaptive_controller = None
+        self.stop_reason = None
+        pipeline_mode = None  # 实际使用的流水线模式（采集循环开始前中断时为None）
+
+        def on_chunk(next_frame):
+            nonlocal convert_time
+            convert_time += self._flush_chunk(recorder, writer, summary, next_frame)
 
-        print(f"\n开始采集 {SCENARIO_DURATION}秒...")
-        all_data = []
+        try:
+            if continuing:
+                # ⭐ 连续模式: 车辆保持行驶，切换天气后短暂稳定即开始采集
+                print(f"\n切换天气 → {weather}, 在场车辆 {len(self.active_vehicles)}辆, "
+                      f"稳定 {CONTINUOUS_SETTLE_TIME}秒...")
+                t0 = time.perf_counter()
+                self.switch_weather(weather)
+                self.settle(CONTINUOUS_SETTLE_TIME)
+                setup_metrics.record_setup('settle', time.perf_counter() - t0)
+            else:
+                print(f"\n预热 {WARMUP_TIME}秒...")
+                t0 = time.perf_counter()
+                for _ in range(WARMUP_TIME * self.sim_rate):
+                    self.world.tick()
+                setup_metrics.record_setup('warmup', time.perf_counter() - t0)
 
-        start_time = time.time()
+            on_tick = None
+            if ADAPTIVE_MODE:
+                # ⭐ 自适应: 不预先spawn，采集循环中按核心区通过数反馈spawn
+                on_tick, _ = self.adaptive_on_tick(density_config, weather, summary.num_core_tracks)
+            else:
+                if not continuing:
+                    # 动态spawn混合行为车辆
+                    t0 = time.perf_counter()
+                    self.dynamic_spawn_traffic_mixed(density_config, weather)
+                    setup_metrics.record_setup('spawn', time.perf_counter() - t0)
+                if continuing or keep_traffic:
+                    on_tick = self.steady_spawn_on_tick(density_config, weather)
+            # 采集循环中spawn会修改活跃集合，必须与帧处理在同一线程；recorder模式的循环只tick
+            pipeline_mode = PIPELINE_MODE if on_tick is None and not recording else 'sync'
+
+            print(f"\n开始采集 {SCENARIO_DURATION}秒... (流水线: {pipeline_mode}"
+                  f"{', 自适应' if ADAPTIVE_MODE else ''}{', 连续' if continuing or keep_traffic else ''})")
+            start_time = time.time()
+
+            total_frames = SCENARIO_DURATION * self.record_rate
+
+            def on_progress(next_frame):
+                elapsed = time.time() - start_time
+                progress = next_frame / total_frames * 100
+                print(f"  进度: {progress:.0f}%, 活跃车辆: {len(self.active_vehicles)}, "
+                      f"已销毁(驶出) {self.active_vehicles.num_despawned}, 用时: {elapsed:.0f}秒")
 
-        for frame in range(SCENARIO_DURATION * FRAME_RATE):
-            self.world.tick()
+            log_file = self.start_recorder(scenario_id) if recording else None
 
             # ⭐ 不需要传behavior，每辆车自己有行为类型
-            frame_data = self.collect_frame_data(
-                frame, weather, density_name
+            metrics, consumer_metrics = self.collect_frames(
+                range(start_frame, total_frames), weather, density_name, recorder, on_chunk, on_progress,
+                on_tick=on_tick, pipeline_mode=pipeline_mode
             )
-            all_data.extend(frame_data)
 
-            if (frame + 1) % (FRAME_RATE * 30) == 0:
-                elapsed = time.time() - start_time
-                progress = (frame + 1) / (SCENARIO_DURATION * FRAME_RATE) * 100
-                active_vehicles = len([v for v in self.spawned_vehicles if v.is_alive])
-                print(f"  进度: {progress:.0f}%, 活跃车辆: {active_vehicles}, 用时: {elapsed:.0f}秒")
+            end_frame = start_frame if self.last_collected_frame is None else self.last_collected_frame + 1
+            if recording:
+                self.client.stop_recorder()
+                capture = self.save_recorder_metadata(scenario_id, weather, density_name, log_file,
+                                                      start_frame, end_frame)
+            else:
+                convert_time += self._flush_chunk(recorder, writer, summary, end_frame)
+        except:
+            if recording:
+                try:
+                    self.client.stop_recorder()
+                except:
+                    pass
+                writer.discard()
+                print("\n⚠️ 场景中断（recorder模式需整场重录）")
+                metrics, consumer_metrics = self.last_loop_metrics
+                self._save_metrics(metrics or setup_metrics, consumer_metrics, setup_metrics, writer,
+                                   output_file, scenario_id, weather, density_name, convert_time,
+                                   pipeline_mode, status='interrupted')
+                raise
+            # ⭐ 仿真崩溃: 保留已采集的块（最后不完整的块也写盘）
+            next_frame = start_frame if self.last_collected_frame is None else self.last_collected_frame + 1
+            self._flush_chunk(recorder, writer, summary, next_frame)
+            part_file = writer.abort()
+            print(f"\n⚠️ 场景中断，已保存 {writer.rows_written:,}行 → {part_file}")
+            metrics, consumer_metrics = self.last_loop_metrics
+            self._save_metrics(metrics or setup_metrics, consumer_metrics, setup_metrics, writer, output_file,
+                               scenario_id, weather, density_name, convert_time, pipeline_mode,
+                               status='interrupted')
+            raise
 
         elapsed = time.time() - start_time
 
-        print("\n清理车辆...")
-        for vehicle in self.spawned_vehicles:
-            try:
-                vehicle.destroy()
-            except:
-                pass
-        self.spawned_vehicles = []
-        self.vehicle_behaviors = {}
-
-        if not all_data:
+        num_despawned = self.active_vehicles.num_despawned - despawned_before
+        num_dead = self.active_vehicles.num_dead - dead_before
+        if keep_traffic:
+            print(f"\n保留 {len(self.active_vehicles)}辆车进入下一场景")
+        else:
+            print("\n清理车辆...")
+            self.destroy_vehicles(self.active_vehicles.ids())
+            self.active_vehicles = self.new_active_set()
+            self.vehicle_behaviors = {}
+
+        if recording:
+            writer.discard()
+            print(f"\n✅ 录制完成 ({elapsed:.1f}秒): {end_frame - start_frame}帧, {self.sim_ticks:,} tick, "
+                  f"{len(capture['behaviors'])}辆车 → {log_file}")
+            print(f"   活跃集合: 驶出后销毁 {num_despawned}辆, 失效移除 {num_dead}辆")
+            metrics.print_summary()
+            metrics_file = self._save_metrics(metrics, consumer_metrics, setup_metrics, writer, output_file,
+                                              scenario_id, weather, density_name, convert_time,
+                                              pipeline_mode, status='recorded', rows=0)
+            print(f"   计时指标 → {metrics_file}")
+            print(f"   使用 1extract_recorder_logs.py 生成 {output_file.name}")
+            return capture
+
+        if summary.rows == 0:
+            writer.discard()
             print("❌ 未采集到数据")
             return None
 
-        df = pd.DataFrame(all_data)
-        output_file = Path(RAW_DATA_DIR) / f'scenario_{scenario_id:03d}.csv'
-        df.to_csv(output_file, index=False)
+        writer.close()
 
         # 统计（按行为类型分别统计）
-        unique_tracks = df['trackId'].nunique()
-        avg_speed = df['speed'].mean()
-
-        core_tracks = df[df['radius'] <= 25]['trackId'].nunique()
         target = density_config['target_passages']
-
-        # 统计各行为类型的轨迹数
-        behavior_counts = df.groupby('behavior_type')['trackId'].nunique()
+        avg_speed = summary.avg_speed
 
         print(f"\n✅ 完成 ({elapsed:.1f}秒)")
-        print(f"   采集数据: {len(df):,}行")
-        print(f"   总轨迹数: {unique_tracks}条")
+        print(f"   采集数据: {summary.rows:,}行 ({writer.chunks_written}块)")
+        recorded_seconds = (end_frame - start_frame) / self.record_rate
+        if recorded_seconds > 0:
+            print(f"   频率: 仿真 {self.sim_rate}Hz / 记录 {self.record_rate}Hz ({self.record_clock.mode}), "
+                  f"{self.sim_ticks:,} tick, {summary.rows / recorded_seconds:.0f}行/仿真秒")
+        print(f"   总轨迹数: {summary.num_tracks}条")
         print(f"   行为分布: ", end="")
-        for behavior, count in behavior_counts.items():
+        for behavior, count in summary.behavior_counts().items():
             print(f"{behavior} {count}条, ", end="")
         print()
-        print(f"   核心区轨迹: {core_tracks}条 (目标{target}条)")
+        print(f"   核心区轨迹: {summary.num_core_tracks}条 (目标{target}条)")
         print(f"   平均速度: {avg_speed:.2f} m/s ({avg_speed * 3.6:.1f} km/h)")
+        print(f"   活跃集合: 驶出后销毁 {num_despawned}辆, 失效移除 {num_dead}辆")
+        if self.adaptive_controller is not None:
+            controller = self.adaptive_controller
+            stop = {'target': '达到目标', 'stalled': '无新通过'}.get(self.stop_reason, '达到最长时长')
+            print(f"   自适应: 采集 {(end_frame - start_frame) / self.record_rate:.0f}秒后结束（{stop}）, "
+                  f"spawn {controller.spawned}辆/{controller.batches}批")
+        metrics.print_summary()
+        if consumer_metrics is not None:
+            consumer_metrics.print_summary('处理线程')
+        peak_rss = peak_rss_mb()
+        print(f"   DataFrame转换: {convert_time * 1000:.1f} ms "
+              f"(块容量 {recorder.capacity:,}行, 峰值内存 "
+              f"{f'{peak_rss:.0f} MB' if peak_rss is not None else 'N/A'})")
+        metrics_file = self._save_metrics(metrics, consumer_metrics, setup_metrics, writer, output_file,
+                                          scenario_id, weather, density_name, convert_time,
+                                          pipeline_mode, status='done', rows=summary.rows)
+        print(f"   计时指标 → {metrics_file}")
+
+        return summary
+
+    def _save_metrics(self, metrics, consumer_metrics, setup_metrics, writer, output_file, scenario_id,
+                      weather, density_name, convert_time, pipeline_mode, status, rows=None):
+        """
+        把本场景的计时指标写到CSV旁边（async模式下附带处理线程的计时）
 
-        return df
+        pipeline_mode: 本场景实际使用的模式（自适应/连续/recorder模式强制sync，不一定等于PIPELINE_MODE）
+        """
+        metrics.setup_seconds.update(setup_metrics.setup_seconds)
+        peak_rss = peak_rss_mb()
+        return metrics.save(metrics_path(output_file), {
+            'scenario_id': scenario_id,
+            'status': status,
+            'weather': weather,
+            'traffic_density': density_name,
+            'capture_mode': CAPTURE_MODE,
+            'pipeline_mode': pipeline_mode,
+            'performance_profile': self.performance_profile,
+            'frame_rate': self.record_rate,
+            'sim_rate': self.sim_rate,
+            'record_rate': self.record_rate,
+            'record_mode': self.record_clock.mode,
+            'sim_ticks': self.sim_ticks,
+            'rows': writer.rows_written if rows is None else rows,
+            'convert_seconds': convert_time,
+            'writer_thread_seconds': writer.write_seconds,
+            'peak_rss_mb': peak_rss,
+            'consumer': consumer_metrics.to_dict() if consumer_metrics is not None else None,
+            'stop_reason': self.stop_reason,
+            'adaptive': self.adaptive_controller.summary() if self.adaptive_controller is not None else None,
+        })
+
+    def adaptive_on_tick(self, density_config, weather_type, initial_passages=0):
+        """
+        ⭐ 自适应模式的逐帧回调: 按核心区通过数决定spawn，达到目标后结束
+
+        initial_passages: 续采时已写盘部分的核心区轨迹数
+        返回 (on_tick, controller)
+        """
+        controller = AdaptiveSpawnController(
+            density_config, self.record_rate, SCENARIO_DURATION,
+            min_duration=ADAPTIVE_MIN_DURATION, stall_time=ADAPTIVE_STALL_TIME,
+            lookahead=ADAPTIVE_LOOKAHEAD,
+        )
+        spawn_index = self.get_outer_ring_spawn_points()
+        active = self.active_vehicles
+        # 连续模式下活跃集合跨场景保留，只统计本场景开始后的通过数
+        baseline = active.num_core_passages
+        self.adaptive_controller = controller
+        self.stop_reason = None
+
+        def on_tick(frame):
+            passages = initial_passages + active.num_core_passages - baseline
+            reason = controller.stop_reason(frame, passages)
+            if reason is not None:
+                self.stop_reason = reason
+                return True
+
+            count = controller.spawn_request(frame, passages, active.num_approaching)
+            if count > 0 and len(spawn_index) > 0:
+                vehicles = self.spawn_batch_mixed_sync(count, spawn_index, weather_type, tick=False)
+                controller.record_spawn(count, len(vehicles))
+                print(f"  [{frame / self.record_rate:5.0f}s] 核心区通过 {passages}/{controller.target}, "
+                      f"驶入中 {active.num_approaching - len(vehicles)}, spawn {len(vehicles)}/{count}辆, "
+                      f"下次间隔 {controller.interval:.1f}秒")
+            return False
+
+        return on_tick, controller
+
+    def steady_spawn_on_tick(self, density_config, weather_type):
+        """
+        ⭐ 连续模式的逐帧回调: 采集期间按 spawn_per_batch / batch_interval 持续补充车辆
+
+        在场车辆不超过spawn_total，保持与spawn阶段结束时相同的密度。
+        """
+        spawn_index = self.get_outer_ring_spawn_points()
+        interval_frames = density_config.get('batch_interval', 15) * self.record_rate
+        spawn_per_batch = density_config['spawn_per_batch']
+        spawn_total = density_config['spawn_total']
+
+        def on_tick(frame):
+            if frame % interval_frames == 0 and len(spawn_index) > 0:
+                count = min(spawn_per_batch, spawn_total - len(self.active_vehicles))
+                if count > 0:
+                    self.spawn_batch_mixed_sync(count, spawn_index, weather_type, tick=False)
+            return False
+
+        return on_tick
+
+    def new_kinematics_stage(self):
+        return KinematicsStage(ROUNDABOUT_CENTER.x, ROUNDABOUT_CENTER.y, self.record_rate, EXTRA_FEATURES)
+
+    def _flush_chunk(self, recorder, writer, summary, next_frame):
+        """计算本块派生列后交给写盘线程，返回转换耗时"""
+        if len(recorder) == 0:
+            return 0.0
+        t0 = time.perf_counter()
+        chunk = self.kinematics.apply(recorder.take_dataframe())
+        convert_time = time.perf_counter() - t0
+        summary.update(chunk)
+        writer.write(chunk, next_frame)
+        return convert_time
 
     def cleanup(self):
         """清理资源"""
         print("\n清理环境...")
 
-        for vehicle in self.spawned_vehicles:
-            try:
-                vehicle.destroy()
-            except:
-                pass
+        self.destroy_vehicles(self.active_vehicles.ids())
+        self.active_vehicles = self.new_active_set()
 
         vehicles = self.world.get_actors().filter('vehicle.*')
         for vehicle in vehicles:
@@ -371,9 +1239,11 @@ class MixedBehaviorCollector:
                 vehicle.destroy()
             except:
                 pass
+        self.hybrid_anchor = None
 
         settings = self.world.get_settings()
         settings.synchronous_mode = False
+        settings.no_rendering_mode = False
         self.world.apply_settings(settings)
 
         print("✅ 清理完成")
@@ -383,7 +1253,335 @@ class MixedBehaviorCollector:
 TOTAL_SCENARIOS_MIXED = len(WEATHER_TYPES) * len(TRAFFIC_DENSITIES)
 
 
+def scenario_output_file(scenario_id):
+    """scenario_XXX.parquet / scenario_XXX.csv（按DATA_FORMAT）"""
+    return data_path(RAW_DATA_DIR, f'scenario_{scenario_id:03d}', DATA_FORMAT)
+
+
+def build_scenarios():
+    """⭐ 生成场景配置（只有天气×密度，没有行为维度）"""
+    scenarios = []
+    scenario_id = 0
+    for weather in WEATHER_TYPES:
+        for density_name, density_config in TRAFFIC_DENSITIES.items():
+            scenarios.append({
+                'id': scenario_id,
+                'weather': weather,
+                'density_name': density_name,
+                'density_config': density_config,
+                'seed': CAMPAIGN_SEED + scenario_id,
+            })
+            scenario_id += 1
+    return scenarios
+
+
+def frames_flushed(scenario_id):
+    """已写盘（可续采）的帧数"""
+    progress = read_progress(scenario_output_file(scenario_id))
+    return progress['next_frame'] if progress else 0
+
+
+def mark_result(manifest, scenario_id, result, elapsed):
+    """记录场景结果: ScenarioSummary → done；recorder元数据 → recorded（待离线提取）；None → 中断"""
+    if result is None:
+        manifest.mark_interrupted(scenario_id, '未采集到数据', elapsed=elapsed)
+    elif isinstance(result, dict):
+        manifest.mark_recorded(scenario_id, recorder_meta_path(scenario_output_file(scenario_id)), elapsed)
+    else:
+        manifest.mark_done(scenario_id, scenario_output_file(scenario_id), result, elapsed)
+
+
+def run_sequential(scenarios, endpoint, manifest, resume=False):
+    """单个仿真端点上依次运行场景（结果记录在manifest中）"""
+    collector = MixedBehaviorCollector(endpoint['host'], endpoint['port'], endpoint['tm_port'])
+    collector.setup_world()
+
+    for scenario in scenarios:
+        manifest.mark_running(scenario['id'])
+        start = time.time()
+        try:
+            summary = collector.run_scenario(
+                scenario['id'],
+                scenario['weather'],
+                scenario['density_name'],
+                scenario['density_config'],
+                seed=scenario['seed'],
+                resume=resume,
+            )
+            mark_result(manifest, scenario['id'], summary, time.time() - start)
+        except Exception as e:
+            print(f"❌ 场景 {scenario['id']} 失败: {e}")
+            manifest.mark_interrupted(scenario['id'], f'{type(e).__name__}: {e}',
+                                      frames_flushed(scenario['id']), time.time() - start)
+            import traceback
+            traceback.print_exc()
+            continue
+
+    collector.cleanup()
+
+
+def run_continuous(scenarios, endpoint, manifest):
+    """
+    ⭐ 连续模式: 同一密度的场景共用一批车辆
+
+    每个密度只预热并spawn一次；之后的场景只切换天气、重新设置车辆速度偏移，
+    稳定CONTINUOUS_SETTLE_TIME秒后直接采集，各场景仍写入各自的scenario_XXX.parquet/.csv（按DATA_FORMAT）。
+    场景失败时清空车辆，下一个场景重新预热和spawn。
+    （未完成的场景从头采集，不从.part续采: 续采时车流状态已无法还原）
+    """
+    collector = MixedBehaviorCollector(endpoint['host'], endpoint['port'], endpoint['tm_port'])
+    collector.setup_world()
+
+    groups = {}
+    for scenario in scenarios:
+        groups.setdefault(scenario['density_name'], []).append(scenario)
+
+    for density_name, group in groups.items():
+        print(f"\n连续采集: {density_name}, {len(group)}个场景 "
+              f"({', '.join(scenario['weather'] for scenario in group)})")
+        continuing = False
+        for i, scenario in enumerate(group):
+            manifest.mark_running(scenario['id'])
+            start = time.time()
+            keep_traffic = i < len(group) - 1
+            try:
+                summary = collector.run_scenario(
+                    scenario['id'],
+                    scenario['weather'],
+                    scenario['density_name'],
+                    scenario['density_config'],
+                    seed=scenario['seed'],
+                    continuing=continuing,
+                    keep_traffic=keep_traffic,
+                )
+                mark_result(manifest, scenario['id'], summary, time.time() - start)
+                continuing = keep_traffic
+            except Exception as e:
+                print(f"❌ 场景 {scenario['id']} 失败: {e}")
+                manifest.mark_interrupted(scenario['id'], f'{type(e).__name__}: {e}',
+                                          frames_flushed(scenario['id']), time.time() - start)
+                import traceback
+                traceback.print_exc()
+                # 车流状态未知，下一个场景重新开始
+                collector.destroy_vehicles(collector.active_vehicles.ids())
+                collector.active_vehicles = collector.new_active_set()
+                continuing = False
+
+    collector.cleanup()
+
+
+class CollectorRunner:
+    """并行调度中每个工作进程持有的执行器（一个端点一个采集器）"""
+
+    def __init__(self, endpoint):
+        self.collector = MixedBehaviorCollector(endpoint['host'], endpoint['port'], endpoint['tm_port'])
+        self.collector.setup_world()
+
+    def run(self, scenario):
+        # 调度器重试时从已写盘的块继续
+        resume = scenario.get('resume', False) or scenario.get('attempt', 0) > 0
+        summary = self.collector.run_scenario(
+            scenario['id'],
+            scenario['weather'],
+            scenario['density_name'],
+            scenario['density_config'],
+            seed=scenario['seed'],
+            resume=resume,
+        )
+        if summary is None:
+            raise RuntimeError('未采集到数据')
+        return summary
+
+    def close(self):
+        self.collector.cleanup()
+
+
+def run_parallel(scenarios, endpoints, manifest, resume=False):
+    """⭐ 多个仿真端点并行运行（结果记录在manifest中）"""
+    print(f"\n并行采集: {len(endpoints)}个仿真端点")
+
+    def on_result(record):
+        scenario_id = record['scenario_id']
+        if record['status'] == 'running':
+            manifest.mark_running(scenario_id)
+        elif record['status'] == 'done':
+            mark_result(manifest, scenario_id, record['result'], record['elapsed'])
+        else:
+            manifest.mark_interrupted(scenario_id, record['error'], frames_flushed(scenario_id),
+                                      record['elapsed'])
+
+    tasks = [dict(scenario, resume=resume) for scenario in scenarios]
+    scheduler = ParallelScenarioScheduler(endpoints, CollectorRunner, retries=SCENARIO_RETRIES,
+                                          on_result=on_result)
+    records = scheduler.run(tasks)
+
+    for scenario_id, record in sorted(records.items()):
+        if record['status'] == 'done':
+            print(f"  ✓ 场景 {scenario_id:03d}: {record['endpoint']}, "
+                  f"{record['elapsed']:.0f}秒, 尝试{record['attempt'] + 1}次")
+        else:
+            print(f"  ✗ 场景 {scenario_id:03d}: {record['error']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='CARLA 环岛数据采集 - 混合行为版本')
+    parser.add_argument('--compare-capture', type=int, default=0, metavar='FRAMES',
+                        help='只运行采集延迟对比: spawn一个场景后对比rpc/snapshot两种方式FRAMES帧')
+    parser.add_argument('--compare-pipeline', type=int, default=0, metavar='FRAMES',
+                        help='只运行流水线吞吐对比: spawn一个场景后sync/async各运行FRAMES帧')
+    parser.add_argument('--density', default='very_dense', choices=list(TRAFFIC_DENSITIES.keys()),
+                        help='延迟/吞吐/频率对比使用的密度（默认very_dense）')
+    parser.add_argument('--benchmark-profiles', type=int, default=0, metavar='FRAMES',
+                        help='只运行性能配置基准: 每个 性能配置 × 密度 运行FRAMES帧并记录tick速率与稳定性')
+    parser.add_argument('--profiles', default='',
+                        help='性能基准的配置列表（逗号分隔，默认PERFORMANCE_PROFILES全部）')
+    parser.add_argument('--densities', default='',
+                        help='性能基准的密度列表（逗号分隔，默认dense,very_dense）')
+    parser.add_argument('--compare-rates', type=int, default=0, metavar='SECONDS',
+                        help='只运行频率组合对比: 每个 仿真:记录 频率组合采集SECONDS秒，报告行数与耗时')
+    parser.add_argument('--rates', default='10:10,20:10,10:25,50:25',
+                        help='频率组合列表 SIM_RATE:RECORD_RATE,...（默认10:10,20:10,10:25,50:25）')
+    parser.add_argument('--endpoints', default='',
+                        help='仿真端点列表 host:port:tm_port,...（多于1个时并行采集，默认SIMULATOR_ENDPOINTS）')
+    parser.add_argument('--resume', action='store_true',
+                        help='断点续采: 跳过已完成场景，未完成场景从最后写盘的块继续')
+    parser.add_argument('--continuous', action='store_true', default=CONTINUOUS_MODE,
+                        help='连续模式: 同一密度的场景共用车流，只在第一个场景预热和spawn')
+    return parser.parse_args()
+
+
+def compare_capture(num_frames, density_name):
+    """⭐ 采集方式延迟对比（不保存数据）"""
+    weather = WEATHER_TYPES[0]
+    endpoint = SIMULATOR_ENDPOINTS[0]
+    collector = MixedBehaviorCollector(endpoint['host'], endpoint['port'], endpoint['tm_port'])
+    collector.setup_world()
+    collector.set_weather(weather)
+    collector.dynamic_spawn_traffic_mixed(TRAFFIC_DENSITIES[density_name], weather)
+    collector.compare_capture_latency(num_frames, weather, density_name)
+    collector.cleanup()
+
+
+def compare_pipeline(num_frames, density_name):
+    """⭐ sync/async流水线吞吐对比（不保存数据）"""
+    weather = WEATHER_TYPES[0]
+    endpoint = SIMULATOR_ENDPOINTS[0]
+    collector = MixedBehaviorCollector(endpoint['host'], endpoint['port'], endpoint['tm_port'])
+    collector.setup_world()
+    collector.set_weather(weather)
+    density_config = TRAFFIC_DENSITIES[density_name]
+    collector.dynamic_spawn_traffic_mixed(density_config, weather)
+    collector.compare_pipeline_throughput(num_frames, weather, density_name, density_config)
+    collector.cleanup()
+
+
+def benchmark_profiles(num_frames, profile_names, density_names):
+    """
+    ⭐ 性能配置基准: 每个 性能配置 × 密度 重新加载地图、spawn车辆并运行num_frames帧
+
+    记录tick速率与稳定性（崩溃/超时、最长tick、车辆消失数），
+    结果写入 RAW_DATA_DIR/profile_benchmark.json，用于为LOS E及以上选择配置
+    """
+    weather = WEATHER_TYPES[0]
+    endpoint = SIMULATOR_ENDPOINTS[0]
+    results = []
+    for profile_name in profile_names:
+        for density_name in density_names:
+            print(f"\n{'=' * 80}\n性能基准: {profile_name} × {density_name}\n{'=' * 80}")
+            result = {'profile': profile_name, 'density': density_name, 'status': 'ok', 'error': None}
+            collector = None
+            try:
+                collector = MixedBehaviorCollector(endpoint['host'], endpoint['port'], endpoint['tm_port'])
+                collector.setup_world(profile_name)
+                collector.set_weather(weather)
+                result.update(collector.benchmark_profile(
+                    num_frames, weather, density_name, TRAFFIC_DENSITIES[density_name]
+                ))
+            except Exception as e:
+                # 仿真器崩溃或超时也是结果的一部分，继续测下一个组合
+                print(f"❌ {profile_name} × {density_name} 失败: {e}")
+                result['status'] = 'crashed'
+                result['error'] = f'{type(e).__name__}: {e}'
+            finally:
+                if collector is not None and collector.world is not None:
+                    try:
+                        collector.cleanup()
+                    except:
+                        pass
+            results.append(result)
+
+    output_file = Path(RAW_DATA_DIR) / 'profile_benchmark.json'
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'frames': num_frames, 'frame_rate': FRAME_RATE, 'results': results}, f,
+                  indent=2, ensure_ascii=False)
+
+    print(f"\n性能配置基准 ({num_frames}帧/组合):")
+    print(f"  {'配置':<14} {'密度':<12} {'状态':<8} {'帧/秒':>8} {'p99(ms)':>9} {'最长tick(ms)':>13} "
+          f"{'spawn/在场/消失':>16}")
+    for r in results:
+        if r['status'] != 'ok':
+            print(f"  {r['profile']:<14} {r['density']:<12} {r['status']:<8} {r['error']}")
+            continue
+        vehicles = f"{r['vehicles_spawned']}/{r['vehicles_active']}/{r['vehicles_vanished']}"
+        print(f"  {r['profile']:<14} {r['density']:<12} {r['status']:<8} {r['ticks_per_second']:>8.1f} "
+              f"{r['frame_latency_ms']['p99']:>9.2f} {r['tick_max_ms']:>13.2f} {vehicles:>16}")
+    print(f"\n✅ 结果已保存: {output_file}")
+    return results
+
+
+def compare_rates(seconds, rate_pairs, density_name):
+    """
+    ⭐ 仿真/记录频率组合对比: 每个 SIM_RATE:RECORD_RATE 组合重新加载地图、spawn并采集seconds秒
+
+    整数倍组合用'decimate'，其余用'interpolate'；结果写入 RAW_DATA_DIR/rate_comparison.json
+    """
+    weather = WEATHER_TYPES[0]
+    endpoint = SIMULATOR_ENDPOINTS[0]
+    density_config = TRAFFIC_DENSITIES[density_name]
+    results = []
+    for sim_rate, record_rate in rate_pairs:
+        record_mode = 'decimate' if sim_rate % record_rate == 0 else 'interpolate'
+        print(f"\n{'=' * 80}\n频率组合: 仿真 {sim_rate}Hz / 记录 {record_rate}Hz ({record_mode})\n{'=' * 80}")
+        collector = MixedBehaviorCollector(endpoint['host'], endpoint['port'], endpoint['tm_port'],
+                                           sim_rate=sim_rate, record_rate=record_rate, record_mode=record_mode)
+        collector.setup_world()
+        collector.set_weather(weather)
+        results.append(collector.measure_record_rate(seconds, weather, density_name, density_config))
+        collector.cleanup()
+
+    output_file = Path(RAW_DATA_DIR) / 'rate_comparison.json'
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'seconds': seconds, 'density': density_name, 'results': results}, f,
+                  indent=2, ensure_ascii=False)
+
+    print(f"\n频率组合对比 ({seconds}秒仿真时间, {density_name}):")
+    print(f"  {'仿真/记录':<12} {'方式':<12} {'tick':>8} {'行数':>10} {'行/仿真秒':>10} {'采集(秒)':>10} {'总计(秒)':>10}")
+    for r in results:
+        rates = f"{r['sim_rate']}/{r['record_rate']}Hz"
+        print(f"  {rates:<12} {r['record_mode']:<12} {r['sim_ticks']:>8} {r['rows']:>10,} "
+              f"{r['rows_per_sim_second']:>10.0f} {r['collect_seconds']:>10.2f} {r['total_seconds']:>10.2f}")
+    print(f"\n✅ 结果已保存: {output_file}")
+    return results
+
+
 def main():
+    args = parse_args()
+    if args.compare_rates > 0:
+        pairs = [tuple(int(v) for v in pair.split(':')) for pair in args.rates.split(',')]
+        compare_rates(args.compare_rates, pairs, args.density)
+        return
+    if args.benchmark_profiles > 0:
+        profiles = args.profiles.split(',') if args.profiles else list(PERFORMANCE_PROFILES.keys())
+        densities = args.densities.split(',') if args.densities else ['dense', 'very_dense']
+        benchmark_profiles(args.benchmark_profiles, profiles, densities)
+        return
+    if args.compare_capture > 0:
+        compare_capture(args.compare_capture, args.density)
+        return
+    if args.compare_pipeline > 0:
+        compare_pipeline(args.compare_pipeline, args.density)
+        return
+
     print("=" * 80)
     print("CARLA 环岛数据采集 - 混合行为版本")
     print("=" * 80)
@@ -405,50 +1603,48 @@ def main():
         print("已取消")
         return
 
-    collector = MixedBehaviorCollector()
-    collector.setup_world()
+    scenarios = build_scenarios()
+    endpoints = parse_endpoints(args.endpoints) if args.endpoints else SIMULATOR_ENDPOINTS
 
-    # ⭐ 生成场景配置（只有天气×密度，没有行为维度）
-    scenarios = []
-    scenario_id = 0
-    for weather in WEATHER_TYPES:
-        for density_name, density_config in TRAFFIC_DENSITIES.items():
-            scenarios.append({
-                'id': scenario_id,
-                'weather': weather,
-                'density_name': density_name,
-                'density_config': density_config,
-            })
-            scenario_id += 1
+    Path(RAW_DATA_DIR).mkdir(parents=True, exist_ok=True)
+    manifest = CampaignManifest.open(RAW_DATA_DIR, scenarios, resume=args.resume)
+
+    # ⭐ 断点续采: 跳过已完成（且输出文件哈希一致）的场景
+    todo = [s for s in scenarios if not manifest.is_done(s['id'], scenario_output_file(s['id']))
+            and not manifest.is_recorded(s['id'], recorder_meta_path(scenario_output_file(s['id'])))]
+    if args.resume:
+        partial = [s['id'] for s in todo if frames_flushed(s['id']) > 0]
+        print(f"\n断点续采: 已完成 {len(scenarios) - len(todo)}个, "
+              f"待采集 {len(todo)}个 (其中{len(partial)}个从已写盘的块继续)")
+
+    start_time = time.time()
+
+    if args.continuous and todo:
+        if len(endpoints) > 1:
+            print(f"  ⚠️ 连续模式只使用第一个仿真端点 ({endpoints[0]['host']}:{endpoints[0]['port']})")
+        run_continuous(todo, endpoints[0], manifest)
+    elif len(endpoints) > 1:
+        run_parallel(todo, endpoints, manifest, resume=args.resume)
+    elif todo:
+        run_sequential(todo, endpoints[0], manifest, resume=args.resume)
 
     successful = 0
-    failed = 0
+    recorded = 0
+    failed = 0  # 中断、失败或未运行（--resume会重跑）
     total_core_tracks = 0
     total_target = 0
 
-    start_time = time.time()
-
     for scenario in scenarios:
-        try:
-            df = collector.run_scenario(
-                scenario['id'],
-                scenario['weather'],
-                scenario['density_name'],
-                scenario['density_config']
-            )
-            if df is not None:
-                successful += 1
-                core_tracks = df[df['radius'] <= 25]['trackId'].nunique()
-                total_core_tracks += core_tracks
-                total_target += scenario['density_config']['target_passages']
-            else:
-                failed += 1
-        except Exception as e:
-            print(f"❌ 场景 {scenario['id']} 失败: {e}")
+        entry = manifest.entry(scenario['id'])
+        if entry.get('status') == 'done':
+            successful += 1
+            total_core_tracks += entry['core_tracks']
+            total_target += scenario['density_config']['target_passages']
+        elif manifest.is_recorded(scenario['id'], recorder_meta_path(scenario_output_file(scenario['id']))):
+            # recorder模式: 已录制，等待1extract_recorder_logs.py提取（--resume不会重跑）
+            recorded += 1
+        else:
             failed += 1
-            import traceback
-            traceback.print_exc()
-            continue
 
     total_time = time.time() - start_time
     achievement_rate = total_core_tracks / total_target * 100 if total_target > 0 else 0
@@ -458,20 +1654,23 @@ def main():
     print("=" * 80)
     print(f"\n统计:")
     print(f"  成功: {successful}/{TOTAL_SCENARIOS_MIXED} 场景")
+    if recorded:
+        print(f"  已录制待提取: {recorded}/{TOTAL_SCENARIOS_MIXED} 场景（运行 1extract_recorder_logs.py 生成数据文件）")
     print(f"  失败: {failed}/{TOTAL_SCENARIOS_MIXED} 场景")
     print(f"  总核心区轨迹: {total_core_tracks}条")
     print(f"  总目标轨迹: {total_target}条")
     print(f"  达成率: {achievement_rate:.1f}%")
     print(f"  实际时长: {total_time / 60:.1f} 分钟 ({total_time / 3600:.1f} 小时)")
     print(f"\n数据位置: {RAW_DATA_DIR}")
+    print(f"任务清单: {manifest.path}")
+    if failed:
+        print(f"  ⚠️ 有{failed}个场景未完成，可使用 --resume 只重跑这些场景")
 
     print(f"\n优势:")
     print(f"  ✅ 场景数减少: 75 → 25 (节省67%时间)")
     print(f"  ✅ 更真实: 混合行为符合真实交通流")
     print(f"  ✅ 轨迹数相同: 每场景3倍轨迹数")
 
-    collector.cleanup()
-
 
 if __name__ == '__main__':
     try:
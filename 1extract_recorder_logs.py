@@ -0,0 +1,176 @@
+# scripts/1extract_recorder_logs.py
+"""
+从内置记录器日志生成场景数据（CAPTURE_MODE = 'recorder' 的第二步）
+✅ 每个场景先用 show_recorder_file_info 导出日志文本（需要一个仿真器，按场景缓存为 scenario_XXX.recorder.txt）
+✅ 多进程并行解析，输出与实时采集相同的 scenario_XXX.parquet/.csv（按DATA_FORMAT；列、行为类型、分块原子写入）
+✅ 完成后在任务清单中标记为done（含输出文件哈希）
+✅ 已导出的文本可在没有仿真器的机器上提取（或用carla_replay替身离线测试）
+"""
+import sys
+
+sys.path.append('D:/Carla Simulation')
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from roundabout_config_v2 import *
+from campaign_manifest import CampaignManifest
+from chunk_writer import ChunkedScenarioWriter
+from data_schema import data_path
+from frame_recorder import ColumnarFrameRecorder, ScenarioSummary
+from kinematics import KinematicsStage
+from recorder_log import (RECORDER_META_SUFFIX, recorder_text_path, load_metadata, parse_recorder_info,
+                          track_states, iter_frame_rows)
+from scenario_scheduler import parse_endpoints
+
+
+def scenario_output_file(scenario_id):
+    """scenario_XXX.parquet / scenario_XXX.csv（按DATA_FORMAT）"""
+    return data_path(RAW_DATA_DIR, f'scenario_{scenario_id:03d}', DATA_FORMAT)
+
+
+def find_recordings():
+    """RAW_DATA_DIR中所有已录制场景的元数据文件"""
+    return sorted(Path(RAW_DATA_DIR).glob(f'scenario_*{RECORDER_META_SUFFIX}'))
+
+
+def dump_recorder_text(metadata_files, endpoint):
+    """用仿真器把日志导出为文本（已导出的跳过）"""
+    client = None
+    for metadata_file in metadata_files:
+        metadata = load_metadata(metadata_file)
+        text_file = recorder_text_path(scenario_output_file(metadata['scenario_id']))
+        if text_file.exists():
+            continue
+        if client is None:
+            print(f"连接CARLA ({endpoint['host']}:{endpoint['port']}) 导出日志文本...")
+            client = carla.Client(endpoint['host'], endpoint['port'])
+            client.set_timeout(60.0)
+        t0 = time.perf_counter()
+        text = client.show_recorder_file_info(metadata['recorder_log'], True)
+        tmp_file = text_file.with_name(text_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_file, text_file)
+        print(f"  ✓ {text_file.name}: {len(text) / 1024 / 1024:.1f} MB, {time.perf_counter() - t0:.1f}秒")
+
+
+def extract_scenario(metadata_file):
+    """
+    解析一个场景的日志文本并写出 scenario_XXX.parquet/.csv（在工作进程中运行）
+
+    返回 {'scenario_id', 'summary', 'seconds', 'warning'}；没有数据时summary为None
+    """
+    t0 = time.perf_counter()
+    metadata = load_metadata(metadata_file)
+    scenario_id = metadata['scenario_id']
+    output_file = scenario_output_file(scenario_id)
+    record_rate = metadata['record_rate']
+
+    with open(recorder_text_path(output_file), 'r', encoding='utf-8') as f:
+        frames = parse_recorder_info(f, RECORDER_UNIT_SCALE)
+    actor_ids = {int(actor_id) for actor_id in metadata['behaviors']}
+    states = track_states(frames, metadata['sim_rate'], actor_ids)
+    warning = None
+    expected = metadata['sim_ticks'] + metadata.get('lead_ticks', 0)
+    if len(states) != expected:
+        warning = f"日志帧数 {len(states)} ≠ 采集tick数 {expected}"
+
+    chunk_frames = CHUNK_SECONDS * record_rate
+    recorder = ColumnarFrameRecorder.for_scenario(TRAFFIC_DENSITIES[metadata['traffic_density']],
+                                                  CHUNK_SECONDS, record_rate)
+    kinematics = KinematicsStage(ROUNDABOUT_CENTER.x, ROUNDABOUT_CENTER.y, record_rate, EXTRA_FEATURES)
+    writer = ChunkedScenarioWriter(output_file)
+    summary = ScenarioSummary(CORE_RADIUS)
+
+    def flush(next_frame):
+        if len(recorder) == 0:
+            return
+        chunk = kinematics.apply(recorder.take_dataframe())
+        summary.update(chunk)
+        writer.write(chunk, next_frame)
+
+    try:
+        for frame_id, rows in iter_frame_rows(states, metadata):
+            recorder.append_rows(rows)
+            if (frame_id + 1) % chunk_frames == 0:
+                flush(frame_id + 1)
+        flush(metadata['start_frame'] + metadata['frames'])
+    except:
+        writer.discard()
+        raise
+
+    if summary.rows == 0:
+        writer.discard()
+        return {'scenario_id': scenario_id, 'summary': None, 'seconds': time.perf_counter() - t0,
+                'warning': warning}
+    writer.close()
+    return {'scenario_id': scenario_id, 'summary': summary, 'seconds': time.perf_counter() - t0,
+            'warning': warning}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='从内置记录器日志生成 scenario_XXX.parquet/.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='并行提取的进程数（默认CPU核数）')
+    parser.add_argument('--endpoint', default='',
+                        help='导出日志文本使用的仿真端点 host:port:tm_port（默认SIMULATOR_ENDPOINTS[0]）')
+    parser.add_argument('--force', action='store_true',
+                        help='重新提取已完成的场景')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    endpoint = parse_endpoints(args.endpoint)[0] if args.endpoint else SIMULATOR_ENDPOINTS[0]
+    manifest = CampaignManifest.load(RAW_DATA_DIR)
+
+    metadata_files = []
+    for metadata_file in find_recordings():
+        scenario_id = load_metadata(metadata_file)['scenario_id']
+        if not args.force and manifest is not None and \
+                manifest.is_done(scenario_id, scenario_output_file(scenario_id)):
+            continue
+        metadata_files.append(metadata_file)
+
+    print("=" * 80)
+    print(f"记录器日志提取: {len(metadata_files)}个场景, {args.workers}个进程")
+    print("=" * 80)
+    if not metadata_files:
+        print("没有待提取的场景")
+        return
+
+    dump_recorder_text(metadata_files, endpoint)
+
+    start_time = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(extract_scenario, metadata_file): metadata_file for metadata_file in metadata_files}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  ✗ {futures[future].name}: {type(e).__name__}: {e}")
+                continue
+            scenario_id = result['scenario_id']
+            summary = result['summary']
+            if summary is None:
+                print(f"  ✗ scenario_{scenario_id:03d}: 没有数据")
+                continue
+            print(f"  ✓ {scenario_output_file(scenario_id).name}: {summary.rows:,} 行, {summary.num_tracks} 轨迹, "
+                  f"核心区 {summary.num_core_tracks}, {result['seconds']:.1f}秒"
+                  f"{'  ⚠️ ' + result['warning'] if result['warning'] else ''}")
+            if manifest is not None:
+                manifest.mark_done(scenario_id, scenario_output_file(scenario_id), summary, result['seconds'])
+            results.append(result)
+
+    total_time = time.time() - start_time
+    print(f"\n✅ 提取完成: {len(results)}/{len(metadata_files)} 个场景, 用时 {total_time:.1f}秒")
+    print(f"数据位置: {RAW_DATA_DIR}")
+
+
+if __name__ == '__main__':
+    main()
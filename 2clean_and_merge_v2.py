@@ -3,112 +3,267 @@
 合并并清洗75个场景的数据
 ✅ 支持5密度配置
 ✅ 流量验证
+✅ 多进程按场景并行加载与清洗（过滤都按轨迹进行，轨迹不跨场景），最后按场景顺序合并
+✅ 增量运行: 清洗结果按场景缓存为分片（原始文件哈希 + 清洗参数），只重建变化的场景
+✅ 读写类型化数据（DATA_FORMAT，见data_schema.py），可另外导出CSV
+✅ --streaming: 两遍分块清洗（见stream_clean.py），内存占用与数据集大小无关
+✅ 另外写出分区列式数据集 dataset/split=all/weather=*/traffic_density=*（PARTITIONED_DATASET）
+✅ 输出按 (trackId, frame) 排序，并写出轨迹索引与按列存储 tracks/（见track_store.py）
 """
 import sys
 sys.path.append('D:/Carla Simulation')
 
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from roundabout_config_v2 import *
+from data_schema import (apply_schema, data_path, find_data_file, read_table, write_table,
+                         storage_report, print_storage_report, TableWriter)
+from shard_cache import ShardCache, shard_key
+from flow_engine import flow_table, summarize_flows
+from dataset_summary import summary_table, summary_from_tracks, rollup, totals, save_summary
+from partitioned_dataset import SplitWriter, dataset_available, write_split
+from track_store import TrackStore, TrackStoreWriter, write_track_store
+from stream_clean import scan_scenario, assign_global_ids, write_scenario, track_table
+
+# ===== 清洗参数 =====
+MIN_TRACK_LENGTH = 20  # 最短轨迹帧数（10Hz下2秒）
+MIN_AVG_SPEED = 0.5  # 平均速度低于该值（m/s）视为静止车辆
+STREAM_CHUNK_ROWS = 500_000  # 流式模式每块读取的行数
+
+
+def cleaning_params():
+    """清洗与流量统计参数（传给工作进程，也是分片缓存键的一部分）"""
+    return {
+        'radius': COLLECTION_RADIUS,
+        'min_length': MIN_TRACK_LENGTH,
+        'min_speed': MIN_AVG_SPEED,
+        'core_radius': CORE_RADIUS,
+        'frame_rate': FRAME_RATE,
+    }
+
+
+def clean_scenario(df, params):
+    """
+    清洗单个场景（各过滤条件都按轨迹计算，轨迹不跨场景）
+
+    返回 (清洗后数据, 统计dict)
+    """
+    original_rows = len(df)
+    original_tracks = df['trackId'].nunique()
 
+    # 1. 过滤范围外数据
+    df = df[df['radius'] <= params['radius']]
+    removed_rows = original_rows - len(df)
 
-def load_all_scenarios():
-    """加载所有场景数据"""
-    print(f"正在加载{TOTAL_SCENARIOS}个场景...")
+    # 2-3. 过滤短轨迹
+    track_lengths = df.groupby('trackId').size()
+    valid_tracks = track_lengths[track_lengths >= params['min_length']].index
+    df = df[df['trackId'].isin(valid_tracks)]
 
-    all_data = []
+    # 4. 过滤静止车辆
+    track_speeds = df.groupby('trackId')['speed'].mean()
+    moving_tracks = track_speeds[track_speeds >= params['min_speed']].index
+    df = df[df['trackId'].isin(moving_tracks)]
+
+    return df, {
+        'rows': original_rows,
+        'tracks': original_tracks,
+        'removed_rows': removed_rows,
+        'removed_tracks': original_tracks - len(valid_tracks),
+        'removed_static': len(valid_tracks) - len(moving_tracks),
+    }
+
+
+def load_and_clean_scenario(scenario_id, file_path, params, cache, use_cached=True):
+    """
+    加载并清洗一个场景（在工作进程中运行）
+
+    原始文件与清洗参数都未变化时直接读取缓存分片（cached=True），否则清洗后写入分片
+    """
+    t0 = time.perf_counter()
+    key = shard_key(file_path, params)
+    meta = cache.lookup(scenario_id, key) if use_cached else None
+    if meta is not None:
+        cleaned = cache.load(scenario_id)
+        flow, stats = meta['flow'], meta['stats']
+    else:
+        df = read_table(file_path)
+        df['scenario_id'] = np.int16(scenario_id)
+        flow = flow_table(df, params['frame_rate'], params['core_radius']).to_dict('records')[0]
+        cleaned, stats = clean_scenario(df, params)
+        cache.store(scenario_id, key, cleaned, {'raw_file': Path(file_path).name, 'flow': flow, 'stats': stats})
+    return {
+        'scenario_id': scenario_id,
+        'file': Path(file_path).name,
+        'flow': flow,
+        'stats': stats,
+        'data': cleaned,
+        'cached': meta is not None,
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+def find_raw_files():
+    """[(场景ID, 原始文件)]，缺失的场景打印提示"""
+    tasks = []
     for i in range(TOTAL_SCENARIOS):
-        file_path = Path(RAW_DATA_DIR) / f'scenario_{i:03d}.csv'
-        if file_path.exists():
-            df = pd.read_csv(file_path)
-            df['scenario_id'] = i
-            all_data.append(df)
-            print(f"  ✓ scenario_{i:03d}.csv: {len(df):,} 行, {df['trackId'].nunique()} 轨迹")
+        file_path = find_data_file(RAW_DATA_DIR, f'scenario_{i:03d}', DATA_FORMAT)
+        if file_path is not None:
+            tasks.append((i, file_path))
         else:
-            print(f"  ✗ scenario_{i:03d}.csv: 未找到")
+            print(f"  ✗ scenario_{i:03d}: 未找到")
 
-    if not all_data:
+    if not tasks:
         print("❌ 没有找到任何数据文件")
+    return tasks
+
+
+def process_all_scenarios(workers, rebuild=False):
+    """
+    多进程加载并清洗所有场景，按场景ID顺序返回结果
+
+    清洗结果缓存在 PROCESSED_DATA_DIR/shards 中，只重建新增或变化的场景（rebuild=True时全部重建）
+    """
+    print(f"正在加载并清洗{TOTAL_SCENARIOS}个场景 ({workers}个进程)...")
+
+    tasks = find_raw_files()
+    if not tasks:
         return None
 
-    merged = pd.concat(all_data, ignore_index=True)
-    print(f"\n✅ 加载完成: {len(merged):,} 行")
+    start_time = time.perf_counter()
+    params = cleaning_params()
+    cache = ShardCache(PROCESSED_DATA_DIR, DATA_FORMAT)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(load_and_clean_scenario, i, file_path, params, cache, not rebuild)
+                   for i, file_path in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            stats = result['stats']
+            print(f"  ✓ {result['file']}: {stats['rows']:,} 行, {stats['tracks']} 轨迹 → "
+                  f"{len(result['data']):,} 行, {result['seconds']:.1f}秒"
+                  f"{' (缓存)' if result['cached'] else ''}")
+            results.append(result)
+
+    # ⭐ 按场景ID排序，合并结果与完成顺序无关
+    results.sort(key=lambda r: r['scenario_id'])
+    total_rows = sum(r['stats']['rows'] for r in results)
+    cached = sum(r['cached'] for r in results)
+    print(f"\n✅ 加载完成: {len(results)}个场景 (缓存 {cached}, 重建 {len(results) - cached}), "
+          f"{total_rows:,} 行, {time.perf_counter() - start_time:.1f}秒")
+
+    return results
+
+
+def scan_all_scenarios(workers, chunk_rows):
+    """
+    流式模式第1遍: 多进程分块扫描所有场景（流量指标 + 保留轨迹），按场景ID顺序返回结果
+
+    每个进程同时只持有一块数据，返回的只有每条轨迹的统计（不使用分片缓存）
+    """
+    print(f"[流式] 第1遍: 分块扫描{TOTAL_SCENARIOS}个场景 ({workers}个进程, 每块{chunk_rows:,}行)...")
+
+    tasks = find_raw_files()
+    if not tasks:
+        return None
+
+    start_time = time.perf_counter()
+    params = cleaning_params()
+    paths = dict(tasks)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(scan_scenario, i, file_path, params, chunk_rows) for i, file_path in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            result['path'] = paths[result['scenario_id']]
+            stats = result['stats']
+            print(f"  ✓ {result['file']}: {stats['rows']:,} 行, {stats['tracks']} 轨迹 → "
+                  f"{result['kept_rows']:,} 行, {result['seconds']:.1f}秒")
+            results.append(result)
 
-    return merged
+    results.sort(key=lambda r: r['scenario_id'])
+    total_rows = sum(r['stats']['rows'] for r in results)
+    print(f"\n✅ 扫描完成: {len(results)}个场景, {total_rows:,} 行, {time.perf_counter() - start_time:.1f}秒")
 
+    return results
 
-def verify_flow_rates(df):
-    """验证流量是否符合目标"""
+
+def verify_flow_rates(flows):
+    """验证流量是否符合目标（flows: 各场景的flow_table结果）"""
     print("\n" + "=" * 80)
     print("流量验证 (基于HCM 2010目标)")
     print("=" * 80)
     
-    print(f"\n核心区定义: 半径 ≤ 25米")
+    print(f"\n核心区定义: 半径 ≤ {CORE_RADIUS:g}米")
     print(f"验证标准: 实际通过车辆数 ≈ 目标值 ± 20%")
     
-    results = []
+    flow_df = pd.DataFrame(flows).sort_values('scenario_id', ignore_index=True)
+    targets = {name: config['target_passages'] for name, config in TRAFFIC_DENSITIES.items()}
+    target_flows = {name: config['target_flow'] for name, config in TRAFFIC_DENSITIES.items()}
+    target = flow_df['density'].map(targets)
+    deviation = ((flow_df['actual'] - target) / target * 100).where(target > 0, 0.0)
     
-    for scenario_id in sorted(df['scenario_id'].unique()):
-        scenario_data = df[df['scenario_id'] == scenario_id]
-        
-        density = scenario_data['traffic_density'].iloc[0]
-        weather = scenario_data['weather'].iloc[0]
-        behavior = scenario_data['behavior_type'].iloc[0]
-        
-        # 统计核心区轨迹
-        core_data = scenario_data[scenario_data['radius'] <= 25]
-        core_tracks = core_data['trackId'].nunique()
-        
-        # 获取目标值
-        target = TRAFFIC_DENSITIES[density]['target_passages']
-        
-        # 计算偏差
-        deviation = (core_tracks - target) / target * 100 if target > 0 else 0
-        status = "✅" if abs(deviation) <= 20 else "⚠️"
-        
-        results.append({
-            'scenario_id': scenario_id,
-            'weather': weather,
-            'density': density,
-            'behavior': behavior,
-            'target': target,
-            'actual': core_tracks,
-            'deviation': deviation,
-            'status': status
-        })
-    
-    results_df = pd.DataFrame(results)
+    results_df = pd.DataFrame({
+        'scenario_id': flow_df['scenario_id'],
+        'weather': flow_df['weather'],
+        'density': flow_df['density'],
+        'behavior': flow_df['behavior'],
+        'target': target,
+        'actual': flow_df['actual'],
+        'deviation': deviation,
+        'status': np.where(deviation.abs() <= 20, "✅", "⚠️"),
+        # ⭐ 边界穿越统计（flow_engine）
+        'entries': flow_df['entries'],
+        'exits': flow_df['exits'],
+        'transits': flow_df['transits'],
+        'time_in_core': flow_df['time_in_core'],
+        'duration': flow_df['duration'],
+        'hourly_flow': flow_df['hourly_flow'],
+        'target_flow': flow_df['density'].map(target_flows),
+    })
     
     # 打印结果
-    print(f"\n{'场景ID':<8} {'密度':<12} {'行为':<12} {'目标':<6} {'实际':<6} {'偏差':<8} {'状态'}")
-    print("-" * 80)
+    print(f"\n{'场景ID':<8} {'密度':<12} {'行为':<12} {'目标':<6} {'实际':<6} {'偏差':<8} {'状态':<4} "
+          f"{'驶入':>5} {'驶出':>5} {'停留(秒)':>8} {'流量(veh/h)':>11}")
+    print("-" * 100)
     
-    for _, row in results_df.iterrows():
-        print(f"{row['scenario_id']:>6}   {row['density']:<12} {row['behavior']:<12} "
-              f"{row['target']:>4}   {row['actual']:>4}   {row['deviation']:>+6.1f}%  {row['status']}")
+    for row in results_df.itertuples(index=False):
+        print(f"{row.scenario_id:>6}   {row.density:<12} {row.behavior:<12} "
+              f"{row.target:>4}   {row.actual:>4}   {row.deviation:>+6.1f}%  {row.status}  "
+              f"{row.entries:>5} {row.exits:>5} {row.time_in_core:>8.1f} {row.hourly_flow:>11.0f}")
     
     # 按密度统计
     print("\n" + "=" * 80)
     print("按密度统计")
     print("=" * 80)
     
+    by_density = summarize_flows(results_df, 'density')
+    qualified = (results_df['deviation'].abs() <= 20).groupby(results_df['density']).sum()
     for density in TRAFFIC_DENSITIES.keys():
-        density_results = results_df[results_df['density'] == density]
-        if len(density_results) == 0:
+        if density not in by_density.index:
             continue
-            
-        target = TRAFFIC_DENSITIES[density]['target_passages']
-        avg_actual = density_results['actual'].mean()
-        qualified = (density_results['deviation'].abs() <= 20).sum()
-        total = len(density_results)
-        flow = TRAFFIC_DENSITIES[density]['target_flow']
+        summary = by_density.loc[density]
+        total = int(summary['scenarios'])
         
         print(f"\n{density.upper()}:")
-        print(f"  目标流量: {flow} veh/h")
-        print(f"  目标通过: {target}辆/场景")
-        print(f"  实际平均: {avg_actual:.1f}辆/场景")
-        print(f"  合格率: {qualified}/{total} ({qualified/total*100:.1f}%)")
+        print(f"  目标流量: {TRAFFIC_DENSITIES[density]['target_flow']} veh/h")
+        print(f"  实际流量: {summary['hourly_flow']:.0f} veh/h（驶入核心区）")
+        print(f"  目标通过: {TRAFFIC_DENSITIES[density]['target_passages']}辆/场景")
+        print(f"  实际平均: {summary['actual']:.1f}辆/场景 (完整通过 {summary['transits']:.1f})")
+        print(f"  核心区停留: {summary['time_in_core']:.1f}秒/辆")
+        print(f"  合格率: {qualified[density]}/{total} ({qualified[density]/total*100:.1f}%)")
+    
+    print("\n按天气统计:")
+    by_weather = summarize_flows(results_df, 'weather')
+    for weather, summary in by_weather.iterrows():
+        print(f"  {weather:15s}: 流量 {summary['hourly_flow']:6.0f} veh/h, 平均通过 {summary['actual']:5.1f}辆, "
+              f"停留 {summary['time_in_core']:.1f}秒")
     
     # 保存报告
     report_file = Path(PROCESSED_DATA_DIR) / 'flow_validation_report.csv'
@@ -119,129 +274,321 @@ def verify_flow_rates(df):
     return results_df
 
 
-def clean_data(df):
-    """清洗数据"""
+def print_filter_stats(results):
+    """打印各过滤步骤的移除量（各场景统计之和），返回 (原始行数, 原始轨迹数)"""
     print("\n" + "=" * 80)
     print("数据清洗")
     print("=" * 80)
 
-    original_rows = len(df)
-    original_tracks = df['trackId'].nunique()
+    def total(key):
+        return sum(r['stats'][key] for r in results)
+
+    original_rows = total('rows')
+    original_tracks = total('tracks')
 
     print(f"\n原始数据: {original_rows:,} 行, {original_tracks} 条轨迹")
 
-    # 1. 过滤范围外数据
     print(f"\n[1/5] 过滤范围外数据 (>{COLLECTION_RADIUS}米)...")
-    df_filtered = df[df['radius'] <= COLLECTION_RADIUS].copy()
-    removed = original_rows - len(df_filtered)
+    removed = total('removed_rows')
     print(f"  移除 {removed:,} 行 ({removed / original_rows * 100:.1f}%)")
 
-    # 2-3. 过滤短轨迹
-    print(f"\n[2/5] 过滤短轨迹 (<2秒)...")
-    min_length = 20
-    track_lengths = df_filtered.groupby('trackId').size()
-    valid_tracks = track_lengths[track_lengths >= min_length].index
-    df_filtered = df_filtered[df_filtered['trackId'].isin(valid_tracks)]
-    removed_tracks = original_tracks - len(valid_tracks)
-    print(f"  移除 {removed_tracks} 条轨迹")
+    print(f"\n[2/5] 过滤短轨迹 (<{MIN_TRACK_LENGTH}帧)...")
+    print(f"  移除 {total('removed_tracks')} 条轨迹")
 
-    # 4. 过滤静止车辆
-    print(f"\n[3/5] 过滤静止车辆 (平均速度<0.5m/s)...")
-    track_speeds = df_filtered.groupby('trackId')['speed'].mean()
-    moving_tracks = track_speeds[track_speeds >= 0.5].index
-    df_filtered = df_filtered[df_filtered['trackId'].isin(moving_tracks)]
-    removed_static = len(valid_tracks) - len(moving_tracks)
-    print(f"  移除 {removed_static} 条静止轨迹")
-
-    # 5. 重新分配全局trackId
-    print(f"\n[4/5] 重新分配全局trackId...")
-    df_filtered['original_trackId'] = df_filtered['trackId']
-    df_filtered['global_trackId'] = (
-        df_filtered['scenario_id'].astype(str) + '_' +
-        df_filtered['trackId'].astype(str)
-    )
-    track_mapping = {track: idx for idx, track in enumerate(df_filtered['global_trackId'].unique())}
-    df_filtered['trackId'] = df_filtered['global_trackId'].map(track_mapping)
-    df_filtered = df_filtered.drop(columns=['global_trackId'])
-
-    final_rows = len(df_filtered)
-    final_tracks = df_filtered['trackId'].nunique()
+    print(f"\n[3/5] 过滤静止车辆 (平均速度<{MIN_AVG_SPEED}m/s)...")
+    print(f"  移除 {total('removed_static')} 条静止轨迹")
 
+    return original_rows, original_tracks
+
+
+def print_clean_result(original_rows, original_tracks, final_rows, final_tracks):
     print("\n" + "=" * 80)
     print("清洗结果")
     print("=" * 80)
     print(f"\n数据行数: {original_rows:,} → {final_rows:,} (保留{final_rows/original_rows*100:.1f}%)")
     print(f"轨迹数量: {original_tracks} → {final_tracks} (保留{final_tracks/original_tracks*100:.1f}%)")
 
+
+def clean_data(results):
+    """合并各场景的清洗结果并重新分配全局trackId"""
+    original_rows, original_tracks = print_filter_stats(results)
+
+    # 5. 重新分配全局trackId: 按场景ID顺序、场景内首次出现顺序编号
+    print(f"\n[4/5] 重新分配全局trackId...")
+    frames = []
+    offset = 0
+    for result in results:
+        df = result['data']
+        df['original_trackId'] = df['trackId']
+        codes, uniques = pd.factorize(df['trackId'])
+        df['trackId'] = codes + offset
+        offset += len(uniques)
+        frames.append(df)
+    # ⭐ 各场景的类别取值表可能不同（出现未知类别时），合并后统一类型
+    df_filtered = apply_schema(pd.concat(frames, ignore_index=True))
+
+    # 全局trackId按场景递增，排序后同一场景、同一轨迹的行都是连续的
+    print(f"\n[5/5] 按 (trackId, frame) 排序...")
+    df_filtered = df_filtered.sort_values(['trackId', 'frame'], ignore_index=True)
+
+    print_clean_result(original_rows, original_tracks, len(df_filtered), offset)
+
     return df_filtered
 
 
-def analyze_data(df):
-    """分析清洗后的数据"""
+def clean_data_streaming(results, chunk_rows):
+    """
+    流式模式第2遍: 按场景顺序分块过滤、分配全局trackId，写入轨迹存储（直接写到排序后的位置）；
+    再从轨迹存储按 (trackId, frame) 顺序分块读出，写入输出文件
+
+    返回 (写出的文件列表（DATA_FORMAT，EXPORT_CSV时另有CSV）, 分区数据集目录或None, 轨迹存储目录)
+    """
+    original_rows, original_tracks = print_filter_stats(results)
+
+    print(f"\n[4/5] 重新分配全局trackId并分块写入轨迹存储...")
+    final_tracks = assign_global_ids(results)
+    params = cleaning_params()
+    lengths = np.concatenate([r['tracks']['rows'].to_numpy() for r in results])
+    store_writer = TrackStoreWriter(PROCESSED_DATA_DIR, lengths)
+    final_rows = 0
+    try:
+        for result in results:
+            final_rows += write_scenario([store_writer], result, result['path'], params, chunk_rows)
+        track_dir = store_writer.close()
+    except BaseException:
+        store_writer.abort()
+        raise
+
+    print(f"\n[5/5] 按 (trackId, frame) 顺序分块写出...")
+    output_file = data_path(PROCESSED_DATA_DIR, 'carla_round_all', DATA_FORMAT)
+    writers = [TableWriter(output_file)]
+    if EXPORT_CSV and output_file.suffix != '.csv':
+        writers.append(TableWriter(output_file.with_suffix('.csv')))
+    dataset_writers = [SplitWriter(PROCESSED_DATA_DIR, 'all')] if PARTITIONED_DATASET and dataset_available() else []
+    try:
+        for chunk in TrackStore(PROCESSED_DATA_DIR).iter_frames(chunk_rows):
+            for writer in writers + dataset_writers:
+                writer.write(chunk)
+        output_files = [writer.close() for writer in writers]
+        dataset_dir = dataset_writers[0].close() if dataset_writers else None
+    except BaseException:
+        for writer in writers + dataset_writers:
+            writer.abort()
+        raise
+
+    print_clean_result(original_rows, original_tracks, final_rows, final_tracks)
+
+    return output_files, dataset_dir, track_dir
+
+
+def analyze_data(summary):
+    """分析清洗后的数据（各项统计由汇总表聚合，见dataset_summary.py），返回汇总表"""
     print("\n" + "=" * 80)
     print("数据分析")
     print("=" * 80)
 
+    total = totals(summary)
+
     print(f"\n📊 基本统计:")
-    print(f"  总行数: {len(df):,}")
-    print(f"  轨迹数: {df['trackId'].nunique()}")
-    print(f"  场景数: {df['scenario_id'].nunique()}")
+    print(f"  总行数: {total['rows']:,}")
+    print(f"  轨迹数: {total['tracks']}")
+    print(f"  场景数: {total['scenarios']}")
 
     print(f"\n📈 运动统计:")
-    print(f"  速度: {df['speed'].mean():.2f} m/s ({df['speed'].mean()*3.6:.1f} km/h)")
-    print(f"  半径: {df['radius'].mean():.2f} m")
+    print(f"  速度: {total['speed_mean']:.2f} m/s ({total['speed_mean']*3.6:.1f} km/h)")
+    print(f"  半径: {total['radius_mean']:.2f} m")
 
     print(f"\n🌦️ 天气分布:")
-    for weather in sorted(df['weather'].unique()):
-        count = len(df[df['weather'] == weather])
-        tracks = df[df['weather'] == weather]['trackId'].nunique()
-        print(f"  {weather:20s}: {count:7,} 行, {tracks:4} 轨迹")
+    for row in rollup(summary, 'weather').itertuples():
+        print(f"  {row.Index:20s}: {row.rows:7,} 行, {row.tracks:4} 轨迹")
 
     print(f"\n🚗 密度分布:")
+    by_density = rollup(summary, 'traffic_density')
     for density in TRAFFIC_DENSITIES.keys():
-        if density in df['traffic_density'].values:
-            count = len(df[df['traffic_density'] == density])
-            tracks = df[df['traffic_density'] == density]['trackId'].nunique()
-            print(f"  {density:12s}: {count:7,} 行, {tracks:4} 轨迹")
+        if density in by_density.index:
+            rows, tracks = by_density.at[density, 'rows'], by_density.at[density, 'tracks']
+            print(f"  {density:12s}: {rows:7,} 行, {tracks:4} 轨迹")
 
     print(f"\n🎯 行为分布:")
-    for behavior in sorted(df['behavior_type'].unique()):
-        count = len(df[df['behavior_type'] == behavior])
-        tracks = df[df['behavior_type'] == behavior]['trackId'].nunique()
-        avg_speed = df[df['behavior_type'] == behavior]['speed'].mean()
-        print(f"  {behavior:10s}: {count:7,} 行, {tracks:4} 轨迹, {avg_speed:.2f} m/s")
+    for row in rollup(summary, 'behavior_type').itertuples():
+        print(f"  {row.Index:10s}: {row.rows:7,} 行, {row.tracks:4} 轨迹, {row.speed_mean:.2f} m/s")
+
+    return summary
+
+
+def legacy_core_tracks(df):
+    """原verify_flow_rates的统计方式（逐场景布尔掩码切片），仅用于基准对比"""
+    counts = {}
+    for scenario_id in sorted(df['scenario_id'].unique()):
+        scenario_data = df[df['scenario_id'] == scenario_id]
+        core_data = scenario_data[scenario_data['radius'] <= CORE_RADIUS]
+        counts[scenario_id] = core_data['trackId'].nunique()
+    return counts
+
+
+def tile_scenarios(base, scale):
+    """把原始数据复制scale份（场景ID依次偏移），模拟更大的数据集"""
+    n = len(base)
+    data = {}
+    for col in base.columns:
+        values = base[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            data[col] = pd.Categorical.from_codes(np.tile(values.cat.codes.to_numpy(), scale), dtype=values.dtype)
+        else:
+            data[col] = np.tile(values.to_numpy(), scale)
+    offsets = np.repeat(np.arange(scale, dtype=np.int32) * (int(base['scenario_id'].max()) + 1), n)
+    data['scenario_id'] = data['scenario_id'].astype(np.int32) + offsets
+    return pd.DataFrame(data)
+
+
+def benchmark_flow(scale, legacy_scenarios=5):
+    """
+    流量验证基准: 原始数据 ×1 与 ×scale，比较逐场景掩码方式与flow_engine
+
+    ×scale时原方式只运行前legacy_scenarios个场景，再按场景数线性外推（每个场景都扫描全表）。
+    结果保存到 PROCESSED_DATA_DIR/flow_benchmark.json
+    """
+    columns = ['frame', 'trackId', 'radius', 'weather', 'traffic_density', 'behavior_type']
+    frames = []
+    for i in range(TOTAL_SCENARIOS):
+        file_path = find_data_file(RAW_DATA_DIR, f'scenario_{i:03d}', DATA_FORMAT)
+        if file_path is not None:
+            df = read_table(file_path, columns=columns)
+            df['scenario_id'] = np.int16(i)
+            frames.append(df)
+    if not frames:
+        print("❌ 没有找到任何数据文件")
+        return
+    base = apply_schema(pd.concat(frames, ignore_index=True))
+    del frames
+
+    results = []
+    for factor in [1, scale]:
+        df = base if factor == 1 else tile_scenarios(base, factor)
+        num_scenarios = df['scenario_id'].nunique()
+        print(f"\n×{factor}: {len(df):,} 行, {num_scenarios}个场景")
+
+        t0 = time.perf_counter()
+        flows = flow_table(df, FRAME_RATE, CORE_RADIUS)
+        engine_seconds = time.perf_counter() - t0
+
+        if factor == 1:
+            t0 = time.perf_counter()
+            legacy = legacy_core_tracks(df)
+            legacy_seconds = time.perf_counter() - t0
+            match = all(legacy[row.scenario_id] == row.actual for row in flows.itertuples())
+            print(f"  actual与原方式一致: {'✅' if match else '❌'}")
+            extrapolated = False
+        else:
+            t0 = time.perf_counter()
+            for scenario_id in range(legacy_scenarios):
+                scenario_data = df[df['scenario_id'] == scenario_id]
+                scenario_data[scenario_data['radius'] <= CORE_RADIUS]['trackId'].nunique()
+            legacy_seconds = (time.perf_counter() - t0) / legacy_scenarios * num_scenarios
+            extrapolated = True
+
+        print(f"  原方式: {legacy_seconds:.2f}秒{'（外推）' if extrapolated else ''}, "
+              f"flow_engine: {engine_seconds:.2f}秒 ({len(df) / engine_seconds / 1e6:.1f}M 行/秒), "
+              f"加速 {legacy_seconds / engine_seconds:.0f}×")
+        results.append({
+            'scale': factor,
+            'rows': len(df),
+            'scenarios': num_scenarios,
+            'legacy_seconds': legacy_seconds,
+            'legacy_extrapolated': extrapolated,
+            'engine_seconds': engine_seconds,
+            'speedup': legacy_seconds / engine_seconds,
+        })
+        del df
+
+    output_file = Path(PROCESSED_DATA_DIR) / 'flow_benchmark.json'
+    Path(PROCESSED_DATA_DIR).mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ 结果已保存: {output_file}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='合并、清洗并验证所有场景')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='并行加载/清洗的进程数（默认CPU核数）')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='忽略分片缓存，重新清洗所有场景')
+    parser.add_argument('--streaming', action='store_true',
+                        help='流式模式: 两遍分块清洗，内存与数据集大小无关（不使用分片缓存）')
+    parser.add_argument('--chunk-rows', type=int, default=STREAM_CHUNK_ROWS,
+                        help=f'流式模式每块行数（默认{STREAM_CHUNK_ROWS:,}）')
+    parser.add_argument('--benchmark-flow', type=int, default=0, metavar='SCALE',
+                        help='流量验证基准: 原始数据 ×1 与 ×SCALE（不清洗、不写数据）')
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    if args.benchmark_flow:
+        benchmark_flow(args.benchmark_flow)
+        return
+
     print("=" * 80)
     print("数据合并、清洗与验证 - v2")
     print("=" * 80)
 
     Path(PROCESSED_DATA_DIR).mkdir(parents=True, exist_ok=True)
 
-    # 1. 加载数据
-    df_raw = load_all_scenarios()
-    if df_raw is None:
-        return
+    if args.streaming:
+        # 1. 第1遍: 分块扫描（流量指标与每轨迹统计）
+        results = scan_all_scenarios(args.workers, args.chunk_rows)
+        if results is None:
+            return
+
+        # 2. 验证流量
+        verify_flow_rates([r['flow'] for r in results])
+
+        # 3. 第2遍: 分块过滤并写出
+        output_files, dataset_dir, track_dir = clean_data_streaming(results, args.chunk_rows)
+
+        # 4. 分析数据（汇总表由每轨迹统计得到，不再读取数据）
+        summary = analyze_data(summary_from_tracks(track_table(results), 'all'))
+    else:
+        # 1. 加载并清洗各场景（多进程）
+        results = process_all_scenarios(args.workers, rebuild=args.rebuild)
+        if results is None:
+            return
+
+        # 2. 验证流量
+        verify_flow_rates([r['flow'] for r in results])
 
-    # 2. 验证流量
-    flow_report = verify_flow_rates(df_raw)
+        # 3. 合并清洗结果
+        df_clean = clean_data(results)
 
-    # 3. 清洗数据
-    df_clean = clean_data(df_raw)
+        # 4. 分析数据
+        summary = analyze_data(summary_table(df_clean, 'all'))
 
-    # 4. 分析数据
-    analyze_data(df_clean)
+        # 5. 保存（DATA_FORMAT，另可导出CSV）
+        output_file = write_table(df_clean, data_path(PROCESSED_DATA_DIR, 'carla_round_all', DATA_FORMAT))
+        output_files = [output_file]
+        if EXPORT_CSV and output_file.suffix != '.csv':
+            output_files.append(write_table(df_clean, output_file.with_suffix('.csv')))
+        dataset_dir = None
+        if PARTITIONED_DATASET and dataset_available():
+            dataset_dir = write_split(df_clean, PROCESSED_DATA_DIR, 'all')
+        track_dir = write_track_store(df_clean, PROCESSED_DATA_DIR)
 
-    # 5. 保存
-    output_file = Path(PROCESSED_DATA_DIR) / 'carla_round_all.csv'
-    df_clean.to_csv(output_file, index=False)
+    # 汇总表随数据集保存，3split再追加各划分的行
+    summary_file = save_summary(summary, PROCESSED_DATA_DIR)
 
     print("\n" + "=" * 80)
     print("✅ 保存完成")
     print("=" * 80)
-    print(f"\n文件: {output_file}")
-    print(f"大小: {output_file.stat().st_size / 1024 / 1024:.1f} MB")
+    for path in output_files:
+        print(f"\n文件: {path}")
+    if dataset_dir is not None:
+        print(f"\n分区数据集: {dataset_dir}")
+    print(f"\n轨迹索引: {track_dir} ({len(TrackStore(PROCESSED_DATA_DIR))}条轨迹)")
+    print(f"\n汇总表: {summary_file}")
+    if not args.streaming:
+        # 加载时间需要完整读取文件，流式模式下跳过
+        print_storage_report(storage_report(output_files))
 
     print("\n下一步: 运行 3split_dataset_v2.py 划分数据集")
 
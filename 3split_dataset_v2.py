@@ -4,15 +4,24 @@
 - 训练集: 70%
 - 验证集: 15%
 - 测试集: 15%
+- 读写类型化数据（DATA_FORMAT，见data_schema.py），可另外导出CSV
+- 另外写出分区列式数据集 dataset/split=train|val|test/weather=*/traffic_density=*（PARTITIONED_DATASET）
+- --benchmark-query: 子集查询基准（整表读取再过滤 vs 分区数据集）
 """
 import sys
 
 sys.path.append('D:/Carla Simulation')
 
+import argparse
+import json
+import time
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from roundabout_config_v2 import *
+from data_schema import data_path, find_data_file, read_table, write_table
+from dataset_summary import summary_table, rollup, totals, save_summary
+from partitioned_dataset import dataset_available, dataset_root, iter_dataset, load_dataset, write_split
 
 
 def split_by_trajectory(df, train_ratio=0.7, val_ratio=0.15, test_ratio=0.15):
@@ -53,55 +62,133 @@ def split_by_trajectory(df, train_ratio=0.7, val_ratio=0.15, test_ratio=0.15):
 
 
 def analyze_split(train_df, val_df, test_df):
-    """分析划分后的数据分布"""
+    """分析划分后的数据分布（每个划分一次分组得到汇总表），返回三个划分的汇总表"""
 
     print("\n" + "=" * 60)
     print("数据集统计")
     print("=" * 60)
 
     datasets = {
-        '训练集': train_df,
-        '验证集': val_df,
-        '测试集': test_df
+        'train': ('训练集', train_df),
+        'val': ('验证集', val_df),
+        'test': ('测试集', test_df)
     }
 
-    for name, df in datasets.items():
+    summaries = []
+    for split, (name, df) in datasets.items():
+        summary = summary_table(df, split)
+        summaries.append(summary)
+        total = totals(summary)
+
         print(f"\n{name}:")
-        print(f"  行数: {len(df):,}")
-        print(f"  轨迹数: {df['trackId'].nunique()}")
-        print(f"  场景数: {df['scenario_id'].nunique()}")
-        print(f"  平均速度: {df['speed'].mean():.2f} m/s")
-        print(f"  平均半径: {df['radius'].mean():.2f} m")
+        print(f"  行数: {total['rows']:,}")
+        print(f"  轨迹数: {total['tracks']}")
+        print(f"  场景数: {total['scenarios']}")
+        print(f"  平均速度: {total['speed_mean']:.2f} m/s")
+        print(f"  平均半径: {total['radius_mean']:.2f} m")
 
         # 场景分布
         print(f"  天气分布:")
-        for weather in df['weather'].unique():
-            count = (df['weather'] == weather).sum()
-            print(f"    {weather}: {count:,} ({count / len(df) * 100:.1f}%)")
+        for row in rollup(summary, 'weather').itertuples():
+            print(f"    {row.Index}: {row.rows:,} ({row.rows / total['rows'] * 100:.1f}%)")
+
+    return pd.concat(summaries, ignore_index=True)
+
+
+def benchmark_query(weather, traffic_density):
+    """
+    子集查询基准（weather × traffic_density，split=all）
+
+    整表文件（carla_round_all的各格式）只能完整读取后再过滤，第一批数据要等全部读完；
+    分区数据集只打开对应目录的文件。结果保存到 PROCESSED_DATA_DIR/query_benchmark.json
+    """
+    print("=" * 60)
+    print(f"子集查询基准: weather={weather}, traffic_density={traffic_density}")
+    print("=" * 60)
+
+    if not dataset_root(PROCESSED_DATA_DIR).exists():
+        print("❌ 分区数据集不存在，请先运行 2clean_and_merge_v2.py（PARTITIONED_DATASET = True）")
+        return
+
+    results = []
+    expected = None
+    for suffix in ['.csv', '.parquet']:
+        path = Path(PROCESSED_DATA_DIR) / f'carla_round_all{suffix}'
+        if not path.exists():
+            continue
+        t0 = time.perf_counter()
+        df = read_table(path)
+        subset = df[(df['weather'] == weather) & (df['traffic_density'] == traffic_density)]
+        seconds = time.perf_counter() - t0
+        expected = len(subset)
+        results.append({'source': path.name, 'rows': len(subset),
+                        'first_batch_seconds': seconds, 'total_seconds': seconds})
+        del df, subset
+
+    t0 = time.perf_counter()
+    batches = iter_dataset(PROCESSED_DATA_DIR, split='all', weather=weather, traffic_density=traffic_density)
+    first = next(batches, None)
+    first_batch_seconds = time.perf_counter() - t0
+    rows = 0 if first is None else len(first) + sum(len(batch) for batch in batches)
+    results.append({'source': 'dataset (iter_dataset)', 'rows': rows,
+                    'first_batch_seconds': first_batch_seconds, 'total_seconds': time.perf_counter() - t0})
+
+    t0 = time.perf_counter()
+    subset = load_dataset(PROCESSED_DATA_DIR, split='all', weather=weather, traffic_density=traffic_density)
+    seconds = time.perf_counter() - t0
+    results.append({'source': 'dataset (load_dataset)', 'rows': len(subset),
+                    'first_batch_seconds': seconds, 'total_seconds': seconds})
+
+    print(f"\n{'数据源':<28} {'行数':>10} {'首批(秒)':>10} {'全部(秒)':>10}")
+    print("-" * 62)
+    for entry in results:
+        print(f"{entry['source']:<28} {entry['rows']:>10,} {entry['first_batch_seconds']:>10.3f} "
+              f"{entry['total_seconds']:>10.3f}")
+    if expected is not None and any(entry['rows'] != expected for entry in results):
+        print("⚠️ 各数据源的行数不一致")
+
+    output_file = Path(PROCESSED_DATA_DIR) / 'query_benchmark.json'
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'weather': weather, 'traffic_density': traffic_density, 'results': results}, f, indent=2)
+    print(f"\n✅ 结果已保存: {output_file}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='划分数据集为训练集、验证集、测试集')
+    parser.add_argument('--benchmark-query', metavar='WEATHER:DENSITY',
+                        help='子集查询基准（不划分数据），例如 HardRainNoon:very_dense')
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    if args.benchmark_query:
+        weather, traffic_density = args.benchmark_query.split(':')
+        benchmark_query(weather, traffic_density)
+        return
+
     print("=" * 60)
     print("数据集划分")
     print("=" * 60)
 
     # 读取清洗后的数据
-    input_file = Path(PROCESSED_DATA_DIR) / 'carla_round_all.csv'
+    input_file = find_data_file(PROCESSED_DATA_DIR, 'carla_round_all', DATA_FORMAT)
 
-    if not input_file.exists():
-        print(f"❌ 文件不存在: {input_file}")
+    if input_file is None:
+        print(f"❌ 文件不存在: {Path(PROCESSED_DATA_DIR) / 'carla_round_all'}")
         print("请先运行 clean_and_merge.py")
         return
 
     print(f"\n读取数据: {input_file}")
-    df = pd.read_csv(input_file)
-    print(f"✅ 加载完成: {len(df):,} 行, {df['trackId'].nunique()} 条轨迹")
+    t0 = time.perf_counter()
+    df = read_table(input_file)
+    print(f"✅ 加载完成: {len(df):,} 行, {df['trackId'].nunique()} 条轨迹, {time.perf_counter() - t0:.2f}秒")
 
     # 划分数据集
     train_df, val_df, test_df = split_by_trajectory(df)
 
     # 分析划分结果
-    analyze_split(train_df, val_df, test_df)
+    summary = analyze_split(train_df, val_df, test_df)
 
     # 保存划分后的数据
     print("\n" + "=" * 60)
@@ -109,26 +196,42 @@ def main():
     print("=" * 60)
 
     files = {
-        'train.csv': train_df,
-        'val.csv': val_df,
-        'test.csv': test_df
+        'train': train_df,
+        'val': val_df,
+        'test': test_df
     }
 
-    for filename, data in files.items():
-        filepath = Path(PROCESSED_DATA_DIR) / filename
-        data.to_csv(filepath, index=False)
-        size_mb = filepath.stat().st_size / 1024 / 1024
-        print(f"  ✓ {filename}: {len(data):,} 行, {size_mb:.1f} MB")
+    for name, data in files.items():
+        filepath = write_table(data, data_path(PROCESSED_DATA_DIR, name, DATA_FORMAT))
+        exports = [filepath]
+        if EXPORT_CSV and filepath.suffix != '.csv':
+            exports.append(write_table(data, filepath.with_suffix('.csv')))
+        sizes = ', '.join(f"{path.suffix[1:]} {path.stat().st_size / 1024 / 1024:.1f} MB" for path in exports)
+        print(f"  ✓ {name}: {len(data):,} 行, {sizes}")
+
+    # 分区数据集: dataset/split=train|val|test（每个场景一个文件）
+    if PARTITIONED_DATASET and dataset_available():
+        for name, data in files.items():
+            write_split(data, PROCESSED_DATA_DIR, name)
+        print(f"  ✓ 分区数据集: {dataset_root(PROCESSED_DATA_DIR)}")
+
+    # 汇总表: 在2clean写出的 'all' 行之后追加各划分的行
+    summary_file = save_summary(summary, PROCESSED_DATA_DIR, merge=True)
+    print(f"  ✓ 汇总表: {summary_file.name} ({len(summary)}行)")
 
     print("\n" + "=" * 60)
     print("✅ 划分完成！")
     print("=" * 60)
     print(f"\n数据位置: {PROCESSED_DATA_DIR}")
+    suffix = data_path(PROCESSED_DATA_DIR, 'train', DATA_FORMAT).suffix
     print("\n文件列表:")
-    print("  - carla_round_all.csv (完整数据)")
-    print("  - train.csv (训练集)")
-    print("  - val.csv (验证集)")
-    print("  - test.csv (测试集)")
+    print(f"  - carla_round_all{suffix} (完整数据)")
+    print(f"  - train{suffix} (训练集)")
+    print(f"  - val{suffix} (验证集)")
+    print(f"  - test{suffix} (测试集)")
+    print("  - dataset_summary.csv (汇总表: 划分×场景×天气×密度×行为)")
+    if PARTITIONED_DATASET and dataset_available():
+        print("  - dataset/split=*/weather=*/traffic_density=*/ (分区数据集, partitioned_dataset.load_dataset)")
 
     print("\n下一步: 运行 visualize_data.py 生成可视化")
 
@@ -0,0 +1,104 @@
+# active_set.py
+"""
+活跃车辆集合
+✅ 只保留仍存活的车辆（快照中消失/采集失败即移除，不再每帧轮询）
+✅ 驶出环岛的车辆: 超出采集半径持续一定时间后批量销毁
+✅ 实时统计核心区通过数（曾进入core_radius的车辆）与尚未到达核心区的车辆数
+
+"驶出"判定: 车辆曾进入采集半径后又离开，或位于spawn环带之外（远离环岛行驶）。
+刚在采集半径外spawn、正在驶入的车辆不会被销毁。
+"""
+
+
+class ActiveVehicleSet:
+    """
+    用法:
+        active = ActiveVehicleSet(COLLECTION_RADIUS, SPAWN_RADIUS_MAX, despawn_frames, core_radius=25.0)
+        active.add(vehicle)
+        for vehicle in active: ...
+        to_destroy = active.update(ids, radii, frames=1)
+    """
+
+    def __init__(self, collection_radius, spawn_radius_max, despawn_frames, core_radius=None):
+        self.collection_radius = collection_radius
+        self.spawn_radius_max = spawn_radius_max
+        self.despawn_frames = despawn_frames  # <=0 表示不自动销毁
+        self.core_radius = core_radius
+        self.vehicles = {}  # id → actor（保持spawn顺序）
+        self.outside_frames = {}
+        self.entered = set()
+        self.core_entered = set()  # 曾进入核心区的车辆（移除后仍保留）
+        self.approaching = set()  # 仍在集合中、尚未进入核心区的车辆
+        self.num_dead = 0
+        self.num_despawned = 0
+
+    def __iter__(self):
+        return iter(list(self.vehicles.values()))
+
+    def __len__(self):
+        return len(self.vehicles)
+
+    def ids(self):
+        return list(self.vehicles.keys())
+
+    @property
+    def num_core_passages(self):
+        return len(self.core_entered)
+
+    @property
+    def num_approaching(self):
+        return len(self.approaching)
+
+    def add(self, vehicle):
+        self.vehicles[vehicle.id] = vehicle
+        self.outside_frames[vehicle.id] = 0
+        self.approaching.add(vehicle.id)
+
+    def remove(self, vehicle_ids):
+        for vehicle_id in vehicle_ids:
+            self.vehicles.pop(vehicle_id, None)
+            self.outside_frames.pop(vehicle_id, None)
+            self.entered.discard(vehicle_id)
+            self.approaching.discard(vehicle_id)
+
+    def update(self, vehicle_ids, radii, frames=1):
+        """
+        用本帧观测到的车辆更新集合
+
+        vehicle_ids/radii: 本帧成功读取到状态的车辆及其半径
+        frames: 距上次更新经过的帧数
+        返回需要销毁的车辆id列表（已从集合中移除）
+        """
+        seen = set(vehicle_ids)
+        dead = [vehicle_id for vehicle_id in self.vehicles if vehicle_id not in seen]
+        if dead:
+            self.remove(dead)
+            self.num_dead += len(dead)
+
+        if self.core_radius is not None:
+            for vehicle_id, radius in zip(vehicle_ids, radii):
+                if radius <= self.core_radius and vehicle_id in self.approaching:
+                    self.core_entered.add(vehicle_id)
+                    self.approaching.discard(vehicle_id)
+
+        if self.despawn_frames <= 0:
+            return []
+
+        to_destroy = []
+        for vehicle_id, radius in zip(vehicle_ids, radii):
+            if vehicle_id not in self.vehicles:
+                continue
+            if radius <= self.collection_radius:
+                self.entered.add(vehicle_id)
+                self.outside_frames[vehicle_id] = 0
+            elif vehicle_id in self.entered or radius > self.spawn_radius_max:
+                self.outside_frames[vehicle_id] += frames
+                if self.outside_frames[vehicle_id] >= self.despawn_frames:
+                    to_destroy.append(vehicle_id)
+            else:
+                self.outside_frames[vehicle_id] = 0
+
+        if to_destroy:
+            self.remove(to_destroy)
+            self.num_despawned += len(to_destroy)
+        return to_destroy
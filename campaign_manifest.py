@@ -0,0 +1,160 @@
+# campaign_manifest.py
+"""
+采集任务清单（断点续采）
+✅ 记录每个场景的状态、随机种子、输出文件哈希与耗时
+✅ JSON文件原子写入（崩溃时不会损坏）
+✅ --resume: 跳过已完成场景，未完成场景从最后写盘的块继续
+
+状态:
+    pending  未开始
+    running  运行中（进程崩溃后保持此状态，续采时按partial处理）
+    partial  中断，.part文件中有已写盘的块
+    recorded 已用内置记录器录制（CAPTURE_MODE='recorder'），等待离线提取为CSV
+    done     完成，输出文件哈希已记录
+    failed   失败且没有可续采的数据
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+MANIFEST_NAME = 'campaign_manifest.json'
+
+
+def file_sha256(path, block_size=1 << 20):
+    """计算文件sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class CampaignManifest:
+    """
+    用法:
+        manifest = CampaignManifest.open(RAW_DATA_DIR, scenarios, resume=True)
+        manifest.is_done(scenario_id)
+        manifest.mark_running(scenario_id)
+        manifest.mark_done(scenario_id, output_file, summary)
+        manifest.mark_interrupted(scenario_id, error, frames_flushed)
+    """
+
+    def __init__(self, path, data):
+        self.path = Path(path)
+        self.data = data
+
+    @classmethod
+    def load(cls, raw_data_dir):
+        """读取已有清单（不存在时返回None）"""
+        path = Path(raw_data_dir) / MANIFEST_NAME
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(path, json.load(f))
+
+    @classmethod
+    def open(cls, raw_data_dir, scenarios, resume=False):
+        """读取或新建清单（不续采时总是新建）"""
+        path = Path(raw_data_dir) / MANIFEST_NAME
+        data = None
+        if resume and path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        if data is None:
+            data = {'created_at': _now(), 'scenarios': {}}
+
+        manifest = cls(path, data)
+        for scenario in scenarios:
+            entry = manifest.entry(scenario['id'])
+            entry.setdefault('status', 'pending')
+            entry.setdefault('attempts', 0)
+            entry['weather'] = scenario['weather']
+            entry['density'] = scenario['density_name']
+            entry['seed'] = scenario['seed']
+        manifest.save()
+        return manifest
+
+    def entry(self, scenario_id):
+        return self.data['scenarios'].setdefault(str(scenario_id), {})
+
+    def save(self):
+        """原子写入"""
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, scenario_id, output_file):
+        """已完成且输出文件哈希一致"""
+        entry = self.entry(scenario_id)
+        if entry.get('status') != 'done':
+            return False
+        output_file = Path(output_file)
+        return output_file.exists() and file_sha256(output_file) == entry.get('sha256')
+
+    def is_recorded(self, scenario_id, metadata_file):
+        """已录制（待提取）且元数据文件存在"""
+        return self.entry(scenario_id).get('status') == 'recorded' and Path(metadata_file).exists()
+
+    def mark_running(self, scenario_id):
+        entry = self.entry(scenario_id)
+        entry['status'] = 'running'
+        entry['attempts'] = entry.get('attempts', 0) + 1
+        entry['started_at'] = _now()
+        entry.pop('error', None)
+        self.save()
+
+    def mark_done(self, scenario_id, output_file, summary, elapsed=None):
+        entry = self.entry(scenario_id)
+        entry['status'] = 'done'
+        entry['output'] = Path(output_file).name
+        entry['sha256'] = file_sha256(output_file)
+        entry['rows'] = summary.rows
+        entry['tracks'] = summary.num_tracks
+        entry['core_tracks'] = summary.num_core_tracks
+        entry['finished_at'] = _now()
+        if elapsed is not None:
+            entry['elapsed'] = round(elapsed, 1)
+        entry.pop('frames_flushed', None)
+        entry.pop('error', None)
+        self.save()
+
+    def mark_recorded(self, scenario_id, metadata_file, elapsed=None):
+        entry = self.entry(scenario_id)
+        entry['status'] = 'recorded'
+        entry['recorder_metadata'] = Path(metadata_file).name
+        entry['finished_at'] = _now()
+        if elapsed is not None:
+            entry['elapsed'] = round(elapsed, 1)
+        entry.pop('frames_flushed', None)
+        entry.pop('error', None)
+        self.save()
+
+    def mark_interrupted(self, scenario_id, error, frames_flushed=0, elapsed=None):
+        entry = self.entry(scenario_id)
+        entry['status'] = 'partial' if frames_flushed > 0 else 'failed'
+        entry['frames_flushed'] = frames_flushed
+        entry['error'] = error
+        entry['finished_at'] = _now()
+        if elapsed is not None:
+            entry['elapsed'] = round(elapsed, 1)
+        self.save()
+
+    def counts(self):
+        """各状态的场景数"""
+        counts = {}
+        for entry in self.data['scenarios'].values():
+            status = entry.get('status', 'pending')
+            counts[status] = counts.get(status, 0) + 1
+        return counts
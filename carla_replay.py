@@ -0,0 +1,728 @@
+# carla_replay.py
+"""
+离线CARLA替身 - 回放已采集的scenario_XXX.csv / .parquet
+✅ 纯Python实现，无需CARLA服务器
+✅ 覆盖采集脚本与test_mixed_behavior.py用到的carla API子集
+✅ 可配置模拟RPC延迟，用于确定性性能基准
+
+用法（采集脚本、配置与test_mixed_behavior.py检测到该环境变量时自动改用本模块）:
+    CARLA_REPLAY_DIR=/path/to/raw python 1collect_full_v2_mixed_behavior.py
+    CARLA_REPLAY_DIR=/path/to/raw CARLA_REPLAY_RPC_LATENCY=0.0005 python test_mixed_behavior.py
+
+或在代码中:
+    import carla_replay as carla
+    carla.configure(source_dir='...', rpc_latency=0.0005)
+
+回放规则:
+- spawn点 = 录制轨迹起点中位于外环的位置
+- spawn_actor 选取起点最近的未使用轨迹，之后按仿真时间前进
+  （每tick前进 fixed_delta_seconds × CARLA_REPLAY_SOURCE_RATE 帧，默认录制帧率10Hz，非整数帧时插值）
+- 轨迹结束后车辆停在终点（速度为0）
+- 交通管理器设置只记录，不影响回放轨迹
+- start_recorder 写文本日志（show_recorder_file_info(show_all=True)的格式），用于离线测试日志提取
+"""
+import glob
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# ===== 回放配置 =====
+_CONFIG = {
+    'source_dir': os.environ.get('CARLA_REPLAY_DIR', ''),
+    'rpc_latency': float(os.environ.get('CARLA_REPLAY_RPC_LATENCY', '0.0')),
+    'tick_latency': float(os.environ.get('CARLA_REPLAY_TICK_LATENCY', '0.0')),
+    'spawn_clearance': 2.0,
+    'source_rate': float(os.environ.get('CARLA_REPLAY_SOURCE_RATE', '10')),  # 录制数据的帧率（Hz）
+}
+
+_STATS = {'rpc_calls': 0, 'ticks': 0}
+_STATS_LOCK = threading.Lock()
+
+
+def configure(source_dir=None, rpc_latency=None, tick_latency=None, spawn_clearance=None, source_rate=None):
+    """修改回放配置（在创建Client之前调用）"""
+    updates = {
+        'source_dir': source_dir,
+        'rpc_latency': rpc_latency,
+        'tick_latency': tick_latency,
+        'spawn_clearance': spawn_clearance,
+        'source_rate': source_rate,
+    }
+    for key, value in updates.items():
+        if value is not None:
+            _CONFIG[key] = value
+
+
+def get_rpc_stats():
+    """返回累计RPC次数与tick次数"""
+    with _STATS_LOCK:
+        return dict(_STATS)
+
+
+def reset_rpc_stats():
+    with _STATS_LOCK:
+        _STATS['rpc_calls'] = 0
+        _STATS['ticks'] = 0
+
+
+def _rpc(latency=None):
+    """模拟一次阻塞RPC"""
+    with _STATS_LOCK:
+        _STATS['rpc_calls'] += 1
+    delay = _CONFIG['rpc_latency'] if latency is None else latency
+    if delay > 0:
+        time.sleep(delay)
+
+
+# ===== 基础几何类型 =====
+class Vector3D:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __add__(self, other):
+        return type(self)(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return type(self)(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def length(self):
+        return math.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(x={self.x:.6f}, y={self.y:.6f}, z={self.z:.6f})'
+
+
+class Location(Vector3D):
+    def distance(self, other):
+        return math.sqrt((self.x - other.x) ** 2 + (self.y - other.y) ** 2 + (self.z - other.z) ** 2)
+
+
+class Rotation:
+    def __init__(self, pitch=0.0, yaw=0.0, roll=0.0):
+        self.pitch = float(pitch)
+        self.yaw = float(yaw)
+        self.roll = float(roll)
+
+
+class Transform:
+    def __init__(self, location=None, rotation=None):
+        self.location = location if location is not None else Location()
+        self.rotation = rotation if rotation is not None else Rotation()
+
+
+class WeatherParameters:
+    def __init__(self, name='Custom', **params):
+        self.name = name
+        for key, value in params.items():
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return f'WeatherParameters({self.name})'
+
+
+for _preset in ['ClearNoon', 'CloudyNoon', 'WetNoon', 'WetCloudyNoon', 'SoftRainNoon', 'MidRainyNoon',
+                'HardRainNoon', 'ClearSunset', 'CloudySunset', 'WetSunset', 'SoftRainSunset', 'HardRainSunset']:
+    setattr(WeatherParameters, _preset, WeatherParameters(_preset))
+
+
+class WorldSettings:
+    def __init__(self):
+        self.synchronous_mode = False
+        self.fixed_delta_seconds = None
+        self.no_rendering_mode = False
+        self.substepping = True
+        self.max_substep_delta_time = 0.01
+        self.max_substeps = 10
+
+
+class Timestamp:
+    def __init__(self, frame, elapsed_seconds, delta_seconds):
+        self.frame = frame
+        self.elapsed_seconds = elapsed_seconds
+        self.delta_seconds = delta_seconds
+        self.platform_timestamp = time.time()
+
+
+def _cm(meters):
+    """米 → 记录器日志中的厘米（完整精度）"""
+    return repr(float(meters) * 100)
+
+
+# ===== 轨迹数据 =====
+class _Trajectory:
+    """一条录制轨迹（按帧排序的数组）"""
+
+    def __init__(self, track_id, group):
+        group = group.sort_values('frame')
+        self.track_id = track_id
+        self.x = group['x'].to_numpy(dtype=float)
+        self.y = group['y'].to_numpy(dtype=float)
+        self.z = group['z'].to_numpy(dtype=float) if 'z' in group else np.zeros(len(group))
+        self.vx = group['vx'].to_numpy(dtype=float)
+        self.vy = group['vy'].to_numpy(dtype=float)
+        self.ax = group['ax'].to_numpy(dtype=float) if 'ax' in group else np.zeros(len(group))
+        self.ay = group['ay'].to_numpy(dtype=float) if 'ay' in group else np.zeros(len(group))
+        self.yaw = np.degrees(group['heading'].to_numpy(dtype=float))
+        self.length = len(group)
+
+    def state(self, step):
+        """返回第step帧的状态（step可为小数，在相邻两帧间线性插值；超出末尾则停在终点）"""
+        if step > self.length - 1:
+            i = self.length - 1
+            return (self.x[i], self.y[i], self.z[i], self.yaw[i], 0.0, 0.0, 0.0, 0.0)
+        i = int(step)
+        frac = step - i
+        if frac < 1e-9:
+            return (self.x[i], self.y[i], self.z[i], self.yaw[i],
+                    self.vx[i], self.vy[i], self.ax[i], self.ay[i])
+        j = i + 1
+        yaw_delta = (self.yaw[j] - self.yaw[i] + 180.0) % 360.0 - 180.0
+        return tuple(a[i] + frac * (a[j] - a[i]) for a in (self.x, self.y, self.z)) + \
+            ((self.yaw[i] + frac * yaw_delta + 180.0) % 360.0 - 180.0,) + \
+            tuple(a[i] + frac * (a[j] - a[i]) for a in (self.vx, self.vy, self.ax, self.ay))
+
+
+def _load_trajectories(source_dir):
+    """从目录中的scenario_XXX.csv / scenario_XXX.parquet读取全部轨迹"""
+    files = sorted(glob.glob(os.path.join(source_dir, 'scenario_*.csv')) +
+                   glob.glob(os.path.join(source_dir, 'scenario_*.parquet')))
+    if not files:
+        raise RuntimeError(f'回放目录中没有scenario_XXX.csv/.parquet: {source_dir!r}')
+
+    trajectories = []
+    columns = ['frame', 'trackId', 'x', 'y', 'z', 'vx', 'vy', 'ax', 'ay', 'heading']
+    for file_path in files:
+        if file_path.endswith('.parquet'):
+            df = pd.read_parquet(file_path, columns=columns).astype({c: np.float64 for c in columns[2:]})
+        else:
+            df = pd.read_csv(file_path, usecols=lambda c: c in columns)
+        for track_id, group in df.groupby('trackId', sort=True):
+            if len(group) >= 2:
+                trajectories.append(_Trajectory(track_id, group))
+    return trajectories
+
+
+# ===== Actor =====
+class ActorSnapshot:
+    def __init__(self, actor_id, state):
+        self.id = actor_id
+        self._state = state
+
+    def get_transform(self):
+        x, y, z, yaw = self._state[:4]
+        return Transform(Location(x, y, z), Rotation(yaw=yaw))
+
+    def get_velocity(self):
+        return Vector3D(self._state[4], self._state[5], 0.0)
+
+    def get_angular_velocity(self):
+        return Vector3D()
+
+    def get_acceleration(self):
+        return Vector3D(self._state[6], self._state[7], 0.0)
+
+
+class ActorBlueprint:
+    def __init__(self, blueprint_id):
+        self.id = blueprint_id
+        self.tags = blueprint_id.split('.')
+        self._attributes = {'role_name': 'autopilot'}
+
+    def has_attribute(self, name):
+        return name in self._attributes
+
+    def set_attribute(self, name, value):
+        self._attributes[name] = value
+
+
+class BlueprintLibrary:
+    def __init__(self, blueprints):
+        self._blueprints = list(blueprints)
+
+    def filter(self, pattern):
+        prefix = pattern.rstrip('*')
+        return [bp for bp in self._blueprints if bp.id.startswith(prefix)]
+
+    def find(self, blueprint_id):
+        for bp in self._blueprints:
+            if bp.id == blueprint_id:
+                return bp
+        raise IndexError(blueprint_id)
+
+    def __iter__(self):
+        return iter(self._blueprints)
+
+    def __len__(self):
+        return len(self._blueprints)
+
+
+class Actor:
+    def __init__(self, world, actor_id, blueprint, trajectory):
+        self._world = world
+        self.id = actor_id
+        self.type_id = blueprint.id
+        self.attributes = dict(blueprint._attributes)
+        self._trajectory = trajectory
+        self._spawn_tick = world._tick_count
+        self.is_alive = True
+        self.autopilot = False
+        self.simulate_physics = True
+
+    def _state(self):
+        return self._trajectory.state((self._world._tick_count - self._spawn_tick) * self._world._replay_step())
+
+    def get_transform(self):
+        _rpc()
+        return ActorSnapshot(self.id, self._state()).get_transform()
+
+    def get_location(self):
+        return self.get_transform().location
+
+    def get_velocity(self):
+        _rpc()
+        return ActorSnapshot(self.id, self._state()).get_velocity()
+
+    def get_acceleration(self):
+        _rpc()
+        return ActorSnapshot(self.id, self._state()).get_acceleration()
+
+    def get_angular_velocity(self):
+        _rpc()
+        return Vector3D()
+
+    def set_autopilot(self, enabled=True, tm_port=8000):
+        _rpc()
+        self._check_alive()
+        self.autopilot = enabled
+
+    def set_simulate_physics(self, enabled=True):
+        """只记录设置，不影响回放轨迹"""
+        _rpc()
+        self._check_alive()
+        self.simulate_physics = enabled
+
+    def destroy(self):
+        _rpc()
+        return self._world._destroy(self.id)
+
+    def _check_alive(self):
+        if not self.is_alive:
+            raise RuntimeError(f'trying to operate on a destroyed actor; an actor\'s function was called, '
+                               f'but the actor is already destroyed. (id={self.id})')
+
+
+class ActorList(list):
+    def filter(self, pattern):
+        prefix = pattern.rstrip('*')
+        return ActorList(a for a in self if a.type_id.startswith(prefix))
+
+    def find(self, actor_id):
+        for actor in self:
+            if actor.id == actor_id:
+                return actor
+        return None
+
+
+class WorldSnapshot:
+    def __init__(self, frame, timestamp, states):
+        self.frame = frame
+        self.timestamp = timestamp
+        self._states = states
+        self.id = frame
+
+    def find(self, actor_id):
+        state = self._states.get(actor_id)
+        return ActorSnapshot(actor_id, state) if state is not None else None
+
+    def has_actor(self, actor_id):
+        return actor_id in self._states
+
+    def __iter__(self):
+        return (ActorSnapshot(actor_id, state) for actor_id, state in self._states.items())
+
+    def __len__(self):
+        return len(self._states)
+
+
+class Map:
+    def __init__(self, name, spawn_points):
+        self.name = name
+        self._spawn_points = spawn_points
+
+    def get_spawn_points(self):
+        _rpc()
+        return [Transform(Location(sp.location.x, sp.location.y, sp.location.z), Rotation(yaw=sp.rotation.yaw))
+                for sp in self._spawn_points]
+
+
+class World:
+    def __init__(self, map_name, trajectories):
+        self._map_name = map_name
+        self._trajectories = trajectories
+        self._used = set()
+        self._actors = {}
+        self._next_actor_id = 1
+        self._tick_count = 0
+        self._settings = WorldSettings()
+        self._weather = WeatherParameters.ClearNoon
+        self._recorder = None
+        self._lock = threading.Lock()
+        self._blueprints = BlueprintLibrary(ActorBlueprint(bp_id) for bp_id in [
+            'vehicle.audi.a2', 'vehicle.tesla.model3', 'vehicle.toyota.prius',
+            'vehicle.lincoln.mkz_2020', 'vehicle.mini.cooper_s', 'vehicle.nissan.micra',
+        ])
+
+        # spawn点 = 轨迹起点（去重，间距>1米）
+        spawn_points = []
+        for traj in trajectories:
+            loc = Location(traj.x[0], traj.y[0], traj.z[0])
+            if all(loc.distance(sp.location) > 1.0 for sp in spawn_points):
+                spawn_points.append(Transform(loc, Rotation(yaw=traj.yaw[0])))
+        self._map = Map(map_name, spawn_points)
+
+    # ----- 设置 -----
+    def get_settings(self):
+        _rpc()
+        settings = WorldSettings()
+        settings.__dict__.update(self._settings.__dict__)
+        return settings
+
+    def apply_settings(self, settings):
+        _rpc()
+        self._settings.__dict__.update(settings.__dict__)
+        return self._tick_count
+
+    def get_map(self):
+        _rpc()
+        return self._map
+
+    def get_blueprint_library(self):
+        _rpc()
+        return self._blueprints
+
+    def set_weather(self, weather):
+        _rpc()
+        self._weather = weather
+
+    def get_weather(self):
+        _rpc()
+        return self._weather
+
+    # ----- 时钟 -----
+    def _delta(self):
+        return self._settings.fixed_delta_seconds or 0.05
+
+    def _replay_step(self):
+        """每个tick前进的录制帧数（未设置fixed_delta_seconds时每tick一帧）"""
+        if self._settings.fixed_delta_seconds is None:
+            return 1.0
+        return self._settings.fixed_delta_seconds * _CONFIG['source_rate']
+
+    def tick(self, seconds=10.0):
+        _rpc(_CONFIG['tick_latency'])
+        with _STATS_LOCK:
+            _STATS['ticks'] += 1
+        with self._lock:
+            self._tick_count += 1
+            tick_count = self._tick_count
+        if self._recorder is not None:
+            self._record_frame()
+        return tick_count
+
+    def wait_for_tick(self, seconds=10.0):
+        self.tick()
+        return self.get_snapshot()
+
+    def get_snapshot(self):
+        _rpc()
+        with self._lock:
+            states = {actor_id: actor._state() for actor_id, actor in self._actors.items()}
+            timestamp = Timestamp(self._tick_count, self._tick_count * self._delta(), self._delta())
+            return WorldSnapshot(self._tick_count, timestamp, states)
+
+    # ----- 内置记录器 -----
+    def _start_recorder(self, filename, additional_data):
+        self._stop_recorder()
+        handle = open(filename, 'w', encoding='utf-8')
+        handle.write(f"Version: 1\nMap: {self._map_name}\nDate: {time.strftime('%m/%d/%y %H:%M:%S')}\n\n")
+        self._recorder = {'handle': handle, 'frames': 0, 'known': set(), 'additional_data': additional_data}
+
+    def _stop_recorder(self):
+        if self._recorder is not None:
+            self._recorder['handle'].close()
+            self._recorder = None
+
+    def _record_frame(self):
+        """按 show_recorder_file_info(show_all=True) 的文本格式写一帧（位置/速度单位为厘米）"""
+        recorder = self._recorder
+        recorder['frames'] += 1
+        with self._lock:
+            states = {actor_id: (actor.type_id, actor._state()) for actor_id, actor in self._actors.items()}
+
+        lines = [f"Frame {recorder['frames']} at {recorder['frames'] * self._delta()!r} seconds"]
+        for actor_id in sorted(states.keys() - recorder['known']):
+            type_id, (x, y, z) = states[actor_id][0], states[actor_id][1][:3]
+            lines.append(f" Create {actor_id}: {type_id} (1) at ({_cm(x)}, {_cm(y)}, {_cm(z)})")
+        for actor_id in sorted(recorder['known'] - states.keys()):
+            lines.append(f" Destroy {actor_id}")
+        recorder['known'] = set(states)
+
+        lines.append(f" Positions: {len(states)}")
+        for actor_id, (_, (x, y, z, yaw, vx, vy, ax, ay)) in sorted(states.items()):
+            lines.append(f"  Id: {actor_id} Location: ({_cm(x)}, {_cm(y)}, {_cm(z)}) "
+                         f"Rotation: (0, 0, {float(yaw)!r})")
+        if recorder['additional_data']:
+            lines.append(f" Kinematics: {len(states)}")
+            for actor_id, (_, (x, y, z, yaw, vx, vy, ax, ay)) in sorted(states.items()):
+                lines.append(f"  Id: {actor_id} Linear Velocity: ({_cm(vx)}, {_cm(vy)}, 0) "
+                             f"Angular Velocity: (0, 0, 0)")
+        recorder['handle'].write('\n'.join(lines) + '\n')
+
+    # ----- Actor管理 -----
+    def get_actors(self, actor_ids=None):
+        _rpc()
+        actors = ActorList(self._actors.values())
+        if actor_ids is not None:
+            wanted = set(actor_ids)
+            actors = ActorList(a for a in actors if a.id in wanted)
+        return actors
+
+    def get_actor(self, actor_id):
+        _rpc()
+        return self._actors.get(actor_id)
+
+    def _spawn(self, blueprint, transform):
+        """不计RPC的spawn实现（供spawn_actor与apply_batch_sync共用）"""
+        with self._lock:
+            clearance = _CONFIG['spawn_clearance']
+            for actor in self._actors.values():
+                x, y, z = actor._state()[:3]
+                if transform.location.distance(Location(x, y, z)) < clearance:
+                    raise RuntimeError('Spawn failed because of collision at spawn position')
+
+            candidates = [t for t in self._trajectories if id(t) not in self._used]
+            if not candidates:
+                self._used.clear()
+                candidates = list(self._trajectories)
+            trajectory = min(candidates, key=lambda t: (t.x[0] - transform.location.x) ** 2 +
+                                                       (t.y[0] - transform.location.y) ** 2)
+            self._used.add(id(trajectory))
+
+            actor = Actor(self, self._next_actor_id, blueprint, trajectory)
+            self._actors[actor.id] = actor
+            self._next_actor_id += 1
+            return actor
+
+    def spawn_actor(self, blueprint, transform, attach_to=None):
+        _rpc()
+        return self._spawn(blueprint, transform)
+
+    def try_spawn_actor(self, blueprint, transform, attach_to=None):
+        try:
+            return self.spawn_actor(blueprint, transform)
+        except RuntimeError:
+            return None
+
+    def _destroy(self, actor_id):
+        with self._lock:
+            actor = self._actors.pop(actor_id, None)
+        if actor is None:
+            return False
+        actor.is_alive = False
+        return True
+
+
+# ===== 交通管理器 =====
+class TrafficManager:
+    """交通管理器（与客户端同进程，设置调用不计RPC）"""
+
+    def __init__(self, port):
+        self._port = port
+        self.vehicle_settings = {}
+        self.global_settings = {}
+
+    def get_port(self):
+        return self._port
+
+    def _set_global(self, key, value):
+        self.global_settings[key] = value
+
+    def _set_vehicle(self, vehicle, key, value):
+        vehicle._check_alive()
+        self.vehicle_settings.setdefault(vehicle.id, {})[key] = value
+
+    def set_synchronous_mode(self, mode=True):
+        self._set_global('synchronous_mode', mode)
+
+    def set_global_distance_to_leading_vehicle(self, distance):
+        self._set_global('distance_to_leading_vehicle', distance)
+
+    def global_percentage_speed_difference(self, percentage):
+        self._set_global('percentage_speed_difference', percentage)
+
+    def set_hybrid_physics_mode(self, enabled=True):
+        self._set_global('hybrid_physics_mode', enabled)
+
+    def set_hybrid_physics_radius(self, radius=70.0):
+        self._set_global('hybrid_physics_radius', radius)
+
+    def set_respawn_dormant_vehicles(self, mode=True):
+        self._set_global('respawn_dormant_vehicles', mode)
+
+    def set_boundaries_respawn_dormant_vehicles(self, lower_bound=25.0, upper_bound=100.0):
+        self._set_global('respawn_boundaries', (lower_bound, upper_bound))
+
+    def set_random_device_seed(self, seed):
+        self._set_global('seed', seed)
+
+    def vehicle_percentage_speed_difference(self, vehicle, percentage):
+        self._set_vehicle(vehicle, 'percentage_speed_difference', percentage)
+
+    def distance_to_leading_vehicle(self, vehicle, distance):
+        self._set_vehicle(vehicle, 'distance_to_leading_vehicle', distance)
+
+    def ignore_lights_percentage(self, vehicle, percentage):
+        self._set_vehicle(vehicle, 'ignore_lights_percentage', percentage)
+
+
+# ===== 批量命令 =====
+class _CommandModule:
+    """对应 carla.command"""
+
+    class FutureActor:
+        pass
+
+    class SpawnActor:
+        def __init__(self, blueprint, transform, parent=None):
+            self.blueprint = blueprint
+            self.transform = transform
+            self.then_commands = []
+
+        def then(self, command):
+            self.then_commands.append(command)
+            return self
+
+    class SetAutopilot:
+        def __init__(self, actor, enabled, tm_port=8000):
+            self.actor_id = actor
+            self.enabled = enabled
+            self.tm_port = tm_port
+
+    class DestroyActor:
+        def __init__(self, actor):
+            self.actor_id = actor
+
+    class Response:
+        def __init__(self, actor_id=0, error=''):
+            self.actor_id = actor_id
+            self.error = error
+
+        def has_error(self):
+            return bool(self.error)
+
+
+command = _CommandModule
+
+
+class Client:
+    def __init__(self, host='localhost', port=2000, worker_threads=0):
+        self.host = host
+        self.port = port
+        self._timeout = 10.0
+        self._world = None
+        self._traffic_managers = {}
+
+    def set_timeout(self, seconds):
+        self._timeout = seconds
+
+    def get_server_version(self):
+        return '0.9.15-replay'
+
+    def get_client_version(self):
+        return '0.9.15-replay'
+
+    def load_world(self, map_name, reset_settings=True):
+        _rpc()
+        source_dir = _CONFIG['source_dir']
+        if not source_dir:
+            raise RuntimeError('未设置回放目录: 请设置 CARLA_REPLAY_DIR 或调用 carla_replay.configure(source_dir=...)')
+        self._world = World(map_name, _load_trajectories(source_dir))
+        return self._world
+
+    def get_world(self):
+        if self._world is None:
+            return self.load_world('Town03')
+        return self._world
+
+    def get_trafficmanager(self, port=8000):
+        _rpc()
+        if port not in self._traffic_managers:
+            self._traffic_managers[port] = TrafficManager(port)
+        return self._traffic_managers[port]
+
+    def start_recorder(self, filename, additional_data=False):
+        """写入文本日志（格式同真实记录器的show_recorder_file_info输出）"""
+        _rpc()
+        self.get_world()._start_recorder(filename, additional_data)
+        return f'Recording on file: {filename}'
+
+    def stop_recorder(self):
+        _rpc()
+        if self._world is not None:
+            self._world._stop_recorder()
+
+    def show_recorder_file_info(self, filename, show_all=False):
+        _rpc()
+        with open(filename, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if show_all:
+            return text
+        header, _, body = text.partition('\n\n')
+        return f"{header}\n\nFrames: {body.count('Frame ')}\n"
+
+    def apply_batch(self, commands):
+        self.apply_batch_sync(commands)
+
+    def apply_batch_sync(self, commands, do_tick=False):
+        """批量执行命令（整批只计一次RPC）"""
+        _rpc()
+        world = self.get_world()
+        responses = []
+        for cmd in commands:
+            responses.append(self._execute(world, cmd))
+        if do_tick:
+            world.tick()
+        return responses
+
+    def _execute(self, world, cmd, parent_id=0):
+        response = command.Response
+        if isinstance(cmd, command.SpawnActor):
+            try:
+                actor = world._spawn(cmd.blueprint, cmd.transform)
+            except RuntimeError as e:
+                return response(error=str(e))
+            for then_cmd in cmd.then_commands:
+                result = self._execute(world, then_cmd, actor.id)
+                if result.has_error():
+                    world._destroy(actor.id)
+                    return response(error=result.error)
+            return response(actor.id)
+        actor_id = cmd.actor_id
+        if actor_id is command.FutureActor or isinstance(actor_id, command.FutureActor):
+            actor_id = parent_id
+        elif hasattr(actor_id, 'id'):
+            actor_id = actor_id.id
+        actor = world._actors.get(actor_id)
+        if actor is None:
+            return response(actor_id, f'actor {actor_id} not found')
+        if isinstance(cmd, command.SetAutopilot):
+            actor.autopilot = cmd.enabled
+        elif isinstance(cmd, command.DestroyActor):
+            world._destroy(actor_id)
+        return response(actor_id)
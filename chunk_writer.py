@@ -0,0 +1,179 @@
+# chunk_writer.py
+"""
+流式分块写入器
+✅ 采集过程中按块（默认30秒仿真时间）追加写入
+✅ 后台线程写盘，不阻塞tick循环
+✅ 写入 scenario_XXX.csv.part，完成后原子重命名为 scenario_XXX.csv
+✅ 仿真崩溃时已写入的块保留在 .part 文件中
+✅ 每块写盘后记录进度（字节数/下一帧），可从最后一块续写
+✅ 每块按data_schema类型表转换（float32/int32/类别）后写出
+
+.part始终是CSV（表头只写一次，可按字节截断续写）；最终文件为 .parquet 时，
+close() 把 .part 一次性转换为parquet后再原子替换。
+"""
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from data_schema import apply_schema, format_of, read_table, write_table
+
+PART_SUFFIX = '.part'
+PROGRESS_SUFFIX = '.progress'
+
+
+def part_path(output_file):
+    """未完成文件路径: scenario_XXX.csv → scenario_XXX.csv.part（scenario_XXX.parquet → scenario_XXX.parquet.part）"""
+    output_file = Path(output_file)
+    return output_file.with_name(output_file.name + PART_SUFFIX)
+
+
+def progress_path(output_file):
+    """进度文件路径: scenario_XXX.csv → scenario_XXX.csv.progress"""
+    output_file = Path(output_file)
+    return output_file.with_name(output_file.name + PROGRESS_SUFFIX)
+
+
+def read_progress(output_file):
+    """
+    读取已写盘进度，没有可续写的数据时返回None
+
+    返回: {'rows': 已写行数, 'bytes': .part有效字节数, 'next_frame': 下一帧编号}
+    """
+    progress_file = progress_path(output_file)
+    if not progress_file.exists() or not part_path(output_file).exists():
+        return None
+    with open(progress_file, 'r', encoding='utf-8') as f:
+        progress = json.load(f)
+    if progress.get('rows', 0) <= 0:
+        return None
+    return progress
+
+
+class ChunkedScenarioWriter:
+    """
+    后台线程分块写入
+
+    用法:
+        writer = ChunkedScenarioWriter(output_file)
+        writer.write(chunk_df, next_frame)   # 入队，立即返回（队列满时阻塞）
+        writer.close()                       # 等待写完，fsync，原子重命名
+        writer.abort()                       # 出错时: 写完已入队的块，保留.part文件
+
+    resume=True 时截断到上次记录的进度并追加写入。
+    """
+
+    def __init__(self, output_file, max_pending=2, resume=False):
+        self.output_file = Path(output_file)
+        self.part_file = part_path(self.output_file)
+        self.progress_file = progress_path(self.output_file)
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.next_frame = 0
+        self.write_seconds = 0.0  # 后台线程写盘耗时（含fsync）
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._closed = False
+
+        progress = read_progress(self.output_file) if resume else None
+        if progress is not None:
+            # ⭐ 续写: 丢弃最后一次记录之后可能写了一半的内容
+            self._handle = open(self.part_file, 'r+', newline='', encoding='utf-8')
+            self._handle.truncate(progress['bytes'])
+            self._handle.seek(progress['bytes'])
+            self._header_written = True
+            self.rows_written = progress['rows']
+            self.next_frame = progress['next_frame']
+        else:
+            # 新场景从头写（覆盖旧的.part）
+            self._handle = open(self.part_file, 'w', newline='', encoding='utf-8')
+            self._header_written = False
+            if self.progress_file.exists():
+                self.progress_file.unlink()
+
+        self._thread = threading.Thread(target=self._run, name=f'writer-{self.output_file.stem}', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+            chunk, next_frame = item
+            t0 = time.perf_counter()
+            try:
+                apply_schema(chunk).to_csv(self._handle, index=False, header=not self._header_written)
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+                self._header_written = True
+                self.rows_written += len(chunk)
+                self.chunks_written += 1
+                if next_frame is not None:
+                    self.next_frame = next_frame
+                self._save_progress()
+            except Exception as e:
+                self._error = e
+            self.write_seconds += time.perf_counter() - t0
+
+    def _save_progress(self):
+        """块写盘后记录进度（原子替换）"""
+        progress = {
+            'rows': self.rows_written,
+            'bytes': self._handle.tell(),
+            'next_frame': self.next_frame,
+        }
+        tmp_file = self.progress_file.with_name(self.progress_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(progress, f)
+        os.replace(tmp_file, self.progress_file)
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError(f'写入 {self.part_file} 失败: {self._error}') from self._error
+
+    def write(self, chunk, next_frame=None):
+        """提交一块数据（DataFrame），next_frame为该块之后的下一帧编号"""
+        self._raise_if_failed()
+        if len(chunk) > 0:
+            self._queue.put((chunk, next_frame))
+
+    def _drain(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._handle.close()
+
+    def close(self):
+        """写完所有块并原子替换为最终文件（parquet输出时先转换格式）"""
+        self._drain()
+        self._raise_if_failed()
+        if format_of(self.output_file) == 'csv':
+            os.replace(self.part_file, self.output_file)
+        else:
+            t0 = time.perf_counter()
+            write_table(read_table(self.part_file, data_format='csv'), self.output_file)
+            self.part_file.unlink()
+            self.write_seconds += time.perf_counter() - t0
+        if self.progress_file.exists():
+            self.progress_file.unlink()
+        return self.output_file
+
+    def abort(self):
+        """写完已提交的块，保留 .part 文件（不生成最终文件）"""
+        self._drain()
+        return self.part_file
+
+    def discard(self):
+        """放弃本场景输出"""
+        self._drain()
+        for path in [self.part_file, self.progress_file]:
+            if path.exists():
+                path.unlink()
@@ -0,0 +1,258 @@
+# data_schema.py
+"""
+紧凑类型化数据格式
+✅ 统一的列类型: frame/trackId为int32，运动学列为float32，天气/密度/行为为类别（字典编码）
+✅ 'parquet': 列式存储，类别列保存为字典，读取后类型不变（需要pyarrow）
+✅ 'csv': 兼容格式，读取时按同一类型表转换
+✅ DATA_FORMAT = 'parquet' 但未安装pyarrow时自动退回CSV
+✅ 原子写入（先写 .tmp 再重命名）
+✅ storage_report: 同一数据各格式的磁盘占用与加载时间
+✅ 分块读写（iter_table / TableWriter）: 内存只与块大小有关，不随文件大小增长
+
+采集（scenario_XXX）、清洗合并（carla_round_all）、划分（train/val/test）使用同一套类型表。
+"""
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from frame_recorder import CATEGORIES, INT_COLUMNS, FLOAT_COLUMNS
+
+FORMAT_SUFFIXES = {
+    'parquet': '.parquet',
+    'csv': '.csv',
+}
+
+# ⭐ 列类型表（未列出的浮点列一律转为float32，例如EXTRA_FEATURES）
+INT32_COLUMNS = list(INT_COLUMNS) + ['original_trackId']
+INT16_COLUMNS = ['scenario_id']
+FLOAT32_COLUMNS = list(FLOAT_COLUMNS)
+CATEGORY_COLUMNS = list(CATEGORIES.keys())
+
+# parquet每个行组的行数（分块读取时一次最多解码一个行组）
+ROW_GROUP_ROWS = 262144
+
+_warned_fallback = False
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_format(data_format):
+    """实际使用的格式（parquet不可用时退回csv）"""
+    global _warned_fallback
+    if data_format not in FORMAT_SUFFIXES:
+        raise ValueError(f'未知的数据格式: {data_format}（可选: {list(FORMAT_SUFFIXES.keys())}）')
+    if data_format == 'parquet' and not parquet_available():
+        if not _warned_fallback:
+            print("⚠️ 未安装pyarrow，数据格式退回CSV（pip install pyarrow）")
+            _warned_fallback = True
+        return 'csv'
+    return data_format
+
+
+def format_of(path):
+    """由后缀判断文件格式"""
+    suffix = Path(path).suffix
+    for data_format, format_suffix in FORMAT_SUFFIXES.items():
+        if suffix == format_suffix:
+            return data_format
+    raise ValueError(f'无法识别的数据文件: {path}')
+
+
+def data_path(directory, stem, data_format):
+    """directory/stem + 格式后缀（如 scenario_000.parquet）"""
+    return Path(directory) / (stem + FORMAT_SUFFIXES[resolve_format(data_format)])
+
+
+def find_data_file(directory, stem, data_format):
+    """已存在的数据文件: 优先data_format，其次其他格式；都不存在时返回None"""
+    preferred = resolve_format(data_format)
+    for candidate in [preferred] + [f for f in FORMAT_SUFFIXES if f != preferred]:
+        path = Path(directory) / (stem + FORMAT_SUFFIXES[candidate])
+        if path.exists():
+            return path
+    return None
+
+
+def category_dtype(column, values=None):
+    """类别列类型: 固定取值表（CATEGORIES），数据中出现的其他值按字母顺序追加在后"""
+    categories = list(CATEGORIES[column])
+    if values is not None:
+        known = set(categories)
+        extra = sorted(str(v) for v in pd.unique(values) if pd.notna(v) and str(v) not in known)
+        categories += extra
+    return pd.CategoricalDtype(categories)
+
+
+def apply_schema(df):
+    """按类型表转换列（返回新DataFrame，不修改输入）"""
+    data = {}
+    for col in df.columns:
+        values = df[col]
+        if col in CATEGORY_COLUMNS:
+            values = values.astype(category_dtype(col, values))
+        elif col in INT32_COLUMNS:
+            values = values.astype(np.int32)
+        elif col in INT16_COLUMNS:
+            values = values.astype(np.int16)
+        elif col in FLOAT32_COLUMNS or pd.api.types.is_float_dtype(values.dtype):
+            values = values.astype(np.float32)
+        data[col] = values
+    return pd.DataFrame(data, index=df.index)
+
+
+def _csv_dtypes(path):
+    header = pd.read_csv(path, nrows=0).columns
+    dtype = {col: 'category' for col in CATEGORY_COLUMNS if col in header}
+    dtype.update({col: np.float32 for col in FLOAT32_COLUMNS if col in header})
+    return dtype
+
+
+def read_table(path, columns=None, data_format=None):
+    """读取数据文件（默认按后缀判断格式），返回按类型表转换后的DataFrame"""
+    path = Path(path)
+    if (data_format or format_of(path)) == 'parquet':
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns, dtype=_csv_dtypes(path))
+    return apply_schema(df)
+
+
+def iter_table(path, chunk_rows, columns=None):
+    """按原始行顺序分块读取数据文件，每块最多chunk_rows行（已按类型表转换）"""
+    path = Path(path)
+    if format_of(path) == 'parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        try:
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+                yield apply_schema(batch.to_pandas())
+        finally:
+            parquet_file.close()
+    else:
+        with pd.read_csv(path, usecols=columns, dtype=_csv_dtypes(path), chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield apply_schema(chunk)
+
+
+def write_table(df, path):
+    """按后缀格式原子写入（先转换为类型表中的类型）"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = apply_schema(df)
+    tmp_file = path.with_name(path.name + '.tmp')
+    if format_of(path) == 'parquet':
+        df.to_parquet(tmp_file, index=False, row_group_size=ROW_GROUP_ROWS)
+    else:
+        df.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, path)
+    return path
+
+
+class TableWriter:
+    """
+    分块写入一个数据文件（按后缀格式），close()时原子替换为目标文件
+
+    用法:
+        with TableWriter(path) as writer:
+            for chunk in ...:
+                writer.write(chunk)
+    异常退出时删除临时文件，目标文件保持不变。
+    """
+
+    def __init__(self, path, row_group_size=ROW_GROUP_ROWS):
+        self.path = Path(path)
+        self.row_group_size = row_group_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_file = self.path.with_name(self.path.name + '.tmp')
+        self.data_format = format_of(self.path)
+        self.rows = 0
+        self._parquet_writer = None
+        self._schema = None
+        if self.tmp_file.exists():
+            self.tmp_file.unlink()
+
+    def write(self, df):
+        """写入一块（空块只用来确定列与类型）"""
+        df = apply_schema(df)
+        if self.data_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._parquet_writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._schema = table.schema
+                self._parquet_writer = pq.ParquetWriter(self.tmp_file, self._schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if len(table):
+                self._parquet_writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            df.to_csv(self.tmp_file, mode='a', header=not self.tmp_file.exists(), index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if not self.tmp_file.exists():
+            raise ValueError(f'没有写入任何数据: {self.path}')
+        os.replace(self.tmp_file, self.path)
+        return self.path
+
+    def abort(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self.tmp_file.exists():
+            self.tmp_file.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def storage_report(paths):
+    """
+    各文件的磁盘占用与完整加载时间
+
+    返回 [{'file', 'format', 'size_mb', 'load_seconds', 'rows'}]
+    """
+    report = []
+    for path in paths:
+        path = Path(path)
+        if not path.exists():
+            continue
+        t0 = time.perf_counter()
+        df = read_table(path)
+        load_seconds = time.perf_counter() - t0
+        report.append({
+            'file': path.name,
+            'format': format_of(path),
+            'size_mb': path.stat().st_size / 1024 / 1024,
+            'load_seconds': load_seconds,
+            'rows': len(df),
+        })
+    return report
+
+
+def print_storage_report(report):
+    if not report:
+        return
+    print(f"\n{'文件':<28} {'格式':<8} {'大小(MB)':>10} {'加载(秒)':>10}")
+    print("-" * 60)
+    for entry in report:
+        print(f"{entry['file']:<28} {entry['format']:<8} {entry['size_mb']:>10.1f} {entry['load_seconds']:>10.2f}")
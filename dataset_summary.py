@@ -0,0 +1,117 @@
+# dataset_summary.py
+"""
+数据集汇总表（一次分组计算，随数据集保存）
+✅ 按 split × scenario_id × weather × traffic_density × behavior_type 一次groupby得到每格的行数/轨迹数/速度和/半径和
+✅ 任意维度的统计（按天气、密度、行为、划分……）由汇总表再聚合，不需要重新扫描轨迹数据
+✅ 保存为 PROCESSED_DATA_DIR/dataset_summary.csv，报表/看板直接读取
+
+可加性: 每条轨迹只属于一个场景、一种行为和一个划分，因此各格的轨迹数可以直接相加；
+均值由 和/行数 重新计算（和用float64累加）。
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_schema import category_dtype
+
+SUMMARY_NAME = 'dataset_summary.csv'
+SUMMARY_KEYS = ['split', 'scenario_id', 'weather', 'traffic_density', 'behavior_type']
+SUM_COLUMNS = ['rows', 'tracks', 'speed_sum', 'radius_sum']
+
+
+def summary_path(processed_dir):
+    return Path(processed_dir) / SUMMARY_NAME
+
+
+def summary_table(df, split='all'):
+    """一次groupby计算数据的汇总表（每个 场景×天气×密度×行为 一行）"""
+    keys = SUMMARY_KEYS[1:]
+    data = pd.DataFrame({
+        **{key: df[key] for key in keys},
+        'trackId': df['trackId'],
+        'speed': df['speed'].to_numpy(dtype=np.float64),
+        'radius': df['radius'].to_numpy(dtype=np.float64),
+    })
+    summary = data.groupby(keys, observed=True, sort=True).agg(
+        rows=('speed', 'size'),
+        tracks=('trackId', 'nunique'),
+        speed_sum=('speed', 'sum'),
+        radius_sum=('radius', 'sum'),
+    ).reset_index()
+    for key in ['weather', 'traffic_density', 'behavior_type']:
+        summary[key] = summary[key].astype(str)
+    summary.insert(0, 'split', split)
+    return _with_means(summary)
+
+
+def summary_from_tracks(tracks, split='all'):
+    """
+    由每轨迹统计得到汇总表（流式清洗不把数据读入内存时使用），结果同summary_table
+
+    tracks每行一条轨迹: scenario_id, weather, traffic_density, behavior_type, rows, speed_sum, radius_sum
+    """
+    keys = SUMMARY_KEYS[1:]
+    data = tracks.copy()
+    for key in ['weather', 'traffic_density', 'behavior_type']:
+        data[key] = data[key].astype(category_dtype(key, data[key]))
+    summary = data.groupby(keys, observed=True, sort=True).agg(
+        rows=('rows', 'sum'),
+        tracks=('rows', 'size'),
+        speed_sum=('speed_sum', 'sum'),
+        radius_sum=('radius_sum', 'sum'),
+    ).reset_index()
+    for key in ['weather', 'traffic_density', 'behavior_type']:
+        summary[key] = summary[key].astype(str)
+    summary.insert(0, 'split', split)
+    return _with_means(summary)
+
+
+def _with_means(table):
+    table['speed_mean'] = table['speed_sum'] / table['rows']
+    table['radius_mean'] = table['radius_sum'] / table['rows']
+    return table
+
+
+def rollup(summary, by):
+    """按给定维度聚合汇总表（by: 列名或列名列表），附带场景数与均值"""
+    grouped = summary.groupby(by, sort=True)
+    table = grouped[SUM_COLUMNS].sum()
+    table['scenarios'] = grouped['scenario_id'].nunique()
+    return _with_means(table)
+
+
+def totals(summary):
+    """整个汇总表的合计（dict）"""
+    result = {col: summary[col].sum() for col in SUM_COLUMNS}
+    result['scenarios'] = summary['scenario_id'].nunique()
+    result['speed_mean'] = result['speed_sum'] / result['rows'] if result['rows'] else 0.0
+    result['radius_mean'] = result['radius_sum'] / result['rows'] if result['rows'] else 0.0
+    return result
+
+
+def save_summary(summary, processed_dir, merge=False):
+    """
+    保存汇总表（原子替换）
+
+    merge=True: 保留文件中其他split的行，只替换summary中出现的split（3split在2clean的结果上追加）
+    """
+    path = summary_path(processed_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if merge and path.exists():
+        existing = load_summary(processed_dir)
+        existing = existing[~existing['split'].isin(summary['split'].unique())]
+        summary = pd.concat([existing, summary], ignore_index=True)
+    tmp_file = path.with_name(path.name + '.tmp')
+    summary.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, path)
+    return path
+
+
+def load_summary(processed_dir):
+    """读取汇总表，不存在时返回None"""
+    path = summary_path(processed_dir)
+    if not path.exists():
+        return None
+    return pd.read_csv(path)
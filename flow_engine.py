@@ -0,0 +1,234 @@
+# flow_engine.py
+"""
+向量化流量验证
+✅ 整数编码后一次排序 + NumPy差分找出每条轨迹穿越核心区边界（半径 = core_radius）的时刻
+✅ 驶入(entries) / 驶出(exits) / 完整通过(transits) / 核心区停留时间 / 小时当量流量
+✅ 对整个数据只扫描一遍，按场景汇总；天气、密度汇总由场景表再聚合
+✅ 兼容原报告: actual = 进入过核心区的轨迹数（原verify_flow_rates的统计口径）
+✅ FlowAccumulator: 同样的指标按块累积（流式清洗，内存只与块大小和轨迹数有关）
+
+定义（同一轨迹按frame排序后相邻两行比较）:
+    驶入  外 → 内（轨迹第一帧已在核心区内的不算驶入）
+    驶出  内 → 外
+    完整通过  至少一次驶入且之后驶出的轨迹
+    停留时间  轨迹在核心区内的帧数 / frame_rate（按进入过核心区的轨迹平均）
+    小时流量  驶入次数 / 场景观测时长 × 3600
+"""
+import numpy as np
+import pandas as pd
+
+LABEL_COLUMNS = {
+    'weather': 'weather',
+    'density': 'traffic_density',
+    'behavior': 'behavior_type',
+}
+FLOW_COLUMNS = [
+    'scenario_id', 'weather', 'density', 'behavior',
+    'actual', 'entries', 'exits', 'transits', 'time_in_core', 'duration', 'hourly_flow',
+]
+
+
+def _segment_starts(*keys):
+    """已排序的键数组中每段的起始位置"""
+    n = len(keys[0])
+    change = np.zeros(n, dtype=bool)
+    if n:
+        change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def flow_table(df, frame_rate, core_radius=25.0):
+    """
+    按场景计算核心区流量指标
+
+    df需要 scenario_id, trackId, frame, radius 及天气/密度/行为列（任意行顺序）；
+    返回每个场景一行的DataFrame（列见FLOW_COLUMNS）
+    """
+    if len(df) == 0:
+        return pd.DataFrame(columns=FLOW_COLUMNS)
+    scenario = df['scenario_id'].to_numpy()
+    track = df['trackId'].to_numpy().astype(np.int64)
+    frame = df['frame'].to_numpy().astype(np.int64)
+
+    # ⭐ (场景, 轨迹) 按顺序整数编码，与帧合成一个int64键，只排序一次（已有序时跳过）
+    pair = (scenario.astype(np.int64) << 32) | (track - track.min())
+    codes, _ = pd.factorize(pair, sort=True)
+    frame_min = frame.min()
+    key = codes.astype(np.int64) * (frame.max() - frame_min + 1) + (frame - frame_min)
+    inside = df['radius'].to_numpy() <= core_radius
+    if len(key) > 1 and not np.all(key[1:] >= key[:-1]):
+        order = np.argsort(key)
+        codes = codes[order]
+        scenario = scenario[order]
+        frame = frame[order]
+        inside = inside[order]
+
+    track_starts = _segment_starts(codes)
+    continuing = np.ones(len(inside), dtype=bool)
+    continuing[track_starts] = False
+    prev_inside = np.empty_like(inside)
+    prev_inside[0] = False
+    prev_inside[1:] = inside[:-1]
+    entry = inside & ~prev_inside & continuing
+    exit_ = ~inside & prev_inside & continuing
+
+    # 每条轨迹
+    track_entries = np.add.reduceat(entry, track_starts)
+    track_exits = np.add.reduceat(exit_, track_starts)
+    track_inside = np.add.reduceat(inside, track_starts)
+    # 完整通过: 最后一次驶出在第一次驶入之后
+    positions = np.arange(len(inside))
+    first_entry = np.minimum.reduceat(np.where(entry, positions, len(inside)), track_starts)
+    last_exit = np.maximum.reduceat(np.where(exit_, positions, -1), track_starts)
+    track_transit = last_exit > first_entry
+    track_scenario = scenario[track_starts]
+
+    # 每个场景
+    scenario_starts = _segment_starts(track_scenario)
+    core = track_inside > 0
+    actual = np.add.reduceat(core, scenario_starts)
+    entries = np.add.reduceat(track_entries, scenario_starts)
+    exits = np.add.reduceat(track_exits, scenario_starts)
+    transits = np.add.reduceat(track_transit, scenario_starts)
+    inside_frames = np.add.reduceat(track_inside, scenario_starts)
+    row_starts = track_starts[scenario_starts]
+    frame_min = np.minimum.reduceat(frame, row_starts)
+    frame_max = np.maximum.reduceat(frame, row_starts)
+    duration = (frame_max - frame_min + 1) / frame_rate
+
+    table = {
+        'scenario_id': track_scenario[scenario_starts],
+    }
+    # 标签取每个场景在原始行顺序中的第一行（同原报告）
+    first = pd.Series(df['scenario_id'].to_numpy()).drop_duplicates()
+    first_rows = first.index.to_numpy()[np.argsort(first.to_numpy(), kind='stable')]
+    for name, column in LABEL_COLUMNS.items():
+        table[name] = df[column].iloc[first_rows].astype(str).to_numpy()
+    table.update({
+        'actual': actual,
+        'entries': entries,
+        'exits': exits,
+        'transits': transits,
+        'time_in_core': np.divide(inside_frames / frame_rate, actual,
+                                  out=np.zeros(len(actual)), where=actual > 0),
+        'duration': duration,
+        'hourly_flow': entries / duration * 3600,
+    })
+    return pd.DataFrame(table, columns=FLOW_COLUMNS)
+
+
+def summarize_flows(flows, by):
+    """由场景表按天气/密度汇总（场景平均，小时流量按驶入总数/总时长）"""
+    grouped = flows.groupby(by, sort=False)
+    summary = grouped[['actual', 'entries', 'exits', 'transits', 'time_in_core']].mean()
+    summary['scenarios'] = grouped.size()
+    summary['hourly_flow'] = grouped['entries'].sum() / grouped['duration'].sum() * 3600
+    return summary
+
+
+class FlowAccumulator:
+    """
+    按块累积单个场景的流量指标（与flow_table结果一致）
+
+    块按原始行顺序到达；同一轨迹在后面块中的帧必须大于之前块中的帧（采集输出按帧写出），
+    否则抛出ValueError。每条轨迹只保留上一块结束时的状态。
+    """
+
+    def __init__(self, scenario_id, frame_rate, core_radius=25.0):
+        self.scenario_id = scenario_id
+        self.frame_rate = frame_rate
+        self.core_radius = core_radius
+        self.labels = None
+        self.frame_min = None
+        self.frame_max = None
+        self.tracks = pd.Index([], dtype=np.int64)
+        self.state = {
+            'last_frame': np.zeros(0, dtype=np.int64),
+            'last_inside': np.zeros(0, dtype=bool),
+            'entries': np.zeros(0, dtype=np.int64),
+            'exits': np.zeros(0, dtype=np.int64),
+            'inside': np.zeros(0, dtype=np.int64),
+            'first_entry': np.zeros(0, dtype=np.int64),
+            'last_exit': np.zeros(0, dtype=np.int64),
+        }
+
+    def update(self, chunk):
+        if len(chunk) == 0:
+            return
+        if self.labels is None:
+            self.labels = {name: str(chunk[column].iloc[0]) for name, column in LABEL_COLUMNS.items()}
+        track = chunk['trackId'].to_numpy().astype(np.int64)
+        frame = chunk['frame'].to_numpy().astype(np.int64)
+        inside = chunk['radius'].to_numpy() <= self.core_radius
+        self.frame_min = frame.min() if self.frame_min is None else min(self.frame_min, frame.min())
+        self.frame_max = frame.max() if self.frame_max is None else max(self.frame_max, frame.max())
+
+        order = np.lexsort((frame, track))
+        track, frame, inside = track[order], frame[order], inside[order]
+        starts = _segment_starts(track)
+        ends = np.append(starts[1:], len(track)) - 1
+        chunk_tracks = track[starts]
+
+        # ⭐ 每段第一行的"上一行"来自之前的块（新轨迹没有上一行）
+        position = self.tracks.get_indexer(chunk_tracks)
+        seen = position >= 0
+        if np.any(frame[starts[seen]] <= self.state['last_frame'][position[seen]]):
+            raise ValueError(f'场景{self.scenario_id}: 同一轨迹的帧在块之间不是递增的')
+        continuing = np.ones(len(inside), dtype=bool)
+        continuing[starts] = seen
+        prev_inside = np.empty_like(inside)
+        prev_inside[1:] = inside[:-1]
+        prev_inside[starts] = False
+        prev_inside[starts[seen]] = self.state['last_inside'][position[seen]]
+        entry = inside & ~prev_inside & continuing
+        exit_ = ~inside & prev_inside & continuing
+
+        no_entry = np.iinfo(np.int64).max
+        update = {
+            'last_frame': frame[ends],
+            'last_inside': inside[ends],
+            'entries': np.add.reduceat(entry, starts),
+            'exits': np.add.reduceat(exit_, starts),
+            'inside': np.add.reduceat(inside, starts),
+            'first_entry': np.minimum.reduceat(np.where(entry, frame, no_entry), starts),
+            'last_exit': np.maximum.reduceat(np.where(exit_, frame, -1), starts),
+        }
+
+        old = position[seen]
+        state = self.state
+        state['last_frame'][old] = update['last_frame'][seen]
+        state['last_inside'][old] = update['last_inside'][seen]
+        for name in ['entries', 'exits', 'inside']:
+            state[name][old] += update[name][seen]
+        state['first_entry'][old] = np.minimum(state['first_entry'][old], update['first_entry'][seen])
+        state['last_exit'][old] = np.maximum(state['last_exit'][old], update['last_exit'][seen])
+
+        new = ~seen
+        if np.any(new):
+            self.tracks = self.tracks.append(pd.Index(chunk_tracks[new]))
+            for name, values in update.items():
+                state[name] = np.concatenate([state[name], values[new]])
+
+    @property
+    def num_tracks(self):
+        return len(self.tracks)
+
+    def result(self):
+        """单个场景的流量指标（dict，键同FLOW_COLUMNS）"""
+        state = self.state
+        actual = int(np.count_nonzero(state['inside']))
+        entries = int(state['entries'].sum())
+        duration = (self.frame_max - self.frame_min + 1) / self.frame_rate if self.frame_min is not None else 0.0
+        return {
+            'scenario_id': self.scenario_id,
+            **(self.labels or {name: '' for name in LABEL_COLUMNS}),
+            'actual': actual,
+            'entries': entries,
+            'exits': int(state['exits'].sum()),
+            'transits': int(np.count_nonzero(state['last_exit'] > state['first_entry'])),
+            'time_in_core': state['inside'].sum() / self.frame_rate / actual if actual else 0.0,
+            'duration': duration,
+            'hourly_flow': entries / duration * 3600 if duration else 0.0,
+        }
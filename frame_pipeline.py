@@ -0,0 +1,83 @@
+# frame_pipeline.py
+"""
+生产者/消费者采集流水线
+✅ 主线程（生产者）只负责tick和读取原始状态
+✅ 后台线程（消费者）计算半径/角度/速度/加速度并写入缓冲
+✅ 有界队列: 消费者跟不上时生产者阻塞（背压），内存不会无限增长
+✅ 单消费者FIFO，帧严格按编号顺序处理
+
+仿真器步进与Python端的数据处理因此可以重叠进行。
+"""
+import queue
+import threading
+import time
+
+
+class FrameConsumer:
+    """
+    后台线程按帧顺序处理原始状态
+
+    用法:
+        consumer = FrameConsumer(process, max_pending=8)
+        consumer.put(frame, state)   # 队列满时阻塞，返回阻塞时间（秒）
+        consumer.close()             # 处理完所有已入队的帧；消费者出错时抛出异常
+
+    process(frame, state) 在后台线程中调用。
+    """
+
+    def __init__(self, process, max_pending=8):
+        self._process = process
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._closed = False
+        self.last_put_frame = None
+        self.last_frame = None  # 最后一个处理完成的帧
+        self.frames_processed = 0
+        self.max_depth = 0
+
+        self._thread = threading.Thread(target=self._run, name='frame-consumer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+            frame, state = item
+            try:
+                self._process(frame, state)
+                self.last_frame = frame
+                self.frames_processed += 1
+            except Exception as e:
+                self._error = e
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError(f'帧处理线程失败: {self._error}') from self._error
+
+    def put(self, frame, state):
+        """提交一帧（帧编号必须递增），返回因背压阻塞的时间"""
+        self._raise_if_failed()
+        if self.last_put_frame is not None and frame <= self.last_put_frame:
+            raise ValueError(f'帧编号必须递增: {frame} <= {self.last_put_frame}')
+        self.last_put_frame = frame
+
+        t0 = time.perf_counter()
+        self._queue.put((frame, state))
+        waited = time.perf_counter() - t0
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return waited
+
+    def stop(self):
+        """处理完已入队的帧并结束线程（不抛出消费者异常）"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def close(self):
+        self.stop()
+        self._raise_if_failed()
@@ -0,0 +1,225 @@
+# frame_recorder.py
+"""
+列式帧记录器
+✅ 按列预分配NumPy数组（代替逐行dict列表）
+✅ 容量不足时按2倍几何增长
+✅ 天气/密度/行为以int8编码存储
+✅ 零拷贝交给pandas DataFrame / Arrow Table
+✅ 只记录原始位姿/速度/加速度，派生列由kinematics按块向量化计算
+"""
+import numpy as np
+import pandas as pd
+
+from roundabout_config_v2 import WEATHER_TYPES, TRAFFIC_DENSITIES, BEHAVIOR_TYPES
+
+# ===== 输出列（顺序与scenario_XXX.csv一致）=====
+RECORD_COLUMNS = [
+    'frame', 'trackId',
+    'x', 'y', 'z',
+    'vx', 'vy', 'speed',
+    'ax', 'ay', 'accel',
+    'heading', 'radius', 'angle',
+    'weather', 'traffic_density', 'behavior_type',
+]
+
+# ===== 记录器存储的原始列（采集循环中不做任何派生计算）=====
+RAW_COLUMNS = [
+    'frame', 'trackId',
+    'x', 'y', 'z',
+    'vx', 'vy',
+    'ax', 'ay',
+    'yaw',  # 度（CARLA原始值），输出时转为heading弧度
+    'weather', 'traffic_density', 'behavior_type',
+]
+
+INT_COLUMNS = ['frame', 'trackId']
+RAW_FLOAT_COLUMNS = ['x', 'y', 'z', 'vx', 'vy', 'ax', 'ay', 'yaw']
+# 输出CSV中的浮点列
+FLOAT_COLUMNS = [
+    'x', 'y', 'z',
+    'vx', 'vy', 'speed',
+    'ax', 'ay', 'accel',
+    'heading', 'radius', 'angle',
+]
+
+# ⭐ 类别列的取值表（编码 = 列表下标）
+CATEGORIES = {
+    'weather': list(WEATHER_TYPES),
+    'traffic_density': list(TRAFFIC_DENSITIES.keys()),
+    'behavior_type': list(BEHAVIOR_TYPES) + ['unknown'],
+}
+
+
+def peak_rss_mb():
+    """当前进程峰值常驻内存（MB），无法获取时返回None"""
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS单位为字节，Linux为KB
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+class ColumnarFrameRecorder:
+    """
+    列式记录器
+
+    用法:
+        recorder = ColumnarFrameRecorder(capacity)
+        recorder.append_rows(rows)        # rows: RAW_COLUMNS顺序的tuple列表
+        df = recorder.to_dataframe()      # 零拷贝（原始列）
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(int(capacity), 1)
+        self.size = 0
+        self.columns = {}
+        self._allocate()
+
+        self.categories = {col: list(values) for col, values in CATEGORIES.items()}
+        self._codes = {
+            col: {value: code for code, value in enumerate(values)}
+            for col, values in self.categories.items()
+        }
+
+    @classmethod
+    def for_scenario(cls, density_config, duration, frame_rate):
+        """按 时长 × 帧率 × spawn总数 预分配"""
+        return cls(duration * frame_rate * density_config['spawn_total'])
+
+    def __len__(self):
+        return self.size
+
+    def _allocate(self):
+        for col in INT_COLUMNS:
+            self.columns[col] = np.empty(self.capacity, dtype=np.int32)
+        for col in RAW_FLOAT_COLUMNS:
+            self.columns[col] = np.empty(self.capacity, dtype=np.float64)
+        for col in CATEGORIES:
+            self.columns[col] = np.empty(self.capacity, dtype=np.int8)
+
+    def _grow(self, required):
+        new_capacity = self.capacity
+        while new_capacity < required:
+            new_capacity *= 2
+        for col, arr in self.columns.items():
+            grown = np.empty(new_capacity, dtype=arr.dtype)
+            grown[:self.size] = arr[:self.size]
+            self.columns[col] = grown
+        self.capacity = new_capacity
+
+    def encode(self, column, value):
+        """类别值 → 编码（未知类别追加到取值表末尾）"""
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = len(self.categories[column])
+            self.categories[column].append(value)
+            codes[value] = code
+        return code
+
+    def append_rows(self, rows):
+        """追加一帧的行（tuple顺序同RAW_COLUMNS）"""
+        n = len(rows)
+        if n == 0:
+            return
+        end = self.size + n
+        if end > self.capacity:
+            self._grow(end)
+
+        for col, values in zip(RAW_COLUMNS, zip(*rows)):
+            if col in self._codes:
+                values = [self.encode(col, v) for v in values]
+            self.columns[col][self.size:end] = values
+        self.size = end
+
+    def column(self, name):
+        """返回已记录部分的视图（不拷贝）"""
+        return self.columns[name][:self.size]
+
+    def to_dataframe(self):
+        """零拷贝构造DataFrame（类别列为pandas Categorical）"""
+        data = {}
+        for col in RAW_COLUMNS:
+            values = self.column(col)
+            if col in self.categories:
+                dtype = pd.CategoricalDtype(self.categories[col])
+                values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+            data[col] = values
+        return pd.DataFrame(data, copy=False)
+
+    def take_dataframe(self):
+        """
+        取出已记录部分（零拷贝）并换用新数组继续记录
+
+        返回的DataFrame持有旧数组，可安全交给写盘线程。
+        """
+        df = self.to_dataframe()
+        self.size = 0
+        self._allocate()
+        return df
+
+    def to_arrow(self):
+        """零拷贝构造pyarrow Table（类别列为DictionaryArray，需安装pyarrow）"""
+        import pyarrow as pa
+
+        arrays = []
+        for col in RAW_COLUMNS:
+            values = self.column(col)
+            if col in self.categories:
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(values), pa.array(self.categories[col])
+                ))
+            else:
+                arrays.append(pa.array(values))
+        return pa.Table.from_arrays(arrays, names=RAW_COLUMNS)
+
+
+class ScenarioSummary:
+    """按块累计的场景统计（不需要保留整场景数据）"""
+
+    def __init__(self, core_radius=25.0):
+        self.core_radius = core_radius
+        self.rows = 0
+        self.speed_sum = 0.0
+        self.tracks = set()
+        self.core_tracks = set()
+        self.track_behaviors = {}
+
+    def update(self, df):
+        if len(df) == 0:
+            return
+        self.rows += len(df)
+        self.speed_sum += float(df['speed'].sum())
+        self.tracks.update(np.unique(df['trackId'].to_numpy()).tolist())
+        core = df['radius'].to_numpy() <= self.core_radius
+        self.core_tracks.update(np.unique(df['trackId'].to_numpy()[core]).tolist())
+        first = df.drop_duplicates('trackId')
+        self.track_behaviors.update(zip(first['trackId'].tolist(), first['behavior_type'].astype(str).tolist()))
+
+    @property
+    def num_tracks(self):
+        return len(self.tracks)
+
+    @property
+    def num_core_tracks(self):
+        return len(self.core_tracks)
+
+    @property
+    def avg_speed(self):
+        return self.speed_sum / self.rows if self.rows else 0.0
+
+    def behavior_counts(self):
+        """各行为类型的轨迹数"""
+        counts = {}
+        for behavior in self.track_behaviors.values():
+            counts[behavior] = counts.get(behavior, 0) + 1
+        return counts
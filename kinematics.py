@@ -0,0 +1,188 @@
+# kinematics.py
+"""
+向量化运动学派生列
+✅ 采集循环只记录原始位姿/速度/加速度，派生列按块一次性用NumPy计算
+✅ 结果与原逐行math计算一致（浮点误差内）
+✅ 可选附加特征（EXTRA_FEATURES）: yaw_rate / jerk / angle_unwrapped / curvature
+✅ 时间差分类特征跨块连续（按轨迹保存上一块的末尾状态）
+
+派生列:
+    speed   = |(vx, vy)|
+    accel   = |(ax, ay)|
+    heading = radians(yaw)
+    radius  = 到环岛中心的距离
+    angle   = atan2(dy, dx)
+
+附加特征（每条轨迹按帧差分，dt = 帧差 / FRAME_RATE，轨迹第一帧为0）:
+    yaw_rate        航向角速度 (rad/s)
+    jerk            加速度向量变化率的模 (m/s³)
+    angle_unwrapped 展开后的环岛方位角（连续累计，不在±π处跳变）
+    curvature       路径曲率 (vx·ay − vy·ax) / speed³ (1/m)，低速时为0
+"""
+import numpy as np
+import pandas as pd
+
+from frame_recorder import RECORD_COLUMNS
+
+EXTRA_FEATURE_NAMES = ['yaw_rate', 'jerk', 'angle_unwrapped', 'curvature']
+# 需要跨帧差分的特征
+TEMPORAL_FEATURES = {'yaw_rate', 'jerk', 'angle_unwrapped'}
+# 低于该速度时曲率记为0（避免除以接近0的速度）
+CURVATURE_MIN_SPEED = 0.5
+
+_CARRY_COLUMNS = ['frame', 'heading', 'angle', 'angle_unwrapped', 'ax', 'ay']
+
+
+def _wrap(angle):
+    """角度差归一化到 [-π, π)"""
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def derive_columns(raw, center_x, center_y):
+    """由原始列计算 speed/accel/heading/radius/angle（返回dict: 列名 → 数组）"""
+    x = raw['x'].to_numpy()
+    y = raw['y'].to_numpy()
+    vx = raw['vx'].to_numpy()
+    vy = raw['vy'].to_numpy()
+    ax = raw['ax'].to_numpy()
+    ay = raw['ay'].to_numpy()
+    dx = x - center_x
+    dy = y - center_y
+    return {
+        'speed': np.sqrt(vx ** 2 + vy ** 2),
+        'accel': np.sqrt(ax ** 2 + ay ** 2),
+        'heading': np.radians(raw['yaw'].to_numpy()),
+        'radius': np.sqrt(dx ** 2 + dy ** 2),
+        'angle': np.arctan2(dy, dx),
+    }
+
+
+class KinematicsStage:
+    """
+    按块把原始记录转换为输出列
+
+    用法:
+        stage = KinematicsStage(center_x, center_y, FRAME_RATE, EXTRA_FEATURES)
+        chunk = stage.apply(raw_chunk)   # 列顺序: RECORD_COLUMNS + 附加特征
+    """
+
+    def __init__(self, center_x, center_y, frame_rate, extra_features=()):
+        unknown = [f for f in extra_features if f not in EXTRA_FEATURE_NAMES]
+        if unknown:
+            raise ValueError(f'未知的附加特征: {unknown}（可选: {EXTRA_FEATURE_NAMES}）')
+        self.center_x = center_x
+        self.center_y = center_y
+        self.frame_rate = frame_rate
+        self.extra_features = list(extra_features)
+        # 每条轨迹上一块的末尾状态（trackId为索引）
+        self._carry = None
+
+    @property
+    def output_columns(self):
+        return RECORD_COLUMNS + self.extra_features
+
+    def apply(self, raw):
+        derived = derive_columns(raw, self.center_x, self.center_y)
+        data = {}
+        for col in RECORD_COLUMNS:
+            data[col] = derived[col] if col in derived else raw[col]
+        if self.extra_features:
+            data.update(self._extra_features(raw, derived))
+        return pd.DataFrame(data, columns=self.output_columns, copy=False)
+
+    def _extra_features(self, raw, derived):
+        n = len(raw)
+        extras = {}
+        if 'curvature' in self.extra_features:
+            vx = raw['vx'].to_numpy()
+            vy = raw['vy'].to_numpy()
+            speed = derived['speed']
+            cross = vx * raw['ay'].to_numpy() - vy * raw['ax'].to_numpy()
+            moving = speed >= CURVATURE_MIN_SPEED
+            curvature = np.zeros(n)
+            curvature[moving] = cross[moving] / speed[moving] ** 3
+            extras['curvature'] = curvature
+
+        temporal = [f for f in self.extra_features if f in TEMPORAL_FEATURES]
+        if temporal and n > 0:
+            extras.update(self._temporal_features(raw, derived, temporal))
+        elif temporal:
+            extras.update({f: np.zeros(0) for f in temporal})
+        return extras
+
+    def _temporal_features(self, raw, derived, features):
+        """按 (trackId, frame) 排序后向量化差分，再还原为原始行顺序"""
+        track = raw['trackId'].to_numpy()
+        frame = raw['frame'].to_numpy()
+        order = np.lexsort((frame, track))
+        track_s = track[order]
+        frame_s = frame[order].astype(np.float64)
+        heading_s = derived['heading'][order]
+        angle_s = derived['angle'][order]
+        ax_s = raw['ax'].to_numpy()[order]
+        ay_s = raw['ay'].to_numpy()[order]
+
+        n = len(order)
+        starts = np.ones(n, dtype=bool)
+        starts[1:] = track_s[1:] != track_s[:-1]
+
+        # 上一样本: 组内取前一行，组首取上一块的末尾状态（没有则NaN）
+        prev = {}
+        carry = self._lookup_carry(track_s[starts])
+        for col, values in [('frame', frame_s), ('heading', heading_s), ('angle', angle_s),
+                            ('ax', ax_s), ('ay', ay_s)]:
+            shifted = np.empty(n)
+            shifted[1:] = values[:-1]
+            shifted[starts] = carry[col]
+            prev[col] = shifted
+        has_prev = ~np.isnan(prev['frame'])
+        dt = np.where(has_prev, frame_s - prev['frame'], 1.0) / self.frame_rate
+        dt[dt <= 0] = np.nan
+
+        results = {}
+        if 'yaw_rate' in features:
+            yaw_rate = np.where(has_prev, _wrap(heading_s - prev['heading']) / dt, 0.0)
+            results['yaw_rate'] = np.nan_to_num(yaw_rate)
+        if 'jerk' in features:
+            jerk = np.where(has_prev, np.hypot(ax_s - prev['ax'], ay_s - prev['ay']) / dt, 0.0)
+            results['jerk'] = np.nan_to_num(jerk)
+
+        # 展开方位角: 组首 = 上一块末尾的展开值 + 角度差（无上一块时为原始角度），组内累加角度差
+        delta = np.empty(n)
+        delta[1:] = _wrap(angle_s[1:] - angle_s[:-1])
+        first_prev = carry['angle_unwrapped'] + _wrap(angle_s[starts] - carry['angle'])
+        delta[starts] = np.where(np.isnan(first_prev), angle_s[starts], first_prev)
+        cumulative = np.cumsum(delta)
+        start_idx = np.flatnonzero(starts)
+        offsets = cumulative[start_idx] - delta[start_idx]
+        unwrapped = cumulative - offsets[np.cumsum(starts) - 1]
+        if 'angle_unwrapped' in features:
+            results['angle_unwrapped'] = unwrapped
+
+        # 保存每条轨迹的末尾状态供下一块使用
+        ends = np.append(start_idx[1:] - 1, n - 1)
+        self._save_carry(pd.DataFrame({
+            'frame': frame_s[ends],
+            'heading': heading_s[ends],
+            'angle': angle_s[ends],
+            'angle_unwrapped': unwrapped[ends],
+            'ax': ax_s[ends],
+            'ay': ay_s[ends],
+        }, index=track_s[ends]))
+
+        # 还原为原始行顺序
+        inverse = np.empty(n, dtype=np.int64)
+        inverse[order] = np.arange(n)
+        return {name: values[inverse] for name, values in results.items()}
+
+    def _lookup_carry(self, track_ids):
+        if self._carry is None:
+            return {col: np.full(len(track_ids), np.nan) for col in _CARRY_COLUMNS}
+        found = self._carry.reindex(track_ids)
+        return {col: found[col].to_numpy(dtype=np.float64) for col in _CARRY_COLUMNS}
+
+    def _save_carry(self, carry):
+        if self._carry is None:
+            self._carry = carry
+        else:
+            self._carry = pd.concat([self._carry[~self._carry.index.isin(carry.index)], carry])
@@ -0,0 +1,201 @@
+# partitioned_dataset.py
+"""
+分区列式数据集（2clean写出 split=all，3split写出 train/val/test）
+✅ 目录: PROCESSED_DATA_DIR/dataset/split=<划分>/weather=<天气>/traffic_density=<密度>/scenario_XXX.parquet
+✅ 每个场景只有一种天气和密度，所以每个划分里一个场景就是一个文件；分区列不在文件中重复保存
+✅ load_dataset / iter_dataset: 列投影 + 过滤下推
+   - split / weather / traffic_density: 按目录裁剪，不打开无关的文件
+   - scenario_id / behavior_type / frame范围: 按行组统计信息跳过行组，再逐行过滤
+✅ 写入先放在隐藏的临时目录，完成后整体替换旧的划分目录
+
+需要pyarrow（DATA_FORMAT退回CSV时不写分区数据集）。
+
+用法:
+    df = load_dataset(PROCESSED_DATA_DIR, split='train', weather='HardRainNoon',
+                      traffic_density='very_dense', columns=['trackId', 'frame', 'x', 'y'])
+    for batch in iter_dataset(PROCESSED_DATA_DIR, split='test', behavior_type=['aggressive'],
+                              frame_range=(0, 999)):
+        ...
+"""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from data_schema import TableWriter, apply_schema, resolve_format
+
+DATASET_DIR_NAME = 'dataset'
+PARTITION_KEYS = ['split', 'weather', 'traffic_density']
+DATASET_ROW_GROUP_ROWS = 65536  # 行组越小，scenario/behavior/frame下推跳过得越细
+BATCH_ROWS = 65536
+
+
+def dataset_available():
+    """分区数据集需要pyarrow（未安装时resolve_format会提示一次）"""
+    return resolve_format('parquet') == 'parquet'
+
+
+def dataset_root(processed_dir):
+    return Path(processed_dir) / DATASET_DIR_NAME
+
+
+def scenario_file(split_dir, weather, traffic_density, scenario_id):
+    return Path(split_dir) / f'weather={weather}' / f'traffic_density={traffic_density}' / f'scenario_{scenario_id:03d}.parquet'
+
+
+class SplitWriter:
+    """
+    写出一个划分的分区数据（按场景分文件），close()时替换旧的划分目录
+
+    同一场景的行需要连续写入（采集/清洗输出本来就按场景顺序），可以分多次write（流式）。
+    """
+
+    def __init__(self, processed_dir, split):
+        self.root = dataset_root(processed_dir)
+        self.split_dir = self.root / f'split={split}'
+        # ⭐ 以'.'开头的目录不会被数据集扫描到
+        self.staging_dir = self.root / f'.split={split}.tmp'
+        if self.staging_dir.exists():
+            shutil.rmtree(self.staging_dir)
+        self.staging_dir.mkdir(parents=True)
+        self.files = []
+        self._writer = None
+        self._scenario_id = None
+        self._written = set()
+
+    def write(self, df):
+        if len(df) == 0:
+            return
+        scenario = df['scenario_id'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, scenario[1:] != scenario[:-1]])
+        ends = np.r_[starts[1:], len(df)]
+        for start, end in zip(starts, ends):
+            self._write_scenario(int(scenario[start]), df.iloc[start:end])
+
+    def _write_scenario(self, scenario_id, df):
+        if scenario_id != self._scenario_id:
+            if scenario_id in self._written:
+                raise ValueError(f'场景{scenario_id}的行没有连续写入')
+            self._close_writer()
+            path = scenario_file(self.staging_dir, df['weather'].iloc[0], df['traffic_density'].iloc[0], scenario_id)
+            self._writer = TableWriter(path, row_group_size=DATASET_ROW_GROUP_ROWS)
+            self._scenario_id = scenario_id
+            self._written.add(scenario_id)
+        self._writer.write(df.drop(columns=PARTITION_KEYS[1:]))
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self.files.append(self._writer.close())
+            self._writer = None
+
+    def close(self):
+        """完成写入并替换旧的划分目录，返回划分目录"""
+        self._close_writer()
+        old_dir = self.split_dir.with_name('.' + self.split_dir.name + '.old')
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        if self.split_dir.exists():
+            os.replace(self.split_dir, old_dir)
+        os.replace(self.staging_dir, self.split_dir)
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        self.files = [self.split_dir / path.relative_to(self.staging_dir) for path in self.files]
+        return self.split_dir
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_split(df, processed_dir, split):
+    """把一个划分的数据写成分区数据集（df按场景顺序），返回划分目录"""
+    with SplitWriter(processed_dir, split) as writer:
+        writer.write(df)
+    return writer.split_dir
+
+
+def open_dataset(processed_dir):
+    """pyarrow数据集（hive分区: split/weather/traffic_density）"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    root = dataset_root(processed_dir)
+    if not root.exists():
+        raise FileNotFoundError(f'分区数据集不存在: {root}（先运行 2clean_and_merge_v2.py）')
+    partitioning = ds.partitioning(pa.schema([(key, pa.string()) for key in PARTITION_KEYS]), flavor='hive')
+    return ds.dataset(root, format='parquet', partitioning=partitioning)
+
+
+def build_filter(split=None, weather=None, traffic_density=None, scenario_id=None,
+                 behavior_type=None, frame_range=None):
+    """
+    过滤条件 → pyarrow表达式（都不给时返回None）
+
+    各条件可以是单个值或列表；frame_range = (起始帧, 结束帧)，含两端，任一端可为None
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    conditions = []
+    for name, value in [('split', split), ('weather', weather), ('traffic_density', traffic_density),
+                        ('behavior_type', behavior_type)]:
+        if value is not None:
+            values = [value] if isinstance(value, str) else list(value)
+            conditions.append(ds.field(name).isin(values))
+    if scenario_id is not None:
+        values = [scenario_id] if np.isscalar(scenario_id) else list(scenario_id)
+        conditions.append(ds.field('scenario_id').isin(pa.array(values, type=pa.int16())))
+    if frame_range is not None:
+        first, last = frame_range
+        if first is not None:
+            conditions.append(ds.field('frame') >= first)
+        if last is not None:
+            conditions.append(ds.field('frame') <= last)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _projection(dataset, columns):
+    """默认列: 与carla_round_all相同（天气/密度放回行为列之前），不含split"""
+    if columns is not None:
+        return list(columns)
+    names = [name for name in dataset.schema.names if name not in PARTITION_KEYS]
+    position = names.index('behavior_type') if 'behavior_type' in names else len(names)
+    return names[:position] + PARTITION_KEYS[1:] + names[position:]
+
+
+def load_dataset(processed_dir, columns=None, **filters):
+    """
+    读取分区数据集中满足条件的行（列投影 + 过滤下推），返回按类型表转换的DataFrame
+
+    filters见build_filter；行顺序为分区目录、场景文件顺序
+    """
+    dataset = open_dataset(processed_dir)
+    table = dataset.to_table(columns=_projection(dataset, columns), filter=build_filter(**filters))
+    return apply_schema(table.to_pandas())
+
+
+def iter_dataset(processed_dir, columns=None, batch_rows=BATCH_ROWS, **filters):
+    """同load_dataset，但逐批返回（每批最多batch_rows行），读到第一批就可以开始处理"""
+    dataset = open_dataset(processed_dir)
+    scanner = dataset.scanner(columns=_projection(dataset, columns), filter=build_filter(**filters),
+                              batch_size=batch_rows)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield apply_schema(batch.to_pandas())
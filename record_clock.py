@@ -0,0 +1,83 @@
+# record_clock.py
+"""
+仿真步频与记录频率解耦
+✅ SIM_RATE决定物理步长（fixed_delta_seconds），RECORD_RATE决定输出帧率
+✅ 'decimate':    SIM_RATE是RECORD_RATE的整数倍，每 SIM_RATE/RECORD_RATE 个tick记录一帧
+✅ 'interpolate': 任意组合，记录时刻落在两个tick之间时对前后两个状态线性插值
+✅ 输出frame编号始终按记录帧计数: 第f帧对应采集开始后 (f+1)/RECORD_RATE 秒
+
+所有计算用整数完成，长时间采集不会累积浮点误差。
+"""
+import math
+from collections import namedtuple
+
+RECORD_MODES = ['decimate', 'interpolate']
+
+# 记录时刻落在两个tick之间: before/after为前后两个tick的原始状态，alpha为after的权重
+InterpolatedState = namedtuple('InterpolatedState', ['before', 'after', 'alpha'])
+
+# frame_recorder.RAW_COLUMNS 中需要插值的数值列下标（x, y, z, vx, vy, ax, ay）与航向角下标
+_LINEAR_FIELDS = range(2, 9)
+_YAW_FIELD = 9
+
+
+class RecordClock:
+    """
+    用法:
+        clock = RecordClock(SIM_RATE, RECORD_RATE, RECORD_MODE)
+        tick, alpha = clock.position(i)   # 第i个记录帧（从1开始）对应的tick及插值权重
+    """
+
+    def __init__(self, sim_rate, record_rate, mode='decimate'):
+        if mode not in RECORD_MODES:
+            raise ValueError(f'未知的记录方式: {mode}（可选: {RECORD_MODES}）')
+        if sim_rate <= 0 or record_rate <= 0:
+            raise ValueError(f'SIM_RATE/RECORD_RATE必须为正: {sim_rate}/{record_rate}')
+        if mode == 'decimate' and sim_rate % record_rate != 0:
+            raise ValueError(f"'decimate'要求SIM_RATE({sim_rate})是RECORD_RATE({record_rate})的整数倍，"
+                             f"其他组合请使用'interpolate'")
+        self.sim_rate = sim_rate
+        self.record_rate = record_rate
+        self.mode = mode
+
+    @property
+    def ticks_per_record(self):
+        return self.sim_rate / self.record_rate
+
+    def position(self, index):
+        """
+        第index个记录帧（从1开始）所在的tick
+
+        返回 (tick, alpha): 记录时刻位于 tick-1 与 tick 之间，alpha为tick状态的权重（1.0表示正好在tick上）
+        """
+        numerator = index * self.sim_rate
+        tick = -(-numerator // self.record_rate)
+        remainder = tick * self.record_rate - numerator
+        return tick, 1.0 - remainder / self.record_rate
+
+    def sim_ticks(self, seconds):
+        """seconds秒对应的tick数"""
+        return int(math.ceil(seconds * self.sim_rate))
+
+
+def interpolate_rows(before_rows, after_rows, alpha):
+    """
+    对两个tick的原始数据行（同frame_recorder.RAW_COLUMNS）按trackId线性插值
+
+    只出现在after中的车辆（刚spawn）直接使用after的值；只出现在before中的车辆（已销毁）丢弃。
+    航向角按最短角距离插值（度）。
+    """
+    before_by_track = {row[1]: row for row in before_rows}
+    rows = []
+    for row in after_rows:
+        prev = before_by_track.get(row[1])
+        if prev is None:
+            rows.append(row)
+            continue
+        values = list(row)
+        for i in _LINEAR_FIELDS:
+            values[i] = prev[i] + alpha * (row[i] - prev[i])
+        yaw_delta = (row[_YAW_FIELD] - prev[_YAW_FIELD] + 180.0) % 360.0 - 180.0
+        values[_YAW_FIELD] = (prev[_YAW_FIELD] + alpha * yaw_delta + 180.0) % 360.0 - 180.0
+        rows.append(tuple(values))
+    return rows
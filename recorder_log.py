@@ -0,0 +1,155 @@
+# recorder_log.py
+"""
+仿真器内置记录器日志解析（CAPTURE_MODE = 'recorder'）
+✅ 解析 client.show_recorder_file_info(log, show_all=True) 的文本输出
+✅ 与实时采集相同的帧对齐规则（RecordClock），记录时刻落在两个tick之间时插值
+✅ 速度取自Kinematics记录（未记录时由位置差分），加速度由速度差分
+✅ 输出与实时采集相同的原始列（frame_recorder.RAW_COLUMNS），再由KinematicsStage得到CSV列
+✅ 纯Python，不需要仿真器，可在多进程中并行解析
+
+日志帧对齐: 同步模式下每次tick记录一帧，日志中第k帧 = start_recorder之后的第k次tick；
+采集循环在lead_ticks次tick之后开始，循环中第t次tick = 日志第 t + lead_ticks 帧。
+记录器的位置与速度单位为厘米（unit_scale = 0.01 换算为米）。
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+from record_clock import RecordClock, interpolate_rows
+
+RECORDER_META_SUFFIX = '.recorder.json'
+RECORDER_TEXT_SUFFIX = '.recorder.txt'
+
+FRAME_PATTERN = re.compile(r'^Frame (\d+) at ([-+\d.eE]+) seconds')
+POSITION_PATTERN = re.compile(r'Id: (\d+) Location:? \(([^)]*)\) Rotation:? \(([^)]*)\)')
+KINEMATICS_PATTERN = re.compile(r'Id: (\d+) Linear[ _]Velocity:? \(([^)]*)\) Angular[ _]Velocity:? \(([^)]*)\)',
+                                re.IGNORECASE)
+
+
+def recorder_meta_path(output_file):
+    """元数据路径: scenario_XXX.csv → scenario_XXX.recorder.json"""
+    output_file = Path(output_file)
+    return output_file.with_name(output_file.stem + RECORDER_META_SUFFIX)
+
+
+def recorder_text_path(output_file):
+    """日志文本路径: scenario_XXX.csv → scenario_XXX.recorder.txt（show_recorder_file_info的输出）"""
+    output_file = Path(output_file)
+    return output_file.with_name(output_file.stem + RECORDER_TEXT_SUFFIX)
+
+
+def save_metadata(path, metadata):
+    """原子写入元数据JSON"""
+    path = Path(path)
+    tmp_file = path.with_name(path.name + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, path)
+    return path
+
+
+def load_metadata(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _vector(text):
+    return [float(v) for v in text.split(',')]
+
+
+def parse_recorder_info(lines, unit_scale=0.01):
+    """
+    解析记录器文本，返回按日志帧顺序的列表
+
+    每项为 {actor_id: (x, y, z, yaw, vx, vy)}（米、度、米/秒）；
+    没有Kinematics记录的帧vx/vy为None。
+    """
+    frames = []
+    current = None
+    for line in lines:
+        if line.startswith('Frame '):
+            match = FRAME_PATTERN.match(line)
+            if match:
+                current = {}
+                frames.append(current)
+            continue
+        if current is None:
+            continue
+        if 'Location' in line:
+            match = POSITION_PATTERN.search(line)
+            if match:
+                x, y, z = _vector(match.group(2))
+                yaw = _vector(match.group(3))[2]  # (roll, pitch, yaw)
+                current[int(match.group(1))] = (x * unit_scale, y * unit_scale, z * unit_scale, yaw, None, None)
+        elif 'elocity' in line:
+            match = KINEMATICS_PATTERN.search(line)
+            if match:
+                actor_id = int(match.group(1))
+                vx, vy, _ = _vector(match.group(2))
+                if actor_id in current:
+                    x, y, z, yaw, _, _ = current[actor_id]
+                    current[actor_id] = (x, y, z, yaw, vx * unit_scale, vy * unit_scale)
+    return frames
+
+
+def track_states(frames, sim_rate, actor_ids=None):
+    """
+    补全速度/加速度，返回按日志帧顺序的 {actor_id: (x, y, z, vx, vy, ax, ay, yaw)}
+
+    速度: Kinematics记录值，缺失时为相邻两帧位置差 × sim_rate
+    加速度: 相邻两帧速度差 × sim_rate（车辆出现的第一帧为0）
+    actor_ids: 只保留这些actor（None表示全部）
+    """
+    states = []
+    previous = {}
+    for frame in frames:
+        current = {}
+        for actor_id, (x, y, z, yaw, vx, vy) in frame.items():
+            if actor_ids is not None and actor_id not in actor_ids:
+                continue
+            prev = previous.get(actor_id)
+            if vx is None:
+                vx, vy = ((x - prev[0]) * sim_rate, (y - prev[1]) * sim_rate) if prev else (0.0, 0.0)
+            ax, ay = ((vx - prev[3]) * sim_rate, (vy - prev[4]) * sim_rate) if prev else (0.0, 0.0)
+            current[actor_id] = (x, y, z, vx, vy, ax, ay, yaw)
+        states.append(current)
+        previous = current
+    return states
+
+
+def _rows(state, frame_id, behaviors, weather, density, track_id_offset):
+    """一个日志帧的状态 → 原始数据行（顺序同frame_recorder.RAW_COLUMNS）"""
+    return [
+        (frame_id, actor_id + track_id_offset, x, y, z, vx, vy, ax, ay, yaw,
+         weather, density, behaviors[actor_id])
+        for actor_id, (x, y, z, vx, vy, ax, ay, yaw) in state.items()
+    ]
+
+
+def iter_frame_rows(states, metadata):
+    """
+    按采集元数据把日志帧映射为输出帧，逐帧返回 (frame, rows)
+
+    与实时采集相同: 第i个记录帧位于RecordClock.position(i)对应的tick，
+    落在两个tick之间时对前后两个日志帧插值（前一个tick在日志之前时直接取后一个）。
+    """
+    lead = metadata.get('lead_ticks', 0)
+    clock = RecordClock(metadata['sim_rate'], metadata['record_rate'], metadata['record_mode'])
+    behaviors = {int(actor_id): behavior for actor_id, behavior in metadata['behaviors'].items()}
+    weather = metadata['weather']
+    density = metadata['traffic_density']
+    offset = metadata.get('track_id_offset', 0)
+    start_frame = metadata.get('start_frame', 0)
+
+    for index in range(1, metadata['frames'] + 1):
+        tick, alpha = clock.position(index)
+        log_index = tick + lead - 1
+        if log_index >= len(states):
+            break
+        frame_id = start_frame + index - 1
+        rows = _rows(states[log_index], frame_id, behaviors, weather, density, offset)
+        if alpha < 1.0 and log_index >= 1:
+            before = _rows(states[log_index - 1], frame_id, behaviors, weather, density, offset)
+            rows = interpolate_rows(before, rows, alpha)
+        yield frame_id, rows
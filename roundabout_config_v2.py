@@ -13,26 +13,132 @@
 - 最大75辆（比原110辆少32%，更稳定）
 """
 
-import carla
 import os
 
+# ⭐ 设置 CARLA_REPLAY_DIR 时使用离线回放替身（无需CARLA服务器）
+if os.environ.get('CARLA_REPLAY_DIR'):
+    import carla_replay as carla
+else:
+    import carla
+
 # ===== 环岛几何参数 =====
 ROUNDABOUT_CENTER = carla.Location(x=0.0, y=0.0, z=0.0)
 OUTER_RING_RADIUS = 24.8
 INNER_RING_RADIUS = 12.0
 COLLECTION_RADIUS = 50.0
+# ⭐ 驶出采集半径超过该时间（秒）的车辆自动销毁，释放物理/交通管理器开销（0 = 不销毁）
+DESPAWN_OUTSIDE_TIME = 3.0
 
 # ⭐ 优化Spawn参数
 SPAWN_RADIUS_MIN = 45.0  # 更靠近环岛
 SPAWN_RADIUS_MAX = 55.0  # 缩小范围（更高到达率）
 SPAWN_ANGLE_TOLERANCE = 60.0  # 朝向容差60度
+SPAWN_CLEARANCE = 6.0  # spawn点与现有车辆的最小距离（米），小于此距离视为占用
 
 # ===== 采集参数 =====
-FRAME_RATE = 10
+# ⭐ 仿真步频与记录频率分开设置
+SIM_RATE = 10  # 仿真步频（Hz）: fixed_delta_seconds = 1/SIM_RATE
+RECORD_RATE = 10  # 记录频率（Hz）: 输出frame编号按记录帧计数（rounD为25Hz）
+FRAME_RATE = RECORD_RATE  # 输出数据的帧率（下游处理与运动学差分使用）
+# 'decimate':    每 SIM_RATE/RECORD_RATE 个tick记录一帧（要求整数倍）
+# 'interpolate': 任意组合，记录时刻落在两个tick之间时线性插值
+RECORD_MODE = 'decimate'
 SCENARIO_DURATION = 180
 WARMUP_TIME = 10
 SPAWN_RETRIES = 30
 
+# ⭐ spawn方式
+# 'batch':  整批 SpawnActor+SetAutopilot 一次 apply_batch_sync，失败车辆换点重试
+# 'single': 逐辆 spawn_actor / set_autopilot（原方式）
+SPAWN_MODE = 'batch'
+
+# ⭐ 状态采集方式
+# 'snapshot': 每帧只取一次WorldSnapshot（1次RPC/帧）
+# 'rpc':      每辆车分别调用get_transform/get_velocity/get_acceleration（3次RPC/车/帧）
+# 'recorder': 仿真器内置记录器录制整个场景，采集循环只tick（每秒1次快照维护活跃集合），
+#             只实时保存spawn元数据；之后用 1extract_recorder_logs.py 离线并行生成 scenario_XXX.csv
+CAPTURE_MODE = 'snapshot'
+RECORDER_UNIT_SCALE = 0.01  # 记录器位置/速度单位（厘米）→ 米
+
+# ⭐ 流式写盘: 每CHUNK_SECONDS秒仿真时间写出一块
+CHUNK_SECONDS = 30
+
+# ⭐ 数据存储格式（采集、清洗合并、划分统一使用，类型表见data_schema.py）
+# 'parquet': 列式存储，类别列字典编码、运动学列float32（需要pyarrow，未安装时自动退回CSV）
+# 'csv':     纯文本（同样按类型表转换: float32精度、int32 id）
+DATA_FORMAT = 'parquet'
+EXPORT_CSV = True  # 非CSV格式时，carla_round_all/train/val/test 另外导出一份CSV（兼容旧工具）
+# 另外写出按 split/weather/traffic_density 分区的列式数据集（PROCESSED_DATA_DIR/dataset，需要pyarrow，见partitioned_dataset.py）
+PARTITIONED_DATASET = True
+
+# ⭐ 采集流水线
+# 'sync':  tick、读取、计算、缓冲在同一线程依次执行
+# 'async': 主线程只tick并读取原始状态，后台线程计算并缓冲（tick与数据处理重叠）
+PIPELINE_MODE = 'sync'
+PIPELINE_QUEUE_FRAMES = 8  # 队列最多缓存的帧数（满时主线程等待）
+
+# ⭐ 自适应场景控制: 不预先跑完spawn阶段，采集中按核心区通过数反馈spawn，
+# 达到target_passages且采集满ADAPTIVE_MIN_DURATION秒后提前结束（最长SCENARIO_DURATION）
+ADAPTIVE_MODE = False
+CORE_RADIUS = 25.0  # 核心区半径（米）: 采集中的核心区通过数与2clean流量验证共用
+ADAPTIVE_MIN_DURATION = 60  # 最短采集时长（秒）
+ADAPTIVE_STALL_TIME = 60  # 连续多少秒没有新的核心区通过视为目标无法达到
+ADAPTIVE_LOOKAHEAD = 15  # spawn后到达核心区的大致时间（秒）
+
+# ⭐ 连续模式: 同一密度的场景共用车流（只预热/spawn一次），切换天气后稳定一段时间即采集
+CONTINUOUS_MODE = False
+CONTINUOUS_SETTLE_TIME = 10  # 切换天气后的稳定时间（秒）
+
+# ⭐ 仿真性能配置（setup_world时应用）
+# no_rendering_mode: 关闭渲染（采集不需要画面）
+# hybrid_physics:    交通管理器混合物理，hybrid_radius（米，以ROUNDABOUT_CENTER为中心）外的车辆不做完整物理计算
+#                    （在环岛中心放置一个不参与物理的hero锚点车辆作为半径中心）
+# respawn_dormant:   是否把休眠车辆重新放到respawn_bounds（米）范围内；采集时会造成轨迹跳变，保持关闭
+# substepping:       物理子步，max_substep_delta_time × max_substeps 必须 ≥ 1/SIM_RATE
+PERFORMANCE_PROFILES = {
+    # 原配置: 只开同步模式
+    'default': {
+        'no_rendering_mode': False,
+        'hybrid_physics': False,
+    },
+    'no_render': {
+        'no_rendering_mode': True,
+        'hybrid_physics': False,
+    },
+    'hybrid': {
+        'no_rendering_mode': True,
+        'hybrid_physics': True,
+        'hybrid_radius': 70.0,  # 覆盖采集半径（50米）+ spawn半径（55米）
+        'respawn_dormant': False,
+    },
+    # LOS E及以上: 混合物理 + 较粗的物理子步
+    'high_density': {
+        'no_rendering_mode': True,
+        'hybrid_physics': True,
+        'hybrid_radius': 60.0,
+        'respawn_dormant': False,
+        'respawn_bounds': (25.0, 100.0),
+        'substepping': True,
+        'max_substep_delta_time': 0.02,
+        'max_substeps': 5,
+    },
+}
+PERFORMANCE_PROFILE = 'default'
+
+# ⭐ 附加运动学特征（写盘前按块向量化计算，不增加tick循环开销）
+# 可选: 'yaw_rate', 'jerk', 'angle_unwrapped', 'curvature'；为空时CSV列与原来一致
+EXTRA_FEATURES = []
+
+# ===== 仿真端点 =====
+# 每个端点一个CARLA服务器（client端口 + 交通管理器端口）
+# 多于1个端点时，25个场景分配到多个工作进程并行采集
+SIMULATOR_ENDPOINTS = [
+    {'host': 'localhost', 'port': 2000, 'tm_port': 8000},
+    # {'host': 'localhost', 'port': 2002, 'tm_port': 8002},
+]
+SCENARIO_RETRIES = 2  # 场景失败后的重试次数（重连后重跑）
+CAMPAIGN_SEED = 2024  # 场景随机种子 = CAMPAIGN_SEED + scenario_id（记录在任务清单中）
+
 # ===== 天气类型（5种）=====
 WEATHER_TYPES = [
     'ClearNoon',
@@ -144,6 +250,7 @@ TOTAL_SCENARIOS = len(WEATHER_TYPES) * len(TRAFFIC_DENSITIES)
 BASE_DIR = 'D:/Carla Simulation'
 RAW_DATA_DIR = os.path.join(BASE_DIR, 'data/raw_v3_final')
 PROCESSED_DATA_DIR = os.path.join(BASE_DIR, 'data/processed_v3_final')
+RECORDER_DIR = os.path.join(BASE_DIR, 'data/recorder_v3_final')  # CAPTURE_MODE='recorder'的日志（仿真器所在机器的路径）
 
 # ===== 配置总结打印 =====
 if __name__ == '__main__':
@@ -0,0 +1,235 @@
+# scenario_scheduler.py
+"""
+多服务器并行场景调度
+✅ 每个仿真端点（client端口 + TM端口）对应一个独立工作进程
+✅ 共享任务队列，空闲进程自动领取下一个场景
+✅ 场景失败后重连并重试（最多SCENARIO_RETRIES次，可由其他进程接手）
+✅ 每个工作进程用独立管道同步报告结果；进程异常退出（段错误、os._exit等）时，
+   调度器按重试规则把它正在执行的场景重新排队或记为失败
+✅ 输出仍写入RAW_DATA_DIR，文件名保持 scenario_XXX
+
+工作进程通过 runner_factory(endpoint) 创建执行器，执行器需提供:
+    run(scenario) -> 结果（可pickle；scenario['attempt']为已失败次数）
+    close()
+因此可以用回放替身（carla_replay）或任意假执行器在本地测试。
+"""
+import multiprocessing as mp
+import time
+import traceback
+from multiprocessing.connection import wait
+
+import numpy as np
+
+# 端点连续连接失败次数上限（超过则该工作进程退出）
+MAX_CONNECT_FAILURES = 3
+
+
+def parse_endpoints(text):
+    """解析 'host:port:tm_port,host:port:tm_port'"""
+    endpoints = []
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, port, tm_port = item.rsplit(':', 2)
+        endpoints.append({'host': host, 'port': int(port), 'tm_port': int(tm_port)})
+    return endpoints
+
+
+def endpoint_name(endpoint):
+    return f"{endpoint['host']}:{endpoint['port']}/tm{endpoint['tm_port']}"
+
+
+def _worker_main(worker_id, endpoint, runner_factory, task_queue, conn, retries):
+    """
+    工作进程: 连接一个端点，循环领取场景
+
+    结果通过conn同步发送（不经过共享队列的后台线程），进程随时退出也不会影响其他进程的结果
+    """
+    # fork出的进程继承同一随机状态，这里重新播种
+    np.random.seed()
+
+    runner = None
+    connect_failures = 0
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        scenario, attempt = task
+        start = time.time()
+        conn.send({
+            'scenario_id': scenario['id'],
+            'status': 'running',
+            'worker': worker_id,
+            'endpoint': endpoint_name(endpoint),
+            'attempt': attempt,
+        })
+
+        try:
+            if runner is None:
+                runner = runner_factory(endpoint)
+                connect_failures = 0
+            result = runner.run(dict(scenario, attempt=attempt))
+            conn.send({
+                'scenario_id': scenario['id'],
+                'status': 'done',
+                'result': result,
+                'worker': worker_id,
+                'endpoint': endpoint_name(endpoint),
+                'attempt': attempt,
+                'elapsed': time.time() - start,
+            })
+        except Exception as e:
+            traceback.print_exc()
+            # 丢弃当前连接，下个任务前重连
+            if runner is None:
+                connect_failures += 1
+            else:
+                try:
+                    runner.close()
+                except Exception:
+                    pass
+                runner = None
+
+            # ⭐ 重试由调度器重新排队
+            conn.send({
+                'scenario_id': scenario['id'],
+                'status': 'retry' if attempt < retries else 'failed',
+                'error': f'{type(e).__name__}: {e}',
+                'worker': worker_id,
+                'endpoint': endpoint_name(endpoint),
+                'attempt': attempt,
+                'elapsed': time.time() - start,
+            })
+
+            if connect_failures >= MAX_CONNECT_FAILURES:
+                print(f"❌ 工作进程{worker_id} ({endpoint_name(endpoint)}) 连续{connect_failures}次连接失败，退出")
+                break
+
+    if runner is not None:
+        try:
+            runner.close()
+        except Exception:
+            pass
+    conn.close()
+
+
+class ParallelScenarioScheduler:
+    """
+    把场景列表分配到多个仿真端点并行执行
+
+    用法:
+        scheduler = ParallelScenarioScheduler(endpoints, runner_factory, retries=2)
+        results = scheduler.run(scenarios)   # {scenario_id: 结果记录}
+    """
+
+    def __init__(self, endpoints, runner_factory, retries=2, on_result=None):
+        if not endpoints:
+            raise ValueError('至少需要一个仿真端点')
+        self.endpoints = list(endpoints)
+        self.runner_factory = runner_factory
+        self.retries = retries
+        self.on_result = on_result
+
+    def run(self, scenarios):
+        ctx = mp.get_context()
+        task_queue = ctx.Queue()
+
+        scenarios = {scenario['id']: scenario for scenario in scenarios}
+        for scenario in scenarios.values():
+            task_queue.put((scenario, 0))
+
+        workers = []
+        readers = {}  # 结果管道 → 工作进程编号（进程退出后移除）
+        for worker_id, endpoint in enumerate(self.endpoints):
+            reader, writer = ctx.Pipe(duplex=False)
+            proc = ctx.Process(
+                target=_worker_main,
+                args=(worker_id, endpoint, self.runner_factory, task_queue, writer, self.retries),
+                name=f'scenario-worker-{worker_id}',
+            )
+            proc.start()
+            # 只保留子进程中的写端，子进程退出时读端收到EOF
+            writer.close()
+            workers.append(proc)
+            readers[reader] = worker_id
+            print(f"  工作进程{worker_id}: {endpoint_name(endpoint)}")
+
+        results = {}
+        pending = set(scenarios)
+        running = {}  # 工作进程编号 → 正在执行的 (scenario_id, attempt)
+
+        def handle(record):
+            if self.on_result is not None:
+                self.on_result(record)
+
+            if record['status'] == 'running':
+                running[record['worker']] = (record['scenario_id'], record['attempt'])
+                return
+            running.pop(record.get('worker'), None)
+
+            if record['status'] == 'retry':
+                print(f"  ⚠️ 场景 {record['scenario_id']} 在 {record['endpoint']} 失败 "
+                      f"(第{record['attempt'] + 1}次): {record['error']}，重试")
+                task_queue.put((scenarios[record['scenario_id']], record['attempt'] + 1))
+                return
+
+            results[record['scenario_id']] = record
+            pending.discard(record['scenario_id'])
+
+        def worker_exited(worker_id):
+            """工作进程已退出: 没有报告结果的场景按一次失败处理"""
+            if worker_id not in running:
+                return
+            scenario_id, attempt = running[worker_id]
+            proc = workers[worker_id]
+            proc.join(timeout=1.0)
+            handle({
+                'scenario_id': scenario_id,
+                'status': 'retry' if attempt < self.retries else 'failed',
+                'error': f'工作进程{worker_id}异常退出 (exitcode {proc.exitcode})',
+                'worker': worker_id,
+                'endpoint': endpoint_name(self.endpoints[worker_id]),
+                'attempt': attempt,
+                'elapsed': 0.0,
+            })
+
+        try:
+            while pending and readers:
+                for reader in wait(list(readers), timeout=1.0):
+                    worker_id = readers[reader]
+                    try:
+                        record = reader.recv()
+                    except (EOFError, OSError):
+                        # 管道中之前的结果都已读完
+                        del readers[reader]
+                        reader.close()
+                        worker_exited(worker_id)
+                        continue
+                    handle(record)
+
+            if pending:
+                # 所有端点都不可用，剩余场景记为失败
+                for scenario_id in sorted(pending):
+                    record = {
+                        'scenario_id': scenario_id,
+                        'status': 'failed',
+                        'error': '没有可用的工作进程',
+                        'elapsed': 0.0,
+                    }
+                    results[scenario_id] = record
+                    if self.on_result is not None:
+                        self.on_result(record)
+        finally:
+            for _ in workers:
+                task_queue.put(None)
+            for proc in workers:
+                proc.join(timeout=30)
+                if proc.is_alive():
+                    proc.terminate()
+            for reader in readers:
+                reader.close()
+
+        return results
@@ -0,0 +1,85 @@
+# shard_cache.py
+"""
+清洗结果分片缓存（2clean_and_merge_v2 增量运行）
+✅ 每个场景的清洗结果保存为一个分片: PROCESSED_DATA_DIR/shards/scenario_XXX.parquet（或.csv）
+✅ 缓存键 = sha256(原始文件内容哈希 + 清洗参数 + SHARD_VERSION)
+✅ 原始文件或清洗参数不变时直接读取分片，只重建新增/变化的场景
+✅ 分片旁的 scenario_XXX.shard.json 保存流量统计与清洗统计，合并与流量报告不需要原始数据
+
+清洗逻辑本身改变时递增 SHARD_VERSION，使所有旧分片失效。
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from campaign_manifest import file_sha256
+from data_schema import data_path, read_table, write_table
+
+SHARD_DIR_NAME = 'shards'
+SHARD_META_SUFFIX = '.shard.json'
+SHARD_VERSION = 2  # 2: 流量统计改为flow_engine（驶入/驶出/停留时间）
+
+
+def shard_key(raw_file, params):
+    """原始文件内容 + 清洗参数 → 缓存键"""
+    payload = json.dumps({
+        'raw_sha256': file_sha256(raw_file),
+        'params': params,
+        'version': SHARD_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ShardCache:
+    """
+    用法（可传给工作进程）:
+        cache = ShardCache(PROCESSED_DATA_DIR, DATA_FORMAT)
+        key = shard_key(raw_file, params)
+        meta = cache.lookup(scenario_id, key)          # 未命中返回None
+        df = cache.load(scenario_id) if meta else ...
+        cache.store(scenario_id, key, df, {'flow': ..., 'stats': ...})
+    """
+
+    def __init__(self, processed_dir, data_format):
+        self.directory = Path(processed_dir) / SHARD_DIR_NAME
+        self.data_format = data_format
+
+    def shard_path(self, scenario_id):
+        return data_path(self.directory, f'scenario_{scenario_id:03d}', self.data_format)
+
+    def meta_path(self, scenario_id):
+        return self.directory / f'scenario_{scenario_id:03d}{SHARD_META_SUFFIX}'
+
+    def lookup(self, scenario_id, key):
+        """缓存键一致且分片存在时返回元数据，否则返回None"""
+        meta_file = self.meta_path(scenario_id)
+        if not meta_file.exists():
+            return None
+        try:
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('key') != key or meta.get('shard') != self.shard_path(scenario_id).name:
+            return None
+        if not self.shard_path(scenario_id).exists():
+            return None
+        return meta
+
+    def load(self, scenario_id):
+        return read_table(self.shard_path(scenario_id))
+
+    def store(self, scenario_id, key, df, meta):
+        """先写分片再写元数据（元数据是提交标志，中途崩溃不会留下可命中的坏分片）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta_file = self.meta_path(scenario_id)
+        if meta_file.exists():
+            meta_file.unlink()
+        shard_file = write_table(df, self.shard_path(scenario_id))
+        meta = dict(meta, key=key, shard=shard_file.name, rows=len(df))
+        tmp_file = meta_file.with_name(meta_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, meta_file)
+        return shard_file
@@ -0,0 +1,116 @@
+# spawn_controller.py
+"""
+自适应场景控制
+✅ 采集开始后边采集边spawn（不再先跑完整个spawn阶段）
+✅ 实时观察核心区通过数（半径≤25米），按目标流量调整每批数量和批次间隔
+✅ 达到target_passages且超过最短时长后提前结束场景
+✅ 长时间没有新通过（目标明显无法达到）时也提前结束
+
+目标: 核心区通过数落在 target_passages ±20%（verify_flow_rates的检查标准）内，
+同时减少每个场景的仿真时长。
+"""
+import math
+
+
+class AdaptiveSpawnController:
+    """
+    每个批次间隔决定一次spawn数量:
+
+        期望通过数(t) = 目标流量 × (t + lookahead)，不超过target_passages
+        缺口 = 期望通过数 − 已通过数 − 正在驶入的车辆数
+        本批数量 = 缺口（不超过每批上限、剩余spawn配额、目标剩余数）
+
+    缺口超过每批上限时缩短间隔，没有缺口时逐步恢复到配置间隔。
+
+    用法:
+        controller = AdaptiveSpawnController(density_config, FRAME_RATE, SCENARIO_DURATION, ...)
+        n = controller.spawn_request(frame, passages, approaching)   # 非决策帧返回0
+        controller.record_spawn(n, spawned)
+        reason = controller.stop_reason(frame, passages)              # None表示继续
+    """
+
+    def __init__(self, density_config, frame_rate, scenario_duration, min_duration=60,
+                 stall_time=60, lookahead=15, min_interval=2, batch_factor=2.0, spawn_factor=1.5):
+        self.target = density_config['target_passages']
+        self.frame_rate = frame_rate
+        # 目标流量（辆/秒）: target_passages 对应 scenario_duration 秒
+        self.rate = self.target / scenario_duration
+        self.max_duration = scenario_duration
+        self.min_duration = min_duration
+        self.stall_time = stall_time
+        self.lookahead = lookahead
+
+        self.base_interval = density_config.get('batch_interval', 15)
+        self.interval = self.base_interval
+        self.min_interval = min(min_interval, self.base_interval)
+        self.max_batch = max(1, int(round(density_config['spawn_per_batch'] * batch_factor)))
+        self.spawn_cap = int(math.ceil(density_config['spawn_total'] * spawn_factor))
+
+        self.spawned = 0
+        self.requested = 0
+        self.batches = 0
+        self.next_decision_frame = None
+        self.last_passages = None
+        self.last_passage_frame = None
+        self.history = []  # [(秒, 通过数, 驶入中, 本批数量, 间隔)]
+
+    def spawn_request(self, frame, passages, approaching):
+        """决策帧返回本批spawn数量，其余帧返回0"""
+        self._observe(frame, passages)
+        if self.next_decision_frame is not None and frame < self.next_decision_frame:
+            return 0
+
+        t = frame / self.frame_rate
+        expected = min(self.rate * (t + self.lookahead), self.target)
+        deficit = int(math.ceil(expected - passages - approaching))
+        still_needed = self.target - passages - approaching
+        count = max(0, min(deficit, self.max_batch, self.spawn_cap - self.spawned, still_needed))
+
+        # 间隔反馈: 缺口大于每批上限 → 加快；没有缺口 → 放慢（不超过配置间隔）
+        if deficit > self.max_batch:
+            self.interval = max(self.min_interval, self.interval * 0.75)
+        elif deficit <= 0:
+            self.interval = min(self.base_interval, self.interval * 1.25)
+
+        self.next_decision_frame = frame + max(1, int(round(self.interval * self.frame_rate)))
+        self.history.append((round(t, 1), passages, approaching, count, round(self.interval, 2)))
+        return count
+
+    def record_spawn(self, requested, spawned):
+        self.requested += requested
+        self.spawned += spawned
+        if spawned:
+            self.batches += 1
+
+    def _observe(self, frame, passages):
+        if self.last_passages is None or passages > self.last_passages:
+            self.last_passages = passages
+            self.last_passage_frame = frame
+
+    def stop_reason(self, frame, passages):
+        """
+        返回提前结束的原因，None表示继续
+
+        'target':  已达到target_passages，且已采集min_duration秒
+        'stalled': 超过min_duration后连续stall_time秒没有新的核心区通过（堵死或无法spawn）
+        """
+        self._observe(frame, passages)
+        t = frame / self.frame_rate
+        if t < self.min_duration:
+            return None
+        if passages >= self.target:
+            return 'target'
+        stalled_for = (frame - self.last_passage_frame) / self.frame_rate
+        if stalled_for >= self.stall_time:
+            return 'stalled'
+        return None
+
+    def summary(self):
+        return {
+            'target_passages': self.target,
+            'spawned': self.spawned,
+            'requested': self.requested,
+            'batches': self.batches,
+            'final_interval': self.interval,
+            'history': self.history,
+        }
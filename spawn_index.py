@@ -0,0 +1,74 @@
+# spawn_index.py
+"""
+外环spawn点索引
+✅ 按 地图 × 环形几何（半径范围、朝向容差）缓存，不再每次扫描全部spawn点
+✅ 用当前车辆位置做空间检查，只选择空闲的spawn点
+"""
+import math
+
+import numpy as np
+
+# 缓存: (地图名, 中心x, 中心y, 最小半径, 最大半径, 朝向容差) → SpawnPointIndex
+_INDEX_CACHE = {}
+
+
+class SpawnPointIndex:
+    """一组spawn点及其坐标数组（按朝向优先级排序）"""
+
+    def __init__(self, spawn_points):
+        self.spawn_points = list(spawn_points)
+        self.xy = np.array(
+            [[sp.location.x, sp.location.y] for sp in self.spawn_points], dtype=np.float64
+        ).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.spawn_points)
+
+    @classmethod
+    def build(cls, all_spawns, center, radius_min, radius_max, angle_tolerance):
+        """筛选环形区域内、朝向环岛中心（偏差≤angle_tolerance度）的spawn点"""
+        outer_spawns = []
+        for sp in all_spawns:
+            dist = sp.location.distance(center)
+
+            if radius_min <= dist <= radius_max:
+                to_center = center - sp.location
+                angle_to_center = math.atan2(to_center.y, to_center.x)
+                spawn_yaw = math.radians(sp.rotation.yaw)
+
+                angle_diff = abs(angle_to_center - spawn_yaw) % (2 * math.pi)
+                if angle_diff > math.pi:
+                    angle_diff = 2 * math.pi - angle_diff
+
+                angle_diff_deg = math.degrees(angle_diff)
+                if angle_diff_deg > angle_tolerance:
+                    continue
+
+                priority = 100 - angle_diff_deg
+                outer_spawns.append((sp, dist, priority))
+
+        outer_spawns.sort(key=lambda x: x[2], reverse=True)
+        return cls(sp for sp, _, _ in outer_spawns)
+
+    def free_indices(self, vehicle_xy, clearance):
+        """与所有车辆距离都大于clearance的spawn点下标"""
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        vehicle_xy = np.asarray(vehicle_xy, dtype=np.float64).reshape(-1, 2)
+        if len(vehicle_xy) == 0:
+            return np.arange(len(self))
+        diff = self.xy[:, None, :] - vehicle_xy[None, :, :]
+        min_dist_sq = np.min(np.einsum('ijk,ijk->ij', diff, diff), axis=1)
+        return np.flatnonzero(min_dist_sq > clearance ** 2)
+
+
+def get_spawn_index(world, map_name, center, radius_min, radius_max, angle_tolerance):
+    """按地图与环形几何取缓存的索引（首次调用时才请求地图构建）"""
+    key = (map_name, center.x, center.y, radius_min, radius_max, angle_tolerance)
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        index = SpawnPointIndex.build(
+            world.get_map().get_spawn_points(), center, radius_min, radius_max, angle_tolerance
+        )
+        _INDEX_CACHE[key] = index
+    return index
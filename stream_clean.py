@@ -0,0 +1,146 @@
+# stream_clean.py
+"""
+流式清洗（2clean_and_merge_v2 --streaming，数据集大于内存时使用）
+✅ 两遍分块处理: 内存只与块大小（chunk_rows）和单个场景的轨迹数有关，与数据总量无关
+✅ 第1遍 scan_scenario: 逐块累积流量指标（FlowAccumulator）和半径过滤后的每轨迹统计
+✅ 由轨迹统计决定保留哪些轨迹（短轨迹、静止车辆），按场景顺序、首次出现顺序分配全局trackId
+✅ 第2遍 write_scenario: 再逐块读取原始数据，过滤并映射trackId后写入轨迹存储（按 (trackId, frame) 排好的位置），
+   之后从轨迹存储顺序导出输出文件
+✅ 输出与内存模式（clean_scenario + clean_data）逐行一致
+
+静止判断用float64累加的速度和 / 行数，与内存模式的groupby均值只在阈值附近的舍入上可能不同。
+"""
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_schema import iter_table
+from flow_engine import FlowAccumulator
+
+TRACK_STAT_COLUMNS = ['rows', 'speed_sum', 'radius_sum', 'first_row', 'behavior_type']
+_TRACK_STAT_AGG = {
+    'rows': 'sum',
+    'speed_sum': 'sum',
+    'radius_sum': 'sum',
+    'first_row': 'min',
+    'behavior_type': 'first',
+}
+
+
+def _chunk_track_stats(chunk, first_row):
+    """一块（已过滤半径）的每轨迹统计，first_row为块第一行在场景中的行号"""
+    data = pd.DataFrame({
+        'trackId': chunk['trackId'].to_numpy(),
+        'speed': chunk['speed'].to_numpy(dtype=np.float64),
+        'radius': chunk['radius'].to_numpy(dtype=np.float64),
+        'row': first_row,
+        'behavior_type': chunk['behavior_type'].astype(str).to_numpy(),
+    })
+    return data.groupby('trackId', sort=False).agg(
+        rows=('speed', 'size'),
+        speed_sum=('speed', 'sum'),
+        radius_sum=('radius', 'sum'),
+        first_row=('row', 'min'),
+        behavior_type=('behavior_type', 'first'),
+    )
+
+
+def scan_scenario(scenario_id, file_path, params, chunk_rows):
+    """
+    第1遍: 分块扫描一个场景（在工作进程中运行）
+
+    返回的tracks只含保留的轨迹（按首次出现顺序），每条一行:
+    trackId, rows, speed_sum, radius_sum, behavior_type
+    """
+    t0 = time.perf_counter()
+    flow = FlowAccumulator(scenario_id, params['frame_rate'], params['core_radius'])
+    track_stats = None
+    raw_rows = 0
+    kept_rows = 0
+    for chunk in iter_table(file_path, chunk_rows):
+        flow.update(chunk)
+        in_range = (chunk['radius'] <= params['radius']).to_numpy()
+        rows = raw_rows + np.flatnonzero(in_range)
+        raw_rows += len(chunk)
+        if not np.any(in_range):
+            continue
+        kept_rows += len(rows)
+        chunk_stats = _chunk_track_stats(chunk[in_range], rows)
+        # ⭐ 与之前块的统计合并（只保留每轨迹一行）
+        if track_stats is not None:
+            chunk_stats = pd.concat([track_stats, chunk_stats]).groupby(level=0, sort=False).agg(_TRACK_STAT_AGG)
+        track_stats = chunk_stats
+
+    if track_stats is None:
+        track_stats = pd.DataFrame(columns=TRACK_STAT_COLUMNS, index=pd.Index([], name='trackId'))
+    valid = track_stats[track_stats['rows'] >= params['min_length']]
+    moving = valid[valid['speed_sum'] / valid['rows'] >= params['min_speed']]
+    tracks = moving.sort_values('first_row').drop(columns='first_row').reset_index()
+
+    return {
+        'scenario_id': scenario_id,
+        'file': Path(file_path).name,
+        'flow': flow.result(),
+        'stats': {
+            'rows': raw_rows,
+            'tracks': flow.num_tracks,
+            'removed_rows': raw_rows - kept_rows,
+            'removed_tracks': flow.num_tracks - len(valid),
+            'removed_static': len(valid) - len(moving),
+        },
+        'tracks': tracks,
+        'kept_rows': int(tracks['rows'].sum()),
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+def assign_global_ids(results):
+    """按场景ID顺序、场景内首次出现顺序为保留的轨迹分配全局trackId（写入tracks['global_id']）"""
+    offset = 0
+    for result in results:
+        tracks = result['tracks']
+        tracks['global_id'] = np.arange(offset, offset + len(tracks), dtype=np.int64)
+        offset += len(tracks)
+    return offset
+
+
+def write_scenario(writers, result, file_path, params, chunk_rows):
+    """第2遍: 分块过滤一个场景并写入所有writer（TableWriter / TrackStoreWriter），返回写入行数"""
+    tracks = result['tracks']
+    kept = pd.Index(tracks['trackId'].to_numpy())
+    global_ids = tracks['global_id'].to_numpy()
+    written = 0
+    for chunk in iter_table(file_path, chunk_rows):
+        position = kept.get_indexer(chunk['trackId'].to_numpy())
+        mask = (chunk['radius'] <= params['radius']).to_numpy() & (position >= 0)
+        df = chunk[mask]
+        df = df.assign(
+            trackId=global_ids[position[mask]],
+            scenario_id=np.int16(result['scenario_id']),
+            original_trackId=df['trackId'],
+        )
+        for writer in writers:
+            writer.write(df)
+        written += len(df)
+    return written
+
+
+def track_table(results):
+    """所有保留轨迹的统计表（场景标签来自流量结果），用于dataset_summary.summary_from_tracks"""
+    frames = []
+    for result in results:
+        tracks = result['tracks']
+        flow = result['flow']
+        frames.append(pd.DataFrame({
+            'scenario_id': result['scenario_id'],
+            'weather': flow['weather'],
+            'traffic_density': flow['density'],
+            'behavior_type': tracks['behavior_type'].to_numpy(),
+            'trackId': tracks['global_id'].to_numpy(),
+            'rows': tracks['rows'].to_numpy(dtype=np.int64),
+            'speed_sum': tracks['speed_sum'].to_numpy(dtype=np.float64),
+            'radius_sum': tracks['radius_sum'].to_numpy(dtype=np.float64),
+        }))
+    return pd.concat(frames, ignore_index=True)
@@ -9,7 +9,12 @@ import sys
 
 sys.path.append('D:/Carla Simulation')
 
-import carla
+import os
+
+if os.environ.get('CARLA_REPLAY_DIR'):
+    import carla_replay as carla  # 离线回放替身
+else:
+    import carla
 import pandas as pd
 import numpy as np
 import math
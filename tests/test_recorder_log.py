@@ -0,0 +1,130 @@
+# tests/test_recorder_log.py
+"""
+recorder_log: 回放替身的记录器日志解析结果与同一次回放的实时快照采集一致
+"""
+import pytest
+
+import carla_replay as carla
+from record_clock import RecordClock, interpolate_rows
+from recorder_log import iter_frame_rows, parse_recorder_info, track_states
+
+WEATHER = 'ClearNoon'
+DENSITY = 'medium'
+# 比较的原始列下标: x, y, z, vx, vy, yaw（加速度两种方式的算法不同）
+COMPARED_FIELDS = [2, 3, 4, 5, 6, 9]
+
+
+def snapshot_rows(world, frame_id, behaviors):
+    """实时采集: 读取一次快照，返回原始数据行（顺序同frame_recorder.RAW_COLUMNS）"""
+    rows = []
+    for actor in world.get_snapshot():
+        transform = actor.get_transform()
+        velocity = actor.get_velocity()
+        rows.append((frame_id, actor.id, transform.location.x, transform.location.y, transform.location.z,
+                     velocity.x, velocity.y, 0.0, 0.0, transform.rotation.yaw,
+                     WEATHER, DENSITY, behaviors[actor.id]))
+    return rows
+
+
+def record_replay(replay_dir, tmp_path, sim_rate, record_rate, mode, frames):
+    """
+    同一次回放同时开记录器和逐帧快照采集（与采集脚本相同的tick/插值规则）
+
+    中途spawn一辆车、销毁一辆车，覆盖日志中的Create/Destroy。
+    返回 (实时采集的 {frame: rows}, 日志文本, 元数据)
+    """
+    carla.configure(source_dir=str(replay_dir), source_rate=10)
+    client = carla.Client('localhost', 2000)
+    world = client.load_world('Town03')
+    settings = world.get_settings()
+    settings.synchronous_mode = True
+    settings.fixed_delta_seconds = 1.0 / sim_rate
+    world.apply_settings(settings)
+
+    blueprint = world.get_blueprint_library().filter('vehicle.*')[0]
+    spawn_points = world.get_map().get_spawn_points()
+    vehicles = [v for v in (world.try_spawn_actor(blueprint, sp) for sp in spawn_points[:8]) if v is not None]
+    behaviors = {vehicle.id: ['normal', 'aggressive', 'cautious'][i % 3] for i, vehicle in enumerate(vehicles)}
+
+    log_file = tmp_path / 'scenario_000.log'
+    client.start_recorder(str(log_file), True)
+    world.tick()  # 同Collector.start_recorder: 日志第1帧 = 采集循环开始时的状态
+
+    clock = RecordClock(sim_rate, record_rate, mode)
+    live = {}
+    sim_ticks = 0
+    states = {sim_ticks: snapshot_rows(world, 0, behaviors)}
+    for index in range(1, frames + 1):
+        if index == frames // 3:
+            late = world.try_spawn_actor(blueprint, spawn_points[-1])
+            behaviors[late.id] = 'normal'
+        if index == frames // 2:
+            vehicles[0].destroy()
+        frame_id = index - 1
+        tick, alpha = clock.position(index)
+        while sim_ticks < tick:
+            world.tick()
+            sim_ticks += 1
+            states[sim_ticks] = snapshot_rows(world, frame_id, behaviors)
+        rows = [(frame_id,) + row[1:] for row in states[tick]]
+        if alpha < 1.0:
+            before = [(frame_id,) + row[1:] for row in states[tick - 1]]
+            rows = interpolate_rows(before, rows, alpha)
+        live[frame_id] = rows
+    client.stop_recorder()
+
+    metadata = {
+        'weather': WEATHER,
+        'traffic_density': DENSITY,
+        'sim_rate': sim_rate,
+        'record_rate': record_rate,
+        'record_mode': mode,
+        'start_frame': 0,
+        'frames': frames,
+        'sim_ticks': sim_ticks,
+        'lead_ticks': 1,
+        'behaviors': {str(actor_id): behavior for actor_id, behavior in behaviors.items()},
+    }
+    return live, client.show_recorder_file_info(str(log_file), True), metadata
+
+
+@pytest.mark.parametrize('sim_rate, record_rate, mode', [
+    (10, 10, 'decimate'),
+    (20, 10, 'decimate'),
+    (15, 10, 'interpolate'),
+])
+def test_recorder_matches_snapshot_capture(replay_dir, tmp_path, sim_rate, record_rate, mode):
+    live, text, metadata = record_replay(replay_dir, tmp_path, sim_rate, record_rate, mode, frames=60)
+
+    log_frames = parse_recorder_info(text.splitlines())
+    assert len(log_frames) == metadata['sim_ticks'] + metadata['lead_ticks']
+    states = track_states(log_frames, sim_rate, {int(actor_id) for actor_id in metadata['behaviors']})
+
+    extracted = dict(iter_frame_rows(states, metadata))
+    assert sorted(extracted) == sorted(live)
+    for frame_id, live_rows in live.items():
+        rows = {row[1]: row for row in extracted[frame_id]}
+        assert sorted(rows) == sorted(row[1] for row in live_rows), f'帧{frame_id}的车辆不同'
+        for live_row in live_rows:
+            row = rows[live_row[1]]
+            assert row[10:] == live_row[10:]
+            for i in COMPARED_FIELDS:
+                assert row[i] == pytest.approx(live_row[i], abs=1e-6), f'帧{frame_id} 车辆{row[1]} 列{i}'
+
+
+def test_velocity_from_positions_without_kinematics():
+    """没有Kinematics记录时速度由位置差分，第一帧为0"""
+    text = '\n'.join([
+        'Frame 1 at 0.1 seconds',
+        ' Create 7: vehicle.audi.a2 (1) at (0.0, 0.0, 0.0)',
+        ' Positions: 1',
+        '  Id: 7 Location: (100.0, 200.0, 0.0) Rotation: (0, 0, 90.0)',
+        'Frame 2 at 0.2 seconds',
+        ' Positions: 1',
+        '  Id: 7 Location: (150.0, 200.0, 0.0) Rotation: (0, 0, 90.0)',
+    ])
+    frames = parse_recorder_info(text.splitlines())
+    assert frames[0][7] == (1.0, 2.0, 0.0, 90.0, None, None)
+    states = track_states(frames, sim_rate=10)
+    assert states[0][7][3:5] == (0.0, 0.0)
+    assert states[1][7][3:5] == pytest.approx((5.0, 0.0))
@@ -0,0 +1,101 @@
+# tests/test_scenario_scheduler.py
+"""
+ParallelScenarioScheduler: 用假执行器测试重试与工作进程异常退出
+"""
+import os
+
+from scenario_scheduler import ParallelScenarioScheduler, parse_endpoints
+
+ENDPOINTS = parse_endpoints('localhost:2000:8000,localhost:2002:8002')
+
+
+class OkRunner:
+    def __init__(self, endpoint):
+        self.port = endpoint['port']
+
+    def run(self, scenario):
+        return {'scenario': scenario['id'], 'port': self.port}
+
+    def close(self):
+        pass
+
+
+class FlakyRunner(OkRunner):
+    """场景1第一次执行时抛出异常"""
+
+    def run(self, scenario):
+        if scenario['id'] == 1 and scenario['attempt'] == 0:
+            raise RuntimeError('连接断开')
+        return super().run(scenario)
+
+
+class AlwaysFailRunner(OkRunner):
+    def run(self, scenario):
+        raise RuntimeError('连接断开')
+
+
+class CrashRunner(OkRunner):
+    """场景1第一次执行时直接结束进程（不报告结果，模拟段错误）"""
+
+    def run(self, scenario):
+        if scenario['id'] == 1 and scenario['attempt'] == 0:
+            os._exit(3)
+        return super().run(scenario)
+
+
+class AlwaysCrashRunner(OkRunner):
+    def run(self, scenario):
+        os._exit(3)
+
+
+def scenarios(count=4):
+    return [{'id': i} for i in range(count)]
+
+
+def run(runner_factory, retries=2, endpoints=ENDPOINTS, count=4):
+    records = []
+    scheduler = ParallelScenarioScheduler(endpoints, runner_factory, retries=retries, on_result=records.append)
+    return scheduler.run(scenarios(count)), records
+
+
+def test_all_done():
+    results, _ = run(OkRunner)
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(record['status'] == 'done' for record in results.values())
+    assert all(record['result']['scenario'] == i for i, record in results.items())
+
+
+def test_retry_after_failure():
+    results, records = run(FlakyRunner)
+    assert all(record['status'] == 'done' for record in results.values())
+    assert results[1]['attempt'] == 1
+    assert [r['attempt'] for r in records if r['scenario_id'] == 1 and r['status'] == 'retry'] == [0]
+
+
+def test_failed_after_retries():
+    results, _ = run(AlwaysFailRunner, retries=1, count=2)
+    assert all(record['status'] == 'failed' for record in results.values())
+    assert all(record['attempt'] == 1 for record in results.values())
+
+
+def test_worker_crash_is_retried():
+    # 回归: 工作进程执行中退出时run()不会一直等待
+    results, records = run(CrashRunner)
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(record['status'] == 'done' for record in results.values())
+    assert results[1]['attempt'] == 1
+    crashed = [r for r in records if r['scenario_id'] == 1 and r['status'] == 'retry']
+    assert len(crashed) == 1 and '异常退出' in crashed[0]['error']
+
+
+def test_worker_crash_without_retries():
+    results, _ = run(CrashRunner, retries=0)
+    assert results[1]['status'] == 'failed'
+    assert '异常退出' in results[1]['error']
+    assert all(results[i]['status'] == 'done' for i in (0, 2, 3))
+
+
+def test_all_workers_crash():
+    results, _ = run(AlwaysCrashRunner, retries=1)
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(record['status'] == 'failed' for record in results.values())
@@ -0,0 +1,162 @@
+# tick_metrics.py
+"""
+采集循环分阶段计时
+✅ 每帧记录各阶段耗时: tick / 状态读取 / 特征计算 / 缓冲 / 活跃集合维护 / 写盘 / 队列等待
+✅ 统计RPC次数（客户端按调用计数）
+✅ 每场景输出帧延迟 p50/p95/p99
+✅ 指标写入CSV旁的 scenario_XXX.metrics.json
+
+用于区分慢场景是仿真器慢（tick）还是客户端慢（其他阶段）。
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 阶段顺序（列下标）
+PHASES = ['tick', 'fetch', 'features', 'buffer', 'despawn', 'io', 'queue']
+METRICS_SUFFIX = '.metrics.json'
+
+
+def metrics_path(output_file):
+    """指标文件路径: scenario_XXX.csv → scenario_XXX.metrics.json"""
+    output_file = Path(output_file)
+    return output_file.with_name(output_file.stem + METRICS_SUFFIX)
+
+
+def _percentiles_ms(values):
+    if len(values) == 0:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    values_ms = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(values_ms, [50, 95, 99])
+    return {
+        'mean': float(values_ms.mean()),
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'max': float(values_ms.max()),
+    }
+
+
+class TickLoopMetrics:
+    """
+    用法:
+        metrics = TickLoopMetrics(num_frames)
+        for frame in ...:
+            metrics.start_frame()
+            self.world.tick();        metrics.mark('tick', rpcs=1)
+            snapshot = ...;           metrics.mark('fetch', rpcs=1)
+            ...
+            metrics.end_frame()
+        metrics.save(path, extra)
+    """
+
+    def __init__(self, num_frames):
+        self.phase_seconds = np.zeros((max(num_frames, 1), len(PHASES)), dtype=np.float64)
+        self.frame_seconds = np.zeros(max(num_frames, 1), dtype=np.float64)
+        self.frame_rpcs = np.zeros(max(num_frames, 1), dtype=np.int64)
+        self.num_frames = 0
+        self.setup_seconds = {}
+        self._phase_index = {phase: i for i, phase in enumerate(PHASES)}
+        self._frame_start = 0.0
+        self._last = 0.0
+        self._wall_start = time.perf_counter()
+
+    def _ensure_capacity(self):
+        if self.num_frames < len(self.frame_seconds):
+            return
+        grow = len(self.frame_seconds)
+        self.phase_seconds = np.concatenate([self.phase_seconds, np.zeros_like(self.phase_seconds[:grow])])
+        self.frame_seconds = np.concatenate([self.frame_seconds, np.zeros(grow)])
+        self.frame_rpcs = np.concatenate([self.frame_rpcs, np.zeros(grow, dtype=np.int64)])
+
+    def start_frame(self):
+        self._ensure_capacity()
+        self._frame_start = self._last = time.perf_counter()
+
+    def mark(self, phase, rpcs=0):
+        """记录从上一个标记到现在的耗时，计入phase阶段"""
+        now = time.perf_counter()
+        self.phase_seconds[self.num_frames, self._phase_index[phase]] += now - self._last
+        self.frame_rpcs[self.num_frames] += rpcs
+        self._last = now
+
+    def end_frame(self):
+        self.frame_seconds[self.num_frames] = time.perf_counter() - self._frame_start
+        self.num_frames += 1
+
+    def record_setup(self, name, seconds):
+        """记录采集循环之外的阶段（预热、spawn等）"""
+        self.setup_seconds[name] = self.setup_seconds.get(name, 0.0) + seconds
+
+    @property
+    def total_rpcs(self):
+        return int(self.frame_rpcs[:self.num_frames].sum())
+
+    def frame_latency_ms(self):
+        return _percentiles_ms(self.frame_seconds[:self.num_frames])
+
+    def phase_totals(self):
+        """各阶段总耗时（秒）"""
+        totals = self.phase_seconds[:self.num_frames].sum(axis=0)
+        return {phase: float(totals[i]) for i, phase in enumerate(PHASES)}
+
+    @property
+    def ticks_per_second(self):
+        loop_seconds = float(self.frame_seconds[:self.num_frames].sum())
+        return self.num_frames / loop_seconds if loop_seconds > 0 else 0.0
+
+    def to_dict(self):
+        n = self.num_frames
+        loop_seconds = float(self.frame_seconds[:n].sum())
+        return {
+            'frames': n,
+            'loop_seconds': loop_seconds,
+            'ticks_per_second': self.ticks_per_second,
+            'wall_seconds': time.perf_counter() - self._wall_start,
+            'frame_latency_ms': self.frame_latency_ms(),
+            'phases': {
+                phase: dict(
+                    total_seconds=float(self.phase_seconds[:n, i].sum()),
+                    share=float(self.phase_seconds[:n, i].sum() / loop_seconds) if loop_seconds > 0 else 0.0,
+                    **_percentiles_ms(self.phase_seconds[:n, i])
+                )
+                for i, phase in enumerate(PHASES)
+            },
+            'rpc': {
+                'total': self.total_rpcs,
+                'per_frame_mean': float(self.frame_rpcs[:n].mean()) if n else 0.0,
+                'per_frame_max': int(self.frame_rpcs[:n].max()) if n else 0,
+            },
+            'setup_seconds': dict(self.setup_seconds),
+        }
+
+    def save(self, path, extra=None):
+        """写入JSON（原子替换），extra为附加的场景信息"""
+        data = dict(extra or {})
+        data.update(self.to_dict())
+        path = Path(path)
+        tmp_file = path.with_name(path.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, path)
+        return path
+
+    def print_summary(self, label='帧延迟'):
+        n = self.num_frames
+        if n == 0:
+            return
+        latency = self.frame_latency_ms()
+        totals = self.phase_totals()
+        loop_seconds = float(self.frame_seconds[:n].sum())
+        print(f"   {label}: p50 {latency['p50']:.2f} / p95 {latency['p95']:.2f} / "
+              f"p99 {latency['p99']:.2f} ms, {self.ticks_per_second:.0f} 帧/秒, "
+              f"RPC {self.total_rpcs:,}次 ({self.total_rpcs / n:.1f}次/帧)")
+        # 只显示本循环实际用到的阶段
+        shares = ", ".join(
+            f"{phase} {totals[phase] / loop_seconds * 100:.0f}%"
+            for phase in PHASES if loop_seconds > 0 and totals[phase] > 0
+        )
+        print(f"   阶段占比: {shares}")
@@ -0,0 +1,257 @@
+# track_store.py
+"""
+轨迹索引 + 按列存储（2clean写出，按trackId直接取整条轨迹，不需要groupby）
+✅ 清洗后的数据按 (trackId, frame) 排序；全局trackId是 0..N-1 的连续整数
+✅ PROCESSED_DATA_DIR/tracks/index.npy: 第i行就是trackId=i的
+   (offset, length, scenario_id, behavior, start_frame, end_frame)
+✅ PROCESSED_DATA_DIR/tracks/<列>.npy: 每列一个.npy文件（类别列保存为int8编码，取值表在meta.json）
+✅ TrackStore.track(i): 各列内存映射数组的切片（零拷贝，只读取这条轨迹所在的页）
+✅ TrackStoreWriter: 按索引预先算好每条轨迹的位置，分块写入时直接写到文件对应位置（流式清洗不需要整体排序）
+
+用法:
+    store = TrackStore(PROCESSED_DATA_DIR)
+    arrays = store.track(42, columns=['frame', 'x', 'y'])     # {列: np.memmap切片}
+    df = store.track_frame(42)                                # DataFrame（复制）
+    ids = store.select(scenario_id=3, behavior_type='aggressive')
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_schema import CATEGORY_COLUMNS, apply_schema
+from frame_recorder import CATEGORIES
+
+TRACK_STORE_DIR_NAME = 'tracks'
+TRACK_STORE_VERSION = 1
+INDEX_DTYPE = np.dtype([
+    ('offset', '<i8'),
+    ('length', '<i4'),
+    ('scenario_id', '<i2'),
+    ('behavior', 'i1'),
+    ('start_frame', '<i4'),
+    ('end_frame', '<i4'),
+])
+
+
+def track_store_dir(processed_dir):
+    return Path(processed_dir) / TRACK_STORE_DIR_NAME
+
+
+def _segments(sorted_keys):
+    """已排序键的每段 (起始位置, 长度)"""
+    n = len(sorted_keys)
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]) if n else np.zeros(0, dtype=np.int64)
+    return starts, np.diff(np.r_[starts, n])
+
+
+class TrackStoreWriter:
+    """
+    按轨迹长度预先分配各列文件，write()把任意行（已分配全局trackId）写到排序后的位置
+
+    同一轨迹的行在多次write之间按帧递增到达（块内顺序不限）；close()检查每条轨迹都已写满，
+    生成index.npy/meta.json，并替换旧的tracks目录。
+    """
+
+    def __init__(self, processed_dir, lengths):
+        self.directory = track_store_dir(processed_dir)
+        self.staging_dir = self.directory.with_name('.' + self.directory.name + '.tmp')
+        if self.staging_dir.exists():
+            shutil.rmtree(self.staging_dir)
+        self.staging_dir.mkdir(parents=True)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if np.any(lengths <= 0):
+            raise ValueError('轨迹长度必须大于0')
+        self.offsets = np.r_[0, np.cumsum(lengths)]
+        self.cursor = self.offsets[:-1].copy()
+        self.rows = int(self.offsets[-1])
+        self.column_order = []
+        self.categories = {}
+        self._files = {}
+
+    def _open_column(self, name, dtype):
+        path = self.staging_dir / f'{name}.npy'
+        header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (self.rows,)}
+        f = open(path, 'w+b')
+        np.lib.format.write_array_header_1_0(f, header)
+        data_offset = f.tell()
+        f.truncate(data_offset + self.rows * dtype.itemsize)
+        self._files[name] = (f, data_offset, dtype)
+        self.column_order.append(name)
+        return self._files[name]
+
+    def _encode(self, name, values):
+        """类别列 → int8编码（取值表固定顺序，新值追加在后）"""
+        if name in CATEGORY_COLUMNS or isinstance(values.dtype, pd.CategoricalDtype):
+            categories = self.categories.setdefault(name, list(CATEGORIES.get(name, [])))
+            values = values.astype('category')
+            for value in values.cat.categories:
+                if str(value) not in categories:
+                    categories.append(str(value))
+            if len(categories) > 127:
+                raise ValueError(f'{name}的类别数超过int8范围')
+            return values.cat.set_categories(categories).cat.codes.to_numpy().astype(np.int8)
+        return values.to_numpy()
+
+    def write(self, df):
+        if len(df) == 0:
+            return
+        df = apply_schema(df)
+        track = df['trackId'].to_numpy().astype(np.int64)
+        order = np.lexsort((df['frame'].to_numpy(), track))
+        track = track[order]
+        starts, lengths = _segments(track)
+        segment_tracks = track[starts]
+        positions = self.cursor[segment_tracks]
+        self.cursor[segment_tracks] += lengths
+        if np.any(self.cursor[segment_tracks] > self.offsets[segment_tracks + 1]):
+            raise ValueError('轨迹的行数超过索引中的长度')
+
+        # ⭐ 合并文件中相邻的段（已排序的输入只有一段），每段一次顺序写
+        joined = np.r_[False, positions[1:] == positions[:-1] + lengths[:-1]]
+        run_starts = np.flatnonzero(~joined)
+        run_ends = np.r_[run_starts[1:], len(starts)]
+        runs = [(positions[a], starts[a], starts[b - 1] + lengths[b - 1]) for a, b in zip(run_starts, run_ends)]
+
+        for name in df.columns:
+            values = self._encode(name, df[name])[order]
+            f, data_offset, dtype = self._files.get(name) or self._open_column(name, values.dtype)
+            values = values.astype(dtype, copy=False)
+            for position, begin, end in runs:
+                f.seek(data_offset + int(position) * dtype.itemsize)
+                f.write(values[begin:end].tobytes())
+
+    def close(self):
+        """写入索引与元数据并替换旧目录，返回目录"""
+        for f, _, _ in self._files.values():
+            f.close()
+        self._files = {}
+        if np.any(self.cursor != self.offsets[1:]):
+            raise ValueError(f'{int(np.sum(self.cursor != self.offsets[1:]))}条轨迹没有写满')
+
+        starts = self.offsets[:-1]
+        ends = self.offsets[1:] - 1
+        index = np.zeros(len(starts), dtype=INDEX_DTYPE)
+        index['offset'] = starts
+        index['length'] = self.offsets[1:] - starts
+        if len(index):
+            frames = np.load(self.staging_dir / 'frame.npy', mmap_mode='r')
+            index['start_frame'] = frames[starts]
+            index['end_frame'] = frames[ends]
+            index['scenario_id'] = np.load(self.staging_dir / 'scenario_id.npy', mmap_mode='r')[starts]
+            index['behavior'] = np.load(self.staging_dir / 'behavior_type.npy', mmap_mode='r')[starts]
+            del frames
+        np.save(self.staging_dir / 'index.npy', index)
+
+        meta = {
+            'version': TRACK_STORE_VERSION,
+            'rows': self.rows,
+            'tracks': len(index),
+            'columns': self.column_order,
+            'categories': self.categories,
+        }
+        with open(self.staging_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+
+        old_dir = self.directory.with_name('.' + self.directory.name + '.old')
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        if self.directory.exists():
+            os.replace(self.directory, old_dir)
+        os.replace(self.staging_dir, self.directory)
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        return self.directory
+
+    def abort(self):
+        for f, _, _ in self._files.values():
+            f.close()
+        self._files = {}
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+def write_track_store(df, processed_dir):
+    """把清洗后的数据（trackId为0..N-1）写成轨迹存储，返回目录"""
+    writer = TrackStoreWriter(processed_dir, np.bincount(df['trackId'].to_numpy()))
+    try:
+        writer.write(df)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+class TrackStore:
+    """只读访问轨迹存储（列文件按需内存映射）"""
+
+    def __init__(self, processed_dir):
+        self.directory = track_store_dir(processed_dir)
+        meta_file = self.directory / 'meta.json'
+        if not meta_file.exists():
+            raise FileNotFoundError(f'轨迹存储不存在: {self.directory}（先运行 2clean_and_merge_v2.py）')
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = list(self.meta['columns'])
+        self.categories = self.meta['categories']
+        self.index = np.load(self.directory / 'index.npy')
+        self._arrays = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def rows(self):
+        return self.meta['rows']
+
+    def column(self, name):
+        """整列（np.memmap，只读）"""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self.directory / f'{name}.npy', mmap_mode='r')
+        return self._arrays[name]
+
+    def track(self, track_id, columns=None):
+        """一条轨迹各列的切片（零拷贝）: {列名: 数组}，类别列为编码（取值表见categories）"""
+        entry = self.index[track_id]
+        rows = slice(int(entry['offset']), int(entry['offset']) + int(entry['length']))
+        return {name: self.column(name)[rows] for name in (columns or self.columns)}
+
+    def track_frame(self, track_id, columns=None):
+        """一条轨迹的DataFrame（复制，类别列解码）"""
+        return self._to_frame(self.track(track_id, columns))
+
+    def select(self, scenario_id=None, behavior_type=None):
+        """满足条件的trackId（只查索引）"""
+        mask = np.ones(len(self.index), dtype=bool)
+        if scenario_id is not None:
+            mask &= np.isin(self.index['scenario_id'], np.atleast_1d(scenario_id))
+        if behavior_type is not None:
+            categories = self.categories['behavior_type']
+            codes = [categories.index(value) for value in np.atleast_1d(behavior_type) if value in categories]
+            mask &= np.isin(self.index['behavior'], codes)
+        return np.flatnonzero(mask)
+
+    def iter_frames(self, chunk_rows, columns=None):
+        """按行顺序分块读出DataFrame（不做内存映射，顺序读文件，内存只与块大小有关）"""
+        columns = columns or self.columns
+        # 只取各列文件的数据偏移与类型（创建memmap不会读取数据）
+        headers = {name: (self.column(name).offset, self.column(name).dtype) for name in columns}
+        for start in range(0, self.rows, chunk_rows):
+            count = min(chunk_rows, self.rows - start)
+            arrays = {}
+            for name in columns:
+                data_offset, dtype = headers[name]
+                arrays[name] = np.fromfile(self.directory / f'{name}.npy', dtype=dtype, count=count,
+                                           offset=data_offset + start * dtype.itemsize)
+            yield self._to_frame(arrays)
+
+    def _to_frame(self, arrays):
+        data = {}
+        for name, values in arrays.items():
+            if name in self.categories:
+                data[name] = pd.Categorical.from_codes(np.asarray(values), categories=self.categories[name])
+            else:
+                data[name] = np.array(values)
+        return apply_schema(pd.DataFrame(data))